@@ -0,0 +1,93 @@
+"""Add post pipeline indexes
+
+Revision ID: i1j2k3l4m5n6
+Revises: 52bbf3e01300
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'i1j2k3l4m5n6'
+down_revision: Union[str, Sequence[str], None] = '52bbf3e01300'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Partial / plain indexes: (name, columns, WHERE clause)
+INDEXES = (
+    # LLM worker: SCRAPED posts waiting for classification
+    ('ix_posts_scraped_unclassified', ['id'], "status = 'scraped' AND llm_classification_confidence IS NULL"),
+    # LLM worker: PENDING posts waiting for rewrite
+    ('ix_posts_pending_unprocessed', ['id'], "status = 'pending' AND processed_at IS NULL"),
+    # LLM worker: PROCESSED posts waiting for target channel rewrite
+    ('ix_posts_processed_not_rewritten', ['id'],
+     "status = 'processed' AND target_channel_id IS NOT NULL AND (processed_text IS NULL OR processed_text = '')"),
+    # Publisher: SCHEDULED posts with scheduled_at <= now, ordered by scheduled_at
+    ('ix_posts_scheduled_at', ['scheduled_at'], "status = 'scheduled'"),
+    # Publisher: posts queued for immediate publishing
+    ('ix_posts_publishing', ['id'], "status = 'publishing'"),
+    # Post list / counts filtered by status
+    ('ix_posts_status_created_at', ['status', 'created_at'], None),
+)
+MAX_REPORTED_DUPLICATES = 50
+
+
+def _check_duplicate_scrapes() -> None:
+    """Refuse to migrate while several posts share a source message.
+    
+    The unique constraint can't be created over them, and which copy to keep (one may be
+    published, another approved or referenced) is a decision for an operator, not a migration.
+    """
+    if op.get_context().as_sql:
+        return  # offline (--sql) run: nothing to query
+    duplicates = op.get_bind().execute(sa.text("""
+        SELECT source_channel_id, original_message_id,
+               string_agg(id || ' (' || coalesce(status, 'null') || ')', ', ' ORDER BY id) AS posts
+        FROM posts
+        WHERE source_channel_id IS NOT NULL
+        GROUP BY source_channel_id, original_message_id
+        HAVING count(*) > 1
+        ORDER BY source_channel_id, original_message_id
+    """)).all()
+    if not duplicates:
+        return
+    report = "\n".join(
+        f"  source_channel_id={source_channel_id} original_message_id={message_id}: posts {posts}"
+        for source_channel_id, message_id, posts in duplicates[:MAX_REPORTED_DUPLICATES]
+    )
+    if len(duplicates) > MAX_REPORTED_DUPLICATES:
+        report += f"\n  ... and {len(duplicates) - MAX_REPORTED_DUPLICATES} more"
+    raise RuntimeError(
+        f"{len(duplicates)} source message(s) were scraped into more than one post, so "
+        f"uq_posts_source_message can't be created. Keep one post per message (delete the others "
+        f"or set their source_channel_id to NULL), then run the migration again:\n{report}"
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _check_duplicate_scrapes()
+    
+    # Built CONCURRENTLY, outside the migration transaction, so posts stays writable meanwhile.
+    # A build that fails leaves an INVALID index behind: drop it before running again.
+    with op.get_context().autocommit_block():
+        op.create_index('uq_posts_source_message', 'posts', ['source_channel_id', 'original_message_id'],
+                        unique=True, postgresql_concurrently=True)
+        for name, columns, where in INDEXES:
+            op.create_index(name, 'posts', columns, unique=False, postgresql_concurrently=True,
+                            postgresql_where=sa.text(where) if where else None)
+    # Promote the unique index to the constraint the model declares (only a brief lock)
+    op.execute("ALTER TABLE posts ADD CONSTRAINT uq_posts_source_message UNIQUE USING INDEX uq_posts_source_message")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name='posts', postgresql_concurrently=True)
+    op.drop_constraint('uq_posts_source_message', 'posts', type_='unique')
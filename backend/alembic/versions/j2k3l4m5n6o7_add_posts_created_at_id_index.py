@@ -0,0 +1,28 @@
+"""Add posts (created_at, id) index for keyset pagination
+
+Revision ID: j2k3l4m5n6o7
+Revises: i1j2k3l4m5n6
+Create Date: 2026-10-17 12:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'j2k3l4m5n6o7'
+down_revision: Union[str, Sequence[str], None] = 'i1j2k3l4m5n6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_posts_created_at_id', 'posts', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_posts_created_at_id', table_name='posts')
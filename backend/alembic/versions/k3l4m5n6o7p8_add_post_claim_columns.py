@@ -0,0 +1,30 @@
+"""Add post claim columns for worker leases
+
+Revision ID: k3l4m5n6o7p8
+Revises: j2k3l4m5n6o7
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'k3l4m5n6o7p8'
+down_revision: Union[str, Sequence[str], None] = 'j2k3l4m5n6o7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('claimed_by', sa.String(), nullable=True))
+    op.add_column('posts', sa.Column('claim_expires_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('posts', 'claim_expires_at')
+    op.drop_column('posts', 'claimed_by')
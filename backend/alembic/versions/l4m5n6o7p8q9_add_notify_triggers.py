@@ -0,0 +1,69 @@
+"""Add NOTIFY triggers for worker wake-ups
+
+Revision ID: l4m5n6o7p8q9
+Revises: k3l4m5n6o7p8
+Create Date: 2026-10-17 13:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'l4m5n6o7p8q9'
+down_revision: Union[str, Sequence[str], None] = 'k3l4m5n6o7p8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SERVICE_STATUS_TABLES = ('worker_status', 'scrapper_status', 'publisher_status', 'llm_worker_status')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # posts: NOTIFY posts, '<status>' when a post is created or changes status
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_post_status() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                PERFORM pg_notify('posts', NEW.status);
+            ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+                PERFORM pg_notify('posts', NEW.status);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER posts_status_notify
+        AFTER INSERT OR UPDATE OF status ON posts
+        FOR EACH ROW EXECUTE PROCEDURE notify_post_status()
+    """)
+    
+    # *_status: NOTIFY service_control, '<table>' when should_run flips
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_service_control() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.should_run IS DISTINCT FROM OLD.should_run THEN
+                PERFORM pg_notify('service_control', TG_TABLE_NAME);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    for table in SERVICE_STATUS_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_should_run_notify
+            AFTER UPDATE OF should_run ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE notify_service_control()
+        """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SERVICE_STATUS_TABLES:
+        op.execute(f"DROP TRIGGER IF EXISTS {table}_should_run_notify ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS notify_service_control()")
+    op.execute("DROP TRIGGER IF EXISTS posts_status_notify ON posts")
+    op.execute("DROP FUNCTION IF EXISTS notify_post_status()")
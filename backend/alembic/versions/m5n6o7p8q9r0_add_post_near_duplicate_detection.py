@@ -0,0 +1,45 @@
+"""Add near-duplicate detection: post_lsh_bands and posts.duplicate_of_id
+
+Revision ID: m5n6o7p8q9r0
+Revises: l4m5n6o7p8q9
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'm5n6o7p8q9r0'
+down_revision: Union[str, Sequence[str], None] = 'l4m5n6o7p8q9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('posts', sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_posts_duplicate_of_id', 'posts', 'posts', ['duplicate_of_id'], ['id'], ondelete='SET NULL'
+    )
+    
+    op.create_table(
+        'post_lsh_bands',
+        sa.Column('post_id', sa.Integer(), sa.ForeignKey('posts.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('band', sa.SmallInteger(), nullable=False),
+        sa.Column('bucket', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('post_id', 'band'),
+    )
+    # Candidate lookup: same bucket in the same band, recent posts only
+    op.create_index('ix_post_lsh_bands_band_bucket', 'post_lsh_bands', ['band', 'bucket', 'created_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_post_lsh_bands_band_bucket', table_name='post_lsh_bands')
+    op.drop_table('post_lsh_bands')
+    op.drop_constraint('fk_posts_duplicate_of_id', 'posts', type_='foreignkey')
+    op.drop_column('posts', 'duplicate_of_id')
@@ -0,0 +1,30 @@
+"""Add model routing columns: ai_models.task and ai_models.priority
+
+Revision ID: n6o7p8q9r0s1
+Revises: m5n6o7p8q9r0
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'n6o7p8q9r0s1'
+down_revision: Union[str, Sequence[str], None] = 'm5n6o7p8q9r0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('ai_models', sa.Column('task', sa.String(), nullable=True))
+    op.add_column('ai_models', sa.Column('priority', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('ai_models', 'priority')
+    op.drop_column('ai_models', 'task')
@@ -0,0 +1,47 @@
+"""Add NOTIFY trigger for settings cache invalidation
+
+Revision ID: o7p8q9r0s1t2
+Revises: n6o7p8q9r0s1
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'o7p8q9r0s1t2'
+down_revision: Union[str, Sequence[str], None] = 'n6o7p8q9r0s1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # settings: NOTIFY settings, '<key>' when a setting is created, changed or deleted
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_settings_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pg_notify('settings', OLD.key);
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.key IS DISTINCT FROM OLD.key) THEN
+                PERFORM pg_notify('settings', NEW.key);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER settings_change_notify
+        AFTER INSERT OR UPDATE OR DELETE ON settings
+        FOR EACH ROW EXECUTE PROCEDURE notify_settings_change()
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS settings_change_notify ON settings")
+    op.execute("DROP FUNCTION IF EXISTS notify_settings_change()")
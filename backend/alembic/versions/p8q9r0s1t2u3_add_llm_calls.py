@@ -0,0 +1,54 @@
+"""Add llm_calls ledger
+
+Revision ID: p8q9r0s1t2u3
+Revises: o7p8q9r0s1t2
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'p8q9r0s1t2u3'
+down_revision: Union[str, Sequence[str], None] = 'o7p8q9r0s1t2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'llm_calls',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('request_id', sa.String(length=32), nullable=False),
+        sa.Column('task', sa.String(), nullable=False),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('post_id', sa.Integer(), nullable=True),
+        sa.Column('target_channel_id', sa.Integer(), nullable=True),
+        sa.Column('batch_size', sa.Integer(), nullable=False),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=True),
+        sa.Column('completion_tokens', sa.Integer(), nullable=True),
+        sa.Column('cost', sa.Float(), nullable=True),
+        sa.Column('latency_ms', sa.Integer(), nullable=True),
+        sa.Column('cache_hit', sa.Boolean(), nullable=False),
+        sa.Column('outcome', sa.String(), nullable=False),
+        sa.Column('status_code', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index(op.f('ix_llm_calls_id'), 'llm_calls', ['id'], unique=False)
+    op.create_index(op.f('ix_llm_calls_post_id'), 'llm_calls', ['post_id'], unique=False)
+    op.create_index('ix_llm_calls_created_at', 'llm_calls', ['created_at'], unique=False)
+    op.create_index('ix_llm_calls_channel_created_at', 'llm_calls', ['target_channel_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_llm_calls_channel_created_at', table_name='llm_calls')
+    op.drop_index('ix_llm_calls_created_at', table_name='llm_calls')
+    op.drop_index(op.f('ix_llm_calls_post_id'), table_name='llm_calls')
+    op.drop_index(op.f('ix_llm_calls_id'), table_name='llm_calls')
+    op.drop_table('llm_calls')
@@ -0,0 +1,618 @@
+"""Async counterparts of the crud.py functions used by the API.
+
+Workers keep using the synchronous crud module; FastAPI handlers use these so that
+database waits yield the event loop instead of blocking it.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete, and_, desc, func, text, case
+from sqlalchemy.exc import CompileError
+from typing import List, Optional, Dict, Any, Tuple
+from datetime import datetime, timezone
+import json
+from models import User, SourceChannel, TargetChannel, Post, PostStatus, Settings, AIModel, WorkerStatus, ScrapperStatus, PublisherStatus, LLMWorkerStatus, LLMCall
+from schemas import (
+    UserCreate, SourceChannelCreate, SourceChannelUpdate,
+    TargetChannelCreate, TargetChannelUpdate, PostUpdate,
+    SettingUpdate, AIModelCreate, AIModelUpdate
+)
+from auth import get_password_hash
+from crud import (
+    POST_LOAD_OPTIONS, post_filter_clauses, post_cursor_clause, encode_post_cursor,
+    build_frontend_post, apply_service_status, dashboard_stats_query
+)
+from cache import TTLCache
+from config import settings
+from notifications import notification_hub
+from settings_cache import settings_cache
+
+
+# Counters shared by every open dashboard / posts page. Post status and channel writes in
+# this module drop them, and so does every NOTIFY posts (a post created or changing status,
+# mostly by the workers). Without notifications, worker changes show up once the TTL expires.
+dashboard_stats_cache = TTLCache(ttl=settings.dashboard_stats_ttl, maxsize=1)
+posts_count_cache = TTLCache(ttl=settings.posts_count_ttl, maxsize=256)
+
+
+def invalidate_post_counts():
+    dashboard_stats_cache.invalidate()
+    posts_count_cache.invalidate()
+
+
+notification_hub.add_callback("posts", lambda status: invalidate_post_counts())
+
+
+# User CRUD
+async def get_user(db: AsyncSession, user_id: int) -> Optional[User]:
+    result = await db.execute(select(User).where(User.id == user_id))
+    return result.scalars().first()
+
+
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
+    result = await db.execute(select(User).where(User.username == username))
+    return result.scalars().first()
+
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    hashed_password = get_password_hash(user.password)
+    db_user = User(
+        username=user.username,
+        hashed_password=hashed_password
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+
+# Source Channel CRUD
+async def get_source_channels(db: AsyncSession, skip: int = 0, limit: int = 100, active_only: bool = False) -> List[SourceChannel]:
+    query = select(SourceChannel)
+    if active_only:
+        query = query.where(SourceChannel.is_active == True)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+
+async def get_source_channel(db: AsyncSession, channel_id: int) -> Optional[SourceChannel]:
+    result = await db.execute(select(SourceChannel).where(SourceChannel.id == channel_id))
+    return result.scalars().first()
+
+
+async def get_source_channel_by_telegram_id(db: AsyncSession, telegram_channel_id: str) -> Optional[SourceChannel]:
+    result = await db.execute(select(SourceChannel).where(SourceChannel.channel_id == telegram_channel_id))
+    return result.scalars().first()
+
+
+async def create_source_channel(db: AsyncSession, channel: SourceChannelCreate) -> SourceChannel:
+    db_channel = SourceChannel(**channel.dict())
+    db.add(db_channel)
+    await db.commit()
+    invalidate_post_counts()
+    await db.refresh(db_channel)
+    return db_channel
+
+
+async def update_source_channel(db: AsyncSession, channel_id: int, channel_update: SourceChannelUpdate) -> Optional[SourceChannel]:
+    db_channel = await get_source_channel(db, channel_id)
+    if not db_channel:
+        return None
+    
+    update_data = channel_update.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_channel, field, value)
+    
+    await db.commit()
+    invalidate_post_counts()
+    await db.refresh(db_channel)
+    return db_channel
+
+
+async def delete_source_channel(db: AsyncSession, channel_id: int) -> bool:
+    db_channel = await get_source_channel(db, channel_id)
+    if not db_channel:
+        return False
+    
+    # First delete all posts associated with this source channel
+    await db.execute(delete(Post).where(Post.source_channel_id == channel_id))
+    
+    # Then delete the source channel
+    await db.delete(db_channel)
+    await db.commit()
+    invalidate_post_counts()
+    return True
+
+
+# Target Channel CRUD
+async def get_target_channels(db: AsyncSession, skip: int = 0, limit: int = 100, active_only: bool = False) -> List[TargetChannel]:
+    query = select(TargetChannel)
+    if active_only:
+        query = query.where(TargetChannel.is_active == True)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+
+async def get_target_channel(db: AsyncSession, channel_id: int) -> Optional[TargetChannel]:
+    result = await db.execute(select(TargetChannel).where(TargetChannel.id == channel_id))
+    return result.scalars().first()
+
+
+async def get_target_channel_by_telegram_id(db: AsyncSession, telegram_channel_id: str) -> Optional[TargetChannel]:
+    result = await db.execute(select(TargetChannel).where(TargetChannel.channel_id == telegram_channel_id))
+    return result.scalars().first()
+
+
+async def create_target_channel(db: AsyncSession, channel: TargetChannelCreate) -> TargetChannel:
+    db_channel = TargetChannel(**channel.dict())
+    db.add(db_channel)
+    await db.commit()
+    invalidate_post_counts()
+    await db.refresh(db_channel)
+    return db_channel
+
+
+async def update_target_channel(db: AsyncSession, channel_id: int, channel_update: TargetChannelUpdate) -> Optional[TargetChannel]:
+    db_channel = await get_target_channel(db, channel_id)
+    if not db_channel:
+        return None
+    
+    update_data = channel_update.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_channel, field, value)
+    
+    await db.commit()
+    invalidate_post_counts()
+    await db.refresh(db_channel)
+    return db_channel
+
+
+async def delete_target_channel(db: AsyncSession, channel_id: int) -> bool:
+    db_channel = await get_target_channel(db, channel_id)
+    if not db_channel:
+        return False
+    
+    await db.delete(db_channel)
+    await db.commit()
+    invalidate_post_counts()
+    return True
+
+
+# Post CRUD
+async def get_posts(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    status: Optional[PostStatus] = None,
+    source_channel_id: Optional[int] = None,
+    target_channel_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_manual: Optional[bool] = None
+) -> List[Post]:
+    query = (
+        select(Post)
+        .options(*POST_LOAD_OPTIONS)
+        .where(*post_filter_clauses(status, source_channel_id, target_channel_id, date_from, date_to, is_manual))
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .offset(skip)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+async def get_posts_page(
+    db: AsyncSession,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    status: Optional[PostStatus] = None,
+    source_channel_id: Optional[int] = None,
+    target_channel_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_manual: Optional[bool] = None
+) -> Tuple[List[Post], Optional[str]]:
+    """Keyset-paginated post list. Returns the page and the cursor of the next one (None on the last page)."""
+    clauses = post_filter_clauses(status, source_channel_id, target_channel_id, date_from, date_to, is_manual)
+    if cursor:
+        clauses.append(post_cursor_clause(cursor))
+    
+    query = (
+        select(Post)
+        .options(*POST_LOAD_OPTIONS)
+        .where(*clauses)
+        .order_by(desc(Post.created_at), desc(Post.id))
+        .limit(limit + 1)
+    )
+    result = await db.execute(query)
+    posts = list(result.scalars().all())
+    
+    next_cursor = None
+    if len(posts) > limit:
+        posts = posts[:limit]
+        next_cursor = encode_post_cursor(posts[-1])
+    return posts, next_cursor
+
+
+async def get_posts_count(
+    db: AsyncSession,
+    status: Optional[PostStatus] = None,
+    source_channel_id: Optional[int] = None,
+    target_channel_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_manual: Optional[bool] = None
+) -> int:
+    """Exact count, cached per filter combination for settings.posts_count_ttl seconds."""
+    key = (status, source_channel_id, target_channel_id, date_from, date_to, is_manual)
+    count = posts_count_cache.get(key)
+    if count is None:
+        query = select(func.count(Post.id)).where(
+            *post_filter_clauses(status, source_channel_id, target_channel_id, date_from, date_to, is_manual)
+        )
+        result = await db.execute(query)
+        count = result.scalar()
+        posts_count_cache.set(key, count)
+    return count
+
+
+async def estimate_posts_count(
+    db: AsyncSession,
+    status: Optional[PostStatus] = None,
+    source_channel_id: Optional[int] = None,
+    target_channel_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_manual: Optional[bool] = None
+) -> Optional[int]:
+    """Postgres planner row estimate for the filtered post list (no table scan).
+    
+    Returns None when no estimate is available (non-Postgres database, unrenderable filter).
+    """
+    if db.bind.dialect.name != "postgresql":
+        return None
+    
+    query = select(Post.id).where(
+        *post_filter_clauses(status, source_channel_id, target_channel_id, date_from, date_to, is_manual)
+    )
+    try:
+        sql = query.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+    except CompileError:
+        return None
+    
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def get_post(db: AsyncSession, post_id: int) -> Optional[Post]:
+    # populate_existing: callers re-read posts that workers may have changed in the meantime
+    result = await db.execute(
+        select(Post)
+        .options(*POST_LOAD_OPTIONS)
+        .where(Post.id == post_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.scalars().first()
+
+
+async def create_post_from_frontend(db: AsyncSession, post_data: dict, user_id: int) -> Post:
+    """Create a new post from frontend with text and media files."""
+    db_post = build_frontend_post(post_data, user_id)
+    
+    db.add(db_post)
+    await db.commit()
+    invalidate_post_counts()
+    return await get_post(db, db_post.id)
+
+
+async def update_post(db: AsyncSession, post_id: int, post_update: PostUpdate) -> Optional[Post]:
+    db_post = await db.get(Post, post_id)
+    if not db_post:
+        return None
+    
+    update_data = post_update.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_post, field, value)
+    
+    # Update timestamps based on status
+    if 'status' in update_data:
+        if update_data['status'] == PostStatus.APPROVED:
+            db_post.approved_at = datetime.now(timezone.utc)
+        elif update_data['status'] == PostStatus.PUBLISHED:
+            db_post.published_at = datetime.now(timezone.utc)
+    
+    await db.commit()
+    if 'status' in update_data:
+        invalidate_post_counts()
+    return await get_post(db, post_id)
+
+
+async def approve_post(db: AsyncSession, post_id: int, user_id: int, target_channel_id: int, admin_notes: Optional[str] = None) -> Optional[Post]:
+    db_post = await db.get(Post, post_id)
+    if not db_post:
+        return None
+    
+    db_post.status = PostStatus.APPROVED
+    db_post.target_channel_id = target_channel_id
+    db_post.approved_by = user_id
+    db_post.approved_at = datetime.now(timezone.utc)
+    if admin_notes:
+        db_post.admin_notes = admin_notes
+    
+    await db.commit()
+    invalidate_post_counts()
+    return await get_post(db, post_id)
+
+
+async def schedule_post(db: AsyncSession, post_id: int, user_id: int, target_channel_id: int, scheduled_at: datetime, admin_notes: Optional[str] = None) -> Optional[Post]:
+    db_post = await db.get(Post, post_id)
+    if not db_post:
+        return None
+    
+    db_post.status = PostStatus.SCHEDULED
+    db_post.target_channel_id = target_channel_id
+    db_post.approved_by = user_id
+    db_post.approved_at = datetime.now(timezone.utc)
+    db_post.scheduled_at = scheduled_at
+    if admin_notes:
+        db_post.admin_notes = admin_notes
+    
+    await db.commit()
+    invalidate_post_counts()
+    return await get_post(db, post_id)
+
+
+async def get_pending_posts(db: AsyncSession, limit: int = 50) -> List[Post]:
+    result = await db.execute(
+        select(Post)
+        .options(*POST_LOAD_OPTIONS)
+        .where(Post.status == PostStatus.PENDING)
+        .order_by(Post.created_at)
+        .limit(limit)
+    )
+    return list(result.scalars().all())
+
+
+# Settings CRUD
+async def get_setting(db: AsyncSession, key: str) -> Optional[Settings]:
+    result = await db.execute(select(Settings).where(Settings.key == key))
+    return result.scalars().first()
+
+
+async def get_settings(db: AsyncSession, skip: int = 0, limit: int = 100) -> List[Settings]:
+    result = await db.execute(select(Settings).offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+
+async def update_setting(db: AsyncSession, key: str, setting_update: SettingUpdate) -> Optional[Settings]:
+    db_setting = await get_setting(db, key)
+    if not db_setting:
+        return None
+    
+    update_data = setting_update.dict(exclude_unset=True)
+    for field, value in update_data.items():
+        setattr(db_setting, field, value)
+    
+    await db.commit()
+    await db.refresh(db_setting)
+    settings_cache.invalidate(key)
+    return db_setting
+
+
+async def upsert_setting(db: AsyncSession, key: str, value: str, description: Optional[str] = None) -> Settings:
+    db_setting = await get_setting(db, key)
+    if db_setting:
+        db_setting.value = value
+        db_setting.updated_at = datetime.now(timezone.utc)
+        if description:
+            db_setting.description = description
+    else:
+        db_setting = Settings(key=key, value=value, description=description)
+        db.add(db_setting)
+    
+    await db.commit()
+    await db.refresh(db_setting)
+    settings_cache.invalidate(key)
+    return db_setting
+
+
+# Service status CRUD (worker, scrapper, publisher, LLM worker share one row shape)
+async def _get_service_status(db: AsyncSession, model):
+    result = await db.execute(select(model).limit(1))
+    return result.scalars().first()
+
+
+async def _get_or_create_service_status(db: AsyncSession, model):
+    service_status = await _get_service_status(db, model)
+    if not service_status:
+        service_status = model()
+        db.add(service_status)
+        await db.commit()
+        await db.refresh(service_status)
+    return service_status
+
+
+async def _update_service_status(db: AsyncSession, model, should_run: bool = None, is_running: bool = None, heartbeat: bool = False):
+    service_status = await _get_or_create_service_status(db, model)
+    
+    apply_service_status(service_status, should_run=should_run, is_running=is_running, heartbeat=heartbeat)
+    
+    await db.commit()
+    await db.refresh(service_status)
+    return service_status
+
+
+async def get_worker_status(db: AsyncSession) -> Optional[WorkerStatus]:
+    return await _get_service_status(db, WorkerStatus)
+
+
+async def update_worker_status(db: AsyncSession, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> WorkerStatus:
+    return await _update_service_status(db, WorkerStatus, should_run, is_running, heartbeat)
+
+
+async def get_or_create_scrapper_status(db: AsyncSession) -> ScrapperStatus:
+    return await _get_or_create_service_status(db, ScrapperStatus)
+
+
+async def update_scrapper_status(db: AsyncSession, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> ScrapperStatus:
+    return await _update_service_status(db, ScrapperStatus, should_run, is_running, heartbeat)
+
+
+async def get_or_create_publisher_status(db: AsyncSession) -> PublisherStatus:
+    return await _get_or_create_service_status(db, PublisherStatus)
+
+
+async def update_publisher_status(db: AsyncSession, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> PublisherStatus:
+    return await _update_service_status(db, PublisherStatus, should_run, is_running, heartbeat)
+
+
+async def get_or_create_llm_worker_status(db: AsyncSession) -> LLMWorkerStatus:
+    return await _get_or_create_service_status(db, LLMWorkerStatus)
+
+
+async def update_llm_worker_status(db: AsyncSession, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> LLMWorkerStatus:
+    return await _update_service_status(db, LLMWorkerStatus, should_run, is_running, heartbeat)
+
+
+# AI Model CRUD
+async def get_ai_models(db: AsyncSession, skip: int = 0, limit: int = 100, active_only: bool = False) -> List[AIModel]:
+    query = select(AIModel).order_by(AIModel.created_at)
+    if active_only:
+        query = query.where(AIModel.is_active == True)
+    result = await db.execute(query.offset(skip).limit(limit))
+    return list(result.scalars().all())
+
+
+async def get_ai_model(db: AsyncSession, model_id: int) -> Optional[AIModel]:
+    result = await db.execute(select(AIModel).where(AIModel.id == model_id))
+    return result.scalars().first()
+
+
+async def get_ai_model_by_model_id(db: AsyncSession, model_id: str) -> Optional[AIModel]:
+    result = await db.execute(select(AIModel).where(AIModel.model_id == model_id))
+    return result.scalars().first()
+
+
+async def get_default_ai_model(db: AsyncSession) -> Optional[AIModel]:
+    result = await db.execute(
+        select(AIModel).where(and_(AIModel.is_default == True, AIModel.is_active == True))
+    )
+    return result.scalars().first()
+
+
+async def create_ai_model(db: AsyncSession, model: AIModelCreate) -> AIModel:
+    db_model = AIModel(**model.dict())
+    db.add(db_model)
+    await db.commit()
+    await db.refresh(db_model)
+    return db_model
+
+
+async def update_ai_model(db: AsyncSession, model_id: int, model_update: AIModelUpdate) -> Optional[AIModel]:
+    db_model = await get_ai_model(db, model_id)
+    if not db_model:
+        return None
+    
+    update_data = model_update.dict(exclude_unset=True)
+    
+    # If setting this model as default, unset other defaults
+    if update_data.get('is_default', False):
+        await db.execute(update(AIModel).where(AIModel.is_default == True).values(is_default=False))
+    
+    for field, value in update_data.items():
+        setattr(db_model, field, value)
+    
+    await db.commit()
+    await db.refresh(db_model)
+    return db_model
+
+
+async def delete_ai_model(db: AsyncSession, model_id: int) -> bool:
+    db_model = await get_ai_model(db, model_id)
+    if not db_model:
+        return False
+    
+    # Don't allow deleting the default model
+    if db_model.is_default:
+        return False
+    
+    await db.delete(db_model)
+    await db.commit()
+    return True
+
+
+async def set_default_ai_model(db: AsyncSession, model_id: int) -> Optional[AIModel]:
+    # First, unset all defaults
+    await db.execute(update(AIModel).where(AIModel.is_default == True).values(is_default=False))
+    
+    # Then set the new default
+    db_model = await get_ai_model(db, model_id)
+    if not db_model or not db_model.is_active:
+        return None
+    
+    db_model.is_default = True
+    await db.commit()
+    await db.refresh(db_model)
+    return db_model
+
+
+# Dashboard stats
+async def get_dashboard_stats(db: AsyncSession) -> Dict[str, Any]:
+    stats = dashboard_stats_cache.get("stats")
+    if stats is None:
+        result = await db.execute(dashboard_stats_query())
+        stats = dict(result.one()._mapping)
+        dashboard_stats_cache.set("stats", stats)
+    return stats
+
+
+# LLM call ledger (llm_ledger.py)
+LLM_USAGE_GROUPS = {"model": LLMCall.model, "channel": LLMCall.target_channel_id, "task": LLMCall.task}
+
+
+def _llm_usage_columns():
+    real = LLMCall.cache_hit == False
+    return (
+        func.count(func.distinct(case((real, LLMCall.request_id)))).label("requests"),
+        func.count(func.distinct(LLMCall.post_id)).label("posts"),
+        func.coalesce(func.sum(LLMCall.prompt_tokens), 0).label("prompt_tokens"),
+        func.coalesce(func.sum(LLMCall.completion_tokens), 0).label("completion_tokens"),
+        func.coalesce(func.sum(LLMCall.cost), 0.0).label("cost"),
+        func.count(case((LLMCall.cache_hit == True, LLMCall.id))).label("cache_hits"),
+        func.count(func.distinct(case((LLMCall.outcome.notin_(("ok", "cache")), LLMCall.request_id)))).label("failed_requests"),
+        func.avg(case((real, LLMCall.latency_ms))).label("avg_latency_ms"),
+        func.max(LLMCall.latency_ms).label("max_latency_ms"),
+    )
+
+
+async def get_llm_usage(db: AsyncSession, since: datetime, group_by: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Requests, posts, tokens, spend and latency of llm_calls since `since`.
+    
+    Grouped by "model", "channel" (with the channel name) or "task"; one total row without `group_by`.
+    """
+    if group_by is None:
+        query = select(*_llm_usage_columns())
+    elif group_by == "channel":
+        query = (
+            select(LLMCall.target_channel_id.label("key"), TargetChannel.channel_name, *_llm_usage_columns())
+            .outerjoin(TargetChannel, TargetChannel.id == LLMCall.target_channel_id)
+            .group_by(LLMCall.target_channel_id, TargetChannel.channel_name)
+        )
+    else:
+        column = LLM_USAGE_GROUPS[group_by]
+        query = select(column.label("key"), *_llm_usage_columns()).group_by(column)
+    query = query.where(LLMCall.created_at >= since)
+    if group_by is not None:
+        query = query.order_by(desc("cost"), desc("requests"))
+    
+    result = await db.execute(query)
+    return [dict(row._mapping) for row in result.all()]
+
+
+async def get_post_llm_calls(db: AsyncSession, post_id: int) -> List[LLMCall]:
+    result = await db.execute(
+        select(LLMCall).where(LLMCall.post_id == post_id).order_by(LLMCall.created_at, LLMCall.id)
+    )
+    return result.scalars().all()
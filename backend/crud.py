@@ -1,14 +1,23 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, desc, func
-from typing import List, Optional, Dict, Any
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import and_, or_, desc, func, tuple_, select, update
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timezone, timedelta
-from models import User, SourceChannel, TargetChannel, Post, PostStatus, Settings, AIModel, WorkerStatus, ScrapperStatus, PublisherStatus, LLMWorkerStatus
+import base64
+import json
+import os
+import socket
+from models import User, SourceChannel, TargetChannel, Post, PostLSHBand, PostStatus, Settings, AIModel, WorkerStatus, ScrapperStatus, PublisherStatus, LLMWorkerStatus
 from schemas import (
     UserCreate, SourceChannelCreate, SourceChannelUpdate,
     TargetChannelCreate, TargetChannelUpdate, PostCreate, PostUpdate,
     SettingCreate, SettingUpdate, AIModelCreate, AIModelUpdate
 )
 from auth import get_password_hash
+from services import near_duplicates
+from config import settings
+from settings_cache import settings_cache
 
 
 # User CRUD
@@ -157,36 +166,85 @@ def delete_target_channel(db: Session, channel_id: int) -> bool:
 
 
 # Post CRUD
-def get_posts(
-    db: Session, 
-    skip: int = 0, 
-    limit: int = 100, 
+
+# Post responses serialize these many-to-one relationships. Joining them keeps a page of
+# posts at one round trip instead of 1 + 3N lazy loads (lazy loading is also unavailable
+# on AsyncSession, so async_crud relies on these too).
+POST_LOAD_OPTIONS = (
+    joinedload(Post.source_channel),
+    joinedload(Post.target_channel),
+    joinedload(Post.approver),
+)
+
+
+def post_filter_clauses(
     status: Optional[PostStatus] = None,
     source_channel_id: Optional[int] = None,
     target_channel_id: Optional[int] = None,
     date_from: Optional[datetime] = None,
     date_to: Optional[datetime] = None,
     is_manual: Optional[bool] = None
-) -> List[Post]:
-    query = db.query(Post).order_by(desc(Post.created_at))
+) -> list:
+    """Build the WHERE clauses shared by the post list and count queries (sync and async)."""
+    clauses = []
     
     if status:
-        query = query.filter(Post.status == status)
+        clauses.append(Post.status == status)
     
     if source_channel_id is not None:
-        query = query.filter(Post.source_channel_id == source_channel_id)
+        clauses.append(Post.source_channel_id == source_channel_id)
     
     if target_channel_id is not None:
-        query = query.filter(Post.target_channel_id == target_channel_id)
+        clauses.append(Post.target_channel_id == target_channel_id)
     
     if date_from:
-        query = query.filter(Post.created_at >= date_from)
+        clauses.append(Post.created_at >= date_from)
     
     if date_to:
-        query = query.filter(Post.created_at <= date_to)
+        clauses.append(Post.created_at <= date_to)
     
     if is_manual is not None:
-        query = query.filter(Post.is_manual == is_manual)
+        clauses.append(Post.is_manual == is_manual)
+    
+    return clauses
+
+
+def encode_post_cursor(post: Post) -> str:
+    """Opaque keyset cursor pointing just after `post` in the (created_at DESC, id DESC) order."""
+    payload = json.dumps({"c": post.created_at.isoformat(), "i": post.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_post_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor from encode_post_cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), int(payload["i"])
+    except (ValueError, TypeError, KeyError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def post_cursor_clause(cursor: str):
+    """Rows strictly after the cursor; served by ix_posts_created_at_id without an OFFSET scan."""
+    created_at, post_id = decode_post_cursor(cursor)
+    return tuple_(Post.created_at, Post.id) < tuple_(created_at, post_id)
+
+
+def get_posts(
+    db: Session, 
+    skip: int = 0, 
+    limit: int = 100, 
+    status: Optional[PostStatus] = None,
+    source_channel_id: Optional[int] = None,
+    target_channel_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    is_manual: Optional[bool] = None
+) -> List[Post]:
+    query = db.query(Post).options(*POST_LOAD_OPTIONS).order_by(desc(Post.created_at), desc(Post.id)).filter(*post_filter_clauses(
+        status, source_channel_id, target_channel_id, date_from, date_to, is_manual
+    ))
     
     return query.offset(skip).limit(limit).all()
 
@@ -200,31 +258,15 @@ def get_posts_count(
     date_to: Optional[datetime] = None,
     is_manual: Optional[bool] = None
 ) -> int:
-    query = db.query(func.count(Post.id))
-    
-    if status:
-        query = query.filter(Post.status == status)
-    
-    if source_channel_id is not None:
-        query = query.filter(Post.source_channel_id == source_channel_id)
-    
-    if target_channel_id is not None:
-        query = query.filter(Post.target_channel_id == target_channel_id)
-    
-    if date_from:
-        query = query.filter(Post.created_at >= date_from)
-    
-    if date_to:
-        query = query.filter(Post.created_at <= date_to)
-    
-    if is_manual is not None:
-        query = query.filter(Post.is_manual == is_manual)
+    query = db.query(func.count(Post.id)).filter(*post_filter_clauses(
+        status, source_channel_id, target_channel_id, date_from, date_to, is_manual
+    ))
     
     return query.scalar()
 
 
 def get_post(db: Session, post_id: int) -> Optional[Post]:
-    return db.query(Post).filter(Post.id == post_id).first()
+    return db.query(Post).options(*POST_LOAD_OPTIONS).filter(Post.id == post_id).first()
 
 
 def get_post_by_source_message(db: Session, source_channel_id: int, message_id: int) -> Optional[Post]:
@@ -259,6 +301,95 @@ def create_post(db: Session, post: PostCreate) -> Post:
     return db_post
 
 
+def bulk_create_posts(db: Session, posts: List[PostCreate]) -> List[int]:
+    """Insert scraped posts in one statement, skipping messages that are already stored.
+    
+    Uses INSERT ... ON CONFLICT (source_channel_id, original_message_id) DO NOTHING, so the
+    per-message existence check is not needed. Near-duplicates of recent posts are flagged in
+    the same transaction, so no worker sees them as SCRAPED. Returns the ids of the rows
+    actually inserted (duplicates included).
+    """
+    if not posts:
+        return []
+    
+    rows = [
+        {**post.dict(), 'is_manual': False, 'status': PostStatus.SCRAPED}
+        for post in sorted(posts, key=lambda post: post.original_message_id)
+    ]
+    dialect_insert = sqlite_insert if db.bind.dialect.name == "sqlite" else pg_insert
+    stmt = (
+        dialect_insert(Post)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=['source_channel_id', 'original_message_id'])
+        .returning(Post.id)
+    )
+    inserted_ids = db.execute(stmt).scalars().all()
+    if settings.near_duplicate_detection_enabled:
+        mark_near_duplicates(db, inserted_ids)
+    db.commit()
+    return list(inserted_ids)
+
+
+def find_near_duplicate(db: Session, post: Post, buckets: List[int], feature_set, since: datetime) -> Optional[Tuple[int, float]]:
+    """Most similar recent post sharing an LSH bucket with `post`, if similar enough.
+    
+    Returns (original post id, similarity), following duplicate_of_id so every copy
+    points at the first one.
+    """
+    candidate_ids = (
+        select(PostLSHBand.post_id)
+        .where(
+            tuple_(PostLSHBand.band, PostLSHBand.bucket).in_(list(enumerate(buckets))),
+            PostLSHBand.created_at >= since,
+            PostLSHBand.post_id != post.id,
+        )
+        .distinct()
+        .limit(50)
+    )
+    candidates = (
+        db.query(Post.id, Post.original_text, Post.duplicate_of_id)
+        .filter(Post.id.in_(candidate_ids))
+        .all()
+    )
+    
+    best = None
+    for candidate_id, candidate_text, duplicate_of_id in candidates:
+        score = near_duplicates.similarity(feature_set, near_duplicates.features(candidate_text))
+        if score >= near_duplicates.SIMILARITY_THRESHOLD and (best is None or score > best[1]):
+            best = (duplicate_of_id or candidate_id, score)
+    return best
+
+
+def mark_near_duplicates(db: Session, post_ids: List[int]) -> Dict[int, int]:
+    """Index the posts' texts for LSH lookups and flag near-copies of recent posts as DUPLICATE.
+    
+    Posts are handled in id order, so a copy inside the same batch matches the earlier one.
+    Does not commit. Returns {duplicate post id: original post id}.
+    """
+    if not post_ids:
+        return {}
+    
+    since = datetime.now(timezone.utc) - timedelta(hours=settings.near_duplicate_window_hours)
+    posts = db.query(Post).filter(Post.id.in_(post_ids)).order_by(Post.id).all()
+    
+    duplicates = {}
+    for post in posts:
+        feature_set = near_duplicates.features(post.original_text)
+        buckets = near_duplicates.lsh_buckets(feature_set)
+        if not buckets:
+            continue
+        
+        match = find_near_duplicate(db, post, buckets, feature_set, since)
+        if match:
+            post.status = PostStatus.DUPLICATE
+            post.duplicate_of_id = match[0]
+            duplicates[post.id] = match[0]
+        
+        db.add_all([PostLSHBand(post_id=post.id, band=band, bucket=bucket) for band, bucket in enumerate(buckets)])
+        db.flush()
+    return duplicates
+
+
 def get_or_create_frontend_source_channel(db: Session) -> SourceChannel:
     """Get or create a special source channel for frontend-created posts"""
     frontend_channel = db.query(SourceChannel).filter(SourceChannel.channel_id == "frontend").first()
@@ -275,11 +406,8 @@ def get_or_create_frontend_source_channel(db: Session) -> SourceChannel:
     return frontend_channel
 
 
-def create_post_from_frontend(db: Session, post_data: dict, user_id: int) -> Post:
-    """Create a new post from frontend with text and media files."""
-    from datetime import datetime, timezone
-    import json
-    
+def build_frontend_post(post_data: dict, user_id: int) -> Post:
+    """Build (but do not persist) a Post from frontend text and uploaded media file names."""
     # Convert media_files list to proper structure matching telegram_scraper_service format
     media_files = post_data.get('media_files')
     if media_files and isinstance(media_files, list):
@@ -340,6 +468,12 @@ def create_post_from_frontend(db: Session, post_data: dict, user_id: int) -> Pos
         created_at=datetime.now(timezone.utc),
         approved_by=user_id  # Set creator as approver for frontend posts
     )
+    return db_post
+
+
+def create_post_from_frontend(db: Session, post_data: dict, user_id: int) -> Post:
+    """Create a new post from frontend with text and media files."""
+    db_post = build_frontend_post(post_data, user_id)
     
     db.add(db_post)
     db.commit()
@@ -486,6 +620,134 @@ def get_scheduled_posts_ready_to_publish(db: Session, limit: int = 50) -> List[P
     ).order_by(Post.scheduled_at).limit(limit).all()
 
 
+def get_next_scheduled_at(db: Session) -> Optional[datetime]:
+    """When the earliest scheduled post falls due (None if nothing is scheduled in the future).
+    
+    Overdue posts are left out: they are claimed by the current pass (or leased by another
+    replica), so waiting for them would only make the publisher spin.
+    """
+    next_scheduled_at = db.query(func.min(Post.scheduled_at)).filter(
+        Post.status == PostStatus.SCHEDULED,
+        Post.scheduled_at > datetime.now(timezone.utc)
+    ).scalar()
+    if next_scheduled_at is not None and next_scheduled_at.tzinfo is None:
+        next_scheduled_at = next_scheduled_at.replace(tzinfo=timezone.utc)
+    return next_scheduled_at
+
+
+# Work claiming
+# Workers lease posts before processing them so several replicas of the same worker
+# can poll the same queue without picking up the same post twice.
+def make_worker_id(kind: str) -> str:
+    return f"{kind}@{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_posts(db: Session, worker_id: str, *clauses, limit: int = 5, order_by=None, lease_seconds: Optional[int] = None, post_ids: Optional[List[int]] = None) -> List[Post]:
+    """Atomically lease up to `limit` posts matching `clauses` to `worker_id`.
+    
+    Candidate rows are locked with FOR UPDATE SKIP LOCKED, so concurrent claimers never
+    block each other or get the same row, and rows under another worker's unexpired lease
+    are ignored. If a worker dies mid-batch its posts become claimable again when the
+    lease expires. Call release_posts() once the batch is done.
+    
+    `post_ids` restricts the claim to specific posts (e.g. ids handed over by job_queue);
+    they are still only claimed if they match `clauses`.
+    """
+    now = datetime.now(timezone.utc)
+    if post_ids is not None:
+        if not post_ids:
+            return []
+        clauses = clauses + (Post.id.in_(post_ids),)
+        limit = max(limit, len(post_ids))
+    lease = timedelta(seconds=lease_seconds or settings.post_claim_lease_seconds)
+    order_by = order_by if order_by is not None else Post.id
+    
+    candidates = (
+        select(Post.id)
+        .where(*clauses, or_(Post.claim_expires_at.is_(None), Post.claim_expires_at < now))
+        .order_by(order_by)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed_ids = db.execute(
+        update(Post)
+        .where(Post.id.in_(candidates.scalar_subquery()))
+        .values(claimed_by=worker_id, claim_expires_at=now + lease)
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    
+    if not claimed_ids:
+        return []
+    return db.query(Post).filter(Post.id.in_(claimed_ids)).order_by(order_by).populate_existing().all()
+
+
+def release_posts(db: Session, posts: List[Post]):
+    """Drop the lease on posts returned by claim_posts()."""
+    if not posts:
+        return
+    db.rollback()  # a failed post may have left the session mid-transaction
+    db.execute(
+        update(Post)
+        .where(Post.id.in_([post.id for post in posts]))
+        .values(claimed_by=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def claim_posts_for_classification(db: Session, worker_id: str, limit: int = 5, post_ids: Optional[List[int]] = None) -> List[Post]:
+    return claim_posts(
+        db, worker_id,
+        Post.status == PostStatus.SCRAPED,
+        Post.llm_classification_confidence.is_(None),
+        limit=limit,
+        post_ids=post_ids
+    )
+
+
+def claim_pending_posts(db: Session, worker_id: str, limit: int = 5, post_ids: Optional[List[int]] = None) -> List[Post]:
+    """Pending posts that have not been processed yet."""
+    return claim_posts(
+        db, worker_id,
+        Post.status == PostStatus.PENDING,
+        Post.processed_at.is_(None),
+        limit=limit,
+        post_ids=post_ids
+    )
+
+
+def claim_posts_for_channel_rewrite(db: Session, worker_id: str, limit: int = 5, post_ids: Optional[List[int]] = None) -> List[Post]:
+    """Classified posts that still need rewriting with their target channel's prompt."""
+    return claim_posts(
+        db, worker_id,
+        Post.status == PostStatus.PROCESSED,
+        Post.target_channel_id.isnot(None),
+        Post.llm_classification_confidence.isnot(None),
+        or_(Post.processed_text.is_(None), Post.processed_text == ''),
+        limit=limit,
+        post_ids=post_ids
+    )
+
+
+def claim_scheduled_posts(db: Session, worker_id: str, limit: int = 5, post_ids: Optional[List[int]] = None) -> List[Post]:
+    """Scheduled posts that are due (scheduled_at <= now), oldest schedule first."""
+    return claim_posts(
+        db, worker_id,
+        Post.status == PostStatus.SCHEDULED,
+        Post.scheduled_at <= datetime.now(timezone.utc),
+        limit=limit,
+        order_by=Post.scheduled_at,
+        post_ids=post_ids
+    )
+
+
+def claim_publishing_posts(db: Session, worker_id: str, limit: int = 5, post_ids: Optional[List[int]] = None) -> List[Post]:
+    """Posts marked for immediate publishing."""
+    return claim_posts(db, worker_id, Post.status == PostStatus.PUBLISHING, limit=limit, post_ids=post_ids)
+
+
 # Settings CRUD
 def get_setting(db: Session, key: str) -> Optional[Settings]:
     return db.query(Settings).filter(Settings.key == key).first()
@@ -500,6 +762,7 @@ def create_setting(db: Session, setting: SettingCreate) -> Settings:
     db.add(db_setting)
     db.commit()
     db.refresh(db_setting)
+    settings_cache.invalidate(db_setting.key)
     return db_setting
 
 
@@ -514,6 +777,7 @@ def update_setting(db: Session, key: str, setting_update: SettingUpdate) -> Opti
     
     db.commit()
     db.refresh(db_setting)
+    settings_cache.invalidate(key)
     return db_setting
 
 
@@ -532,10 +796,31 @@ def upsert_setting(db: Session, key: str, value: str, description: Optional[str]
     
     db.commit()
     db.refresh(db_setting)
+    settings_cache.invalidate(key)
     return db_setting
 
 
 # Worker Status CRUD
+def apply_service_status(service_status, should_run: bool = None, is_running: bool = None, heartbeat: bool = False):
+    """Apply should_run / is_running / heartbeat changes to any *_status row (sync and async callers)."""
+    if should_run is not None:
+        service_status.should_run = should_run
+        if should_run and not service_status.is_running:
+            service_status.started_at = datetime.now(timezone.utc)
+        elif not should_run and service_status.is_running:
+            service_status.stopped_at = datetime.now(timezone.utc)
+    
+    if is_running is not None:
+        service_status.is_running = is_running
+        if is_running:
+            service_status.started_at = datetime.now(timezone.utc)
+        else:
+            service_status.stopped_at = datetime.now(timezone.utc)
+    
+    if heartbeat:
+        service_status.last_heartbeat = datetime.now(timezone.utc)
+
+
 def get_worker_status(db: Session) -> Optional[WorkerStatus]:
     return db.query(WorkerStatus).first()
 
@@ -553,22 +838,7 @@ def get_or_create_worker_status(db: Session) -> WorkerStatus:
 def update_worker_status(db: Session, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> WorkerStatus:
     worker_status = get_or_create_worker_status(db)
     
-    if should_run is not None:
-        worker_status.should_run = should_run
-        if should_run and not worker_status.is_running:
-            worker_status.started_at = datetime.now(timezone.utc)
-        elif not should_run and worker_status.is_running:
-            worker_status.stopped_at = datetime.now(timezone.utc)
-    
-    if is_running is not None:
-        worker_status.is_running = is_running
-        if is_running:
-            worker_status.started_at = datetime.now(timezone.utc)
-        else:
-            worker_status.stopped_at = datetime.now(timezone.utc)
-    
-    if heartbeat:
-        worker_status.last_heartbeat = datetime.now(timezone.utc)
+    apply_service_status(worker_status, should_run=should_run, is_running=is_running, heartbeat=heartbeat)
     
     db.commit()
     db.refresh(worker_status)
@@ -593,22 +863,7 @@ def get_or_create_scrapper_status(db: Session) -> ScrapperStatus:
 def update_scrapper_status(db: Session, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> ScrapperStatus:
     scrapper_status = get_or_create_scrapper_status(db)
     
-    if should_run is not None:
-        scrapper_status.should_run = should_run
-        if should_run and not scrapper_status.is_running:
-            scrapper_status.started_at = datetime.now(timezone.utc)
-        elif not should_run and scrapper_status.is_running:
-            scrapper_status.stopped_at = datetime.now(timezone.utc)
-    
-    if is_running is not None:
-        scrapper_status.is_running = is_running
-        if is_running:
-            scrapper_status.started_at = datetime.now(timezone.utc)
-        else:
-            scrapper_status.stopped_at = datetime.now(timezone.utc)
-    
-    if heartbeat:
-        scrapper_status.last_heartbeat = datetime.now(timezone.utc)
+    apply_service_status(scrapper_status, should_run=should_run, is_running=is_running, heartbeat=heartbeat)
     
     db.commit()
     db.refresh(scrapper_status)
@@ -633,22 +888,7 @@ def get_or_create_publisher_status(db: Session) -> PublisherStatus:
 def update_publisher_status(db: Session, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> PublisherStatus:
     publisher_status = get_or_create_publisher_status(db)
     
-    if should_run is not None:
-        publisher_status.should_run = should_run
-        if should_run and not publisher_status.is_running:
-            publisher_status.started_at = datetime.now(timezone.utc)
-        elif not should_run and publisher_status.is_running:
-            publisher_status.stopped_at = datetime.now(timezone.utc)
-    
-    if is_running is not None:
-        publisher_status.is_running = is_running
-        if is_running:
-            publisher_status.started_at = datetime.now(timezone.utc)
-        else:
-            publisher_status.stopped_at = datetime.now(timezone.utc)
-    
-    if heartbeat:
-        publisher_status.last_heartbeat = datetime.now(timezone.utc)
+    apply_service_status(publisher_status, should_run=should_run, is_running=is_running, heartbeat=heartbeat)
     
     db.commit()
     db.refresh(publisher_status)
@@ -751,22 +991,7 @@ def get_or_create_llm_worker_status(db: Session) -> LLMWorkerStatus:
 def update_llm_worker_status(db: Session, should_run: bool = None, is_running: bool = None, heartbeat: bool = False) -> LLMWorkerStatus:
     llm_worker_status = get_or_create_llm_worker_status(db)
     
-    if should_run is not None:
-        llm_worker_status.should_run = should_run
-        if should_run and not llm_worker_status.is_running:
-            llm_worker_status.started_at = datetime.now(timezone.utc)
-        elif not should_run and llm_worker_status.is_running:
-            llm_worker_status.stopped_at = datetime.now(timezone.utc)
-    
-    if is_running is not None:
-        llm_worker_status.is_running = is_running
-        if is_running:
-            llm_worker_status.started_at = datetime.now(timezone.utc)
-        else:
-            llm_worker_status.stopped_at = datetime.now(timezone.utc)
-    
-    if heartbeat:
-        llm_worker_status.last_heartbeat = datetime.now(timezone.utc)
+    apply_service_status(llm_worker_status, should_run=should_run, is_running=is_running, heartbeat=heartbeat)
     
     db.commit()
     db.refresh(llm_worker_status)
@@ -774,17 +999,30 @@ def update_llm_worker_status(db: Session, should_run: bool = None, is_running: b
 
 
 # Dashboard stats
+def dashboard_stats_query():
+    """All dashboard counters in one round trip: FILTER aggregates over posts plus channel subqueries.
+    
+    posts_today uses a UTC [midnight, midnight + 1 day) range on created_at rather than
+    date(created_at) so the (status, created_at) / (created_at, id) indexes stay usable.
+    """
+    day_start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    day_end = day_start + timedelta(days=1)
+    
+    def channel_count(model, *clauses):
+        return select(func.count()).select_from(model).where(*clauses).scalar_subquery()
+    
+    return select(
+        channel_count(SourceChannel).label("total_source_channels"),
+        channel_count(SourceChannel, SourceChannel.is_active == True).label("active_source_channels"),
+        channel_count(TargetChannel).label("total_target_channels"),
+        channel_count(TargetChannel, TargetChannel.is_active == True).label("active_target_channels"),
+        func.count().filter(Post.status == PostStatus.PENDING).label("pending_posts"),
+        func.count().filter(Post.status == PostStatus.APPROVED).label("approved_posts"),
+        func.count().filter(Post.status == PostStatus.REJECTED).label("rejected_posts"),
+        func.count().filter(Post.status == PostStatus.PUBLISHED).label("published_posts"),
+        func.count().filter(Post.created_at >= day_start, Post.created_at < day_end).label("posts_today"),
+    ).select_from(Post)
+
+
 def get_dashboard_stats(db: Session) -> Dict[str, Any]:
-    today = datetime.now(timezone.utc).date()
-    
-    return {
-        "total_source_channels": db.query(SourceChannel).count(),
-        "active_source_channels": db.query(SourceChannel).filter(SourceChannel.is_active == True).count(),
-        "total_target_channels": db.query(TargetChannel).count(),
-        "active_target_channels": db.query(TargetChannel).filter(TargetChannel.is_active == True).count(),
-        "pending_posts": db.query(Post).filter(Post.status == PostStatus.PENDING).count(),
-        "approved_posts": db.query(Post).filter(Post.status == PostStatus.APPROVED).count(),
-        "rejected_posts": db.query(Post).filter(Post.status == PostStatus.REJECTED).count(),
-        "published_posts": db.query(Post).filter(Post.status == PostStatus.PUBLISHED).count(),
-        "posts_today": db.query(Post).filter(func.date(Post.created_at) == today).count(),
-    }
\ No newline at end of file
+    return dict(db.execute(dashboard_stats_query()).one()._mapping)
\ No newline at end of file
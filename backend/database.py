@@ -1,17 +1,196 @@
-from sqlalchemy import create_engine
+import time
+import threading
+from typing import Dict, Any
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from config import settings
 
-engine = create_engine(settings.database_url)
+# (pool_size, max_overflow) per process type for the sync and async engines.
+# Every process imports both engines but only opens connections on the ones it uses,
+# so Postgres max_connections can be sized as sum(replicas * (pool_size + max_overflow)).
+# DB_POOL_SIZE / DB_MAX_OVERFLOW override the "primary" engine of the profile.
+DB_POOL_PROFILES = {
+    "api": {"primary": "async", "sync": (2, 3), "async": (10, 10)},
+    "scrapper": {"primary": "sync", "sync": (3, 2), "async": (1, 0)},
+    "publisher": {"primary": "sync", "sync": (2, 2), "async": (1, 0)},
+    "llm_worker": {"primary": "sync", "sync": (4, 4), "async": (1, 0)},
+    "worker": {"primary": "sync", "sync": (3, 2), "async": (1, 0)},
+}
+
+
+class PoolMetrics:
+    """Checkout/wait/hold counters for one connection pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.hold_total = 0.0
+        self.hold_max = 0.0
+        self.checkins = 0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def record_hold(self, seconds: float):
+        with self._lock:
+            self.checkins += 1
+            self.hold_total += seconds
+            self.hold_max = max(self.hold_max, seconds)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "avg_wait_ms": round(self.wait_total / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.wait_max * 1000, 2),
+                "avg_hold_ms": round(self.hold_total / self.checkins * 1000, 2) if self.checkins else 0.0,
+                "max_hold_ms": round(self.hold_max * 1000, 2),
+            }
+        if isinstance(pool, QueuePool):
+            stats.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+            })
+        return stats
+
+
+pool_metrics: Dict[str, PoolMetrics] = {
+    "sync": PoolMetrics("sync"),
+    "async": PoolMetrics("async"),
+}
+
+
+class _TimedGetMixin:
+    """Measure how long callers wait for a connection to come out of the pool."""
+    metrics: PoolMetrics = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            if self.metrics is not None:
+                self.metrics.record_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedGetMixin, QueuePool):
+    metrics = pool_metrics["sync"]
+
+
+class TimedAsyncAdaptedQueuePool(_TimedGetMixin, AsyncAdaptedQueuePool):
+    metrics = pool_metrics["async"]
+
+
+def _make_async_url(url: str) -> str:
+    """Map a sync database URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    if url.startswith("postgresql+psycopg2://"):
+        return url.replace("postgresql+psycopg2://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def _engine_options(url: str, kind: str) -> Dict[str, Any]:
+    """Pool and connection options for the current DB_POOL_PROFILE ('sync' or 'async' engine)."""
+    if url.startswith("sqlite"):
+        return {}
+    
+    profile = DB_POOL_PROFILES.get(settings.db_pool_profile, DB_POOL_PROFILES["api"])
+    pool_size, max_overflow = profile[kind]
+    if kind == profile["primary"]:
+        if settings.db_pool_size is not None:
+            pool_size = settings.db_pool_size
+        if settings.db_max_overflow is not None:
+            max_overflow = settings.db_max_overflow
+    
+    options = {
+        "poolclass": TimedAsyncAdaptedQueuePool if kind == "async" else TimedQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+    
+    if settings.db_statement_timeout_ms and url.startswith("postgres"):
+        if kind == "async":
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(settings.db_statement_timeout_ms)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={settings.db_statement_timeout_ms}"}
+    
+    return options
+
+
+def _instrument(pool, metrics: PoolMetrics):
+    @event.listens_for(pool, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        metrics.connects += 1
+
+    @event.listens_for(pool, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+
+    @event.listens_for(pool, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is not None:
+            metrics.record_hold(time.perf_counter() - checked_out_at)
+
+    @event.listens_for(pool, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        metrics.invalidations += 1
+
+
+engine = create_engine(settings.database_url, **_engine_options(settings.database_url, "sync"))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+_async_url = settings.async_database_url or _make_async_url(settings.database_url)
+async_engine = create_async_engine(_async_url, **_engine_options(_async_url, "async"))
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+_instrument(engine.pool, pool_metrics["sync"])
+_instrument(async_engine.sync_engine.pool, pool_metrics["async"])
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Pool sizing and checkout/wait metrics for both engines of this process."""
+    return {
+        "profile": settings.db_pool_profile,
+        "sync": pool_metrics["sync"].snapshot(engine.pool),
+        "async": pool_metrics["async"].snapshot(async_engine.sync_engine.pool),
+    }
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,82 @@
+"""Process-wide pooled HTTP client for OpenRouter calls.
+
+Opening an httpx.AsyncClient per request pays a TCP + TLS handshake every time. Instead
+each process (API, LLM workers) keeps one client with keep-alive connections, opened at
+startup and closed on shutdown. HTTP/2 is used when the `h2` package is installed
+(httpx[http2]); otherwise the client falls back to HTTP/1.1 keep-alive.
+
+Completion requests go through `post`, which applies the request budget, retries and
+circuit breaker from llm_throttle.py.
+"""
+import logging
+from typing import Optional
+
+import httpx
+
+from config import settings
+from llm_throttle import llm_throttle
+
+logger = logging.getLogger(__name__)
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class LLMHttpClient:
+    def __init__(self):
+        self.client: Optional[httpx.AsyncClient] = None
+    
+    def open(self) -> httpx.AsyncClient:
+        """Create the shared client (idempotent)."""
+        if self.client is not None and not self.client.is_closed:
+            return self.client
+    
+        http2 = settings.llm_http2
+        if http2 and not _http2_available():
+            logger.warning("h2 is not installed, OpenRouter client falls back to HTTP/1.1")
+            http2 = False
+    
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(settings.llm_http_timeout, connect=settings.llm_http_connect_timeout),
+            limits=httpx.Limits(
+                max_connections=settings.llm_http_max_connections,
+                max_keepalive_connections=settings.llm_http_max_keepalive_connections,
+                keepalive_expiry=settings.llm_http_keepalive_expiry,
+            ),
+        )
+        logger.info(
+            f"🌐 OpenRouter HTTP client opened (http2={http2}, "
+            f"max_connections={settings.llm_http_max_connections})"
+        )
+        return self.client
+    
+    def get(self) -> httpx.AsyncClient:
+        """Shared client, opened on first use if startup did not open it."""
+        return self.open()
+    
+    async def post(
+        self, url: str, max_retries: Optional[int] = None, stream: bool = False, **kwargs
+    ) -> httpx.Response:
+        """POST through the shared throttle; raises LLMUnavailableError when it gives up.
+    
+        With `stream` the body is left unread and the caller must close the response.
+        """
+        return await llm_throttle.request(self.get(), "POST", url, max_retries=max_retries, stream=stream, **kwargs)
+    
+    async def close(self):
+        if self.client is None:
+            return
+        try:
+            await self.client.aclose()
+        except Exception as e:
+            logger.warning(f"Error closing OpenRouter HTTP client: {e}")
+        self.client = None
+
+
+llm_http_client = LLMHttpClient()
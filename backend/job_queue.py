@@ -0,0 +1,213 @@
+"""Redis Streams hand-off between pipeline stages.
+
+Producers append post ids to a stream named after the status the post just entered
+(contentflow:posts:scraped, :pending, :processed, :publishing, :scheduled). Each worker type
+reads its streams through a consumer group, acks once the batch is handled, and takes over
+messages another consumer left unacked for longer than JOB_REDELIVERY_SECONDS (e.g. it
+crashed).
+
+A message only says which post to look at: the row is still claimed through crud.claim_*
+before any work is done, so duplicate or stale messages are harmless. When Redis is
+unreachable producers skip the enqueue and consumers fall back to the NOTIFY/poll wait
+(notifications.py); the periodic database poll picks up anything the streams missed.
+"""
+import logging
+import time
+from typing import Iterable, List, NamedTuple, Optional
+
+from config import settings
+from models import PostStatus
+from notifications import MIN_WAIT, Subscription
+
+logger = logging.getLogger(__name__)
+
+STREAM_PREFIX = "contentflow:posts:"
+# Statuses a worker picks up; posts entering other statuses are not queued.
+# A scheduled message wakes the publisher to recompute its next deadline.
+QUEUED_STATUSES = (
+    PostStatus.SCRAPED, PostStatus.PENDING, PostStatus.PROCESSED, PostStatus.PUBLISHING, PostStatus.SCHEDULED
+)
+RECONNECT_INTERVAL = 30  # seconds between reconnect attempts
+AUTOCLAIM_INTERVAL = 30  # seconds between scans for abandoned messages
+
+
+class Job(NamedTuple):
+    status: str
+    message_id: str
+    post_id: int
+
+
+def _status_value(status) -> str:
+    return status.value if isinstance(status, PostStatus) else str(status)
+
+
+def _stream(status) -> str:
+    return STREAM_PREFIX + _status_value(status)
+
+
+class PostQueue:
+    def __init__(self, url: str, enabled: bool = True):
+        self.url = url
+        self.enabled = enabled
+        self.redis = None
+        self._groups = set()
+        self._last_attempt = 0.0
+        self._last_autoclaim = {}
+    
+    async def _client(self):
+        """Connected client, or None while Redis is unavailable (retried every RECONNECT_INTERVAL)."""
+        if not self.enabled:
+            return None
+        if self.redis is not None:
+            return self.redis
+        if time.monotonic() - self._last_attempt < RECONNECT_INTERVAL:
+            return None
+        self._last_attempt = time.monotonic()
+    
+        try:
+            import redis.asyncio as aioredis
+            client = aioredis.from_url(self.url, decode_responses=True)
+            await client.ping()
+            self.redis = client
+            logger.info("Connected to Redis job queue")
+        except Exception as e:
+            logger.warning(f"Redis job queue unavailable, falling back to database polling: {str(e)}")
+        return self.redis
+    
+    async def _disconnect(self, error: Exception):
+        logger.warning(f"Redis job queue error, falling back to database polling: {str(error)}")
+        client, self.redis = self.redis, None
+        self._groups.clear()
+        self._last_attempt = time.monotonic()
+        if client is not None:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+    
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+    
+    async def enqueue(self, status, post_ids: Iterable[int]):
+        """Hand posts that just entered `status` to the workers consuming it."""
+        post_ids = list(post_ids)
+        if not post_ids or _status_value(status) not in {s.value for s in QUEUED_STATUSES}:
+            return
+        client = await self._client()
+        if client is None:
+            return
+    
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for post_id in post_ids:
+                    pipe.xadd(_stream(status), {"post_id": str(post_id)}, maxlen=settings.job_stream_maxlen, approximate=True)
+                await pipe.execute()
+        except Exception as e:
+            await self._disconnect(e)
+    
+    async def _ensure_group(self, client, group: str, status):
+        key = (group, _status_value(status))
+        if key in self._groups:
+            return
+        try:
+            await client.xgroup_create(_stream(status), group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._groups.add(key)
+    
+    async def _autoclaim(self, client, group: str, consumer: str, statuses, count: int) -> List[Job]:
+        """Take over messages another consumer of the group left unacked for too long."""
+        jobs = []
+        min_idle_ms = settings.job_redelivery_seconds * 1000
+        for status in statuses:
+            key = (group, _status_value(status))
+            if time.monotonic() - self._last_autoclaim.get(key, 0.0) < AUTOCLAIM_INTERVAL:
+                continue
+            self._last_autoclaim[key] = time.monotonic()
+    
+            result = await client.xautoclaim(_stream(status), group, consumer, min_idle_ms, start_id="0-0", count=count)
+            for message_id, fields in result[1]:
+                if fields:
+                    jobs.append(Job(_status_value(status), message_id, int(fields["post_id"])))
+        if jobs:
+            logger.info(f"Redelivering {len(jobs)} abandoned job(s) to {consumer}")
+        return jobs
+    
+    async def read(self, group: str, consumer: str, statuses, count: int = 5, block_seconds: float = 0) -> Optional[List[Job]]:
+        """Next batch for this consumer, blocking up to `block_seconds`.
+    
+        Returns None (rather than an empty list) when Redis is unavailable.
+        """
+        client = await self._client()
+        if client is None:
+            return None
+    
+        try:
+            for status in statuses:
+                await self._ensure_group(client, group, status)
+    
+            jobs = await self._autoclaim(client, group, consumer, statuses, count)
+            if jobs:
+                return jobs
+    
+            block_ms = int(block_seconds * 1000)
+            response = await client.xreadgroup(
+                group, consumer,
+                {_stream(status): ">" for status in statuses},
+                count=count,
+                block=block_ms if block_ms > 0 else None
+            )
+        except Exception as e:
+            await self._disconnect(e)
+            return None
+    
+        jobs = []
+        for stream, messages in response or []:
+            status = stream[len(STREAM_PREFIX):]
+            for message_id, fields in messages:
+                jobs.append(Job(status, message_id, int(fields["post_id"])))
+        return jobs
+    
+    async def ack(self, group: str, jobs: List[Job]):
+        if not jobs or self.redis is None:
+            return
+        try:
+            for status in {job.status for job in jobs}:
+                await self.redis.xack(_stream(status), group, *[job.message_id for job in jobs if job.status == status])
+        except Exception as e:
+            await self._disconnect(e)
+    
+    async def next_jobs(self, group: str, consumer: str, statuses, subscription: Subscription,
+                        poll_interval: float, max_wait: Optional[float] = None, count: int = 5,
+                        wait: bool = True) -> List[Job]:
+        """Wait for the next batch of work for a worker loop.
+    
+        With Redis, blocks on the streams for up to the fallback poll interval (capped by
+        `max_wait`, floored at MIN_WAIT). Without it, waits on the NOTIFY subscription /
+        poll interval instead. An empty list means the caller should poll the database.
+        `wait=False` (a backlogged worker) reads whatever is queued and returns at once.
+        """
+        if not wait:
+            return await self.read(group, consumer, statuses, count=count) or []
+        
+        block_seconds = max(poll_interval, settings.notify_fallback_poll_seconds)
+        if max_wait is not None:
+            # An overdue deadline (max_wait <= 0) would make XREADGROUP return at once
+            max_wait = max(max_wait, MIN_WAIT)
+            block_seconds = min(block_seconds, max_wait)
+    
+        jobs = await self.read(group, consumer, statuses, count=count, block_seconds=block_seconds)
+        if jobs is None:
+            await subscription.wait(poll_interval, max_wait=max_wait)
+            return []
+        return jobs
+
+
+def job_post_ids(jobs: List[Job], status) -> List[int]:
+    return [job.post_id for job in jobs if job.status == _status_value(status)]
+
+
+post_queue = PostQueue(settings.redis_url, enabled=settings.job_queue_enabled)
@@ -0,0 +1,216 @@
+"""Content-addressed cache for LLM classification results and rewrites.
+
+The same news text is often reposted by several monitored channels. Responses are keyed by
+a hash of the normalized text plus the model, the prompt template and (for classification)
+the target channel set, so editing a prompt or a channel simply misses instead of needing
+explicit invalidation.
+
+Entries live in Redis, shared by the API and the workers and kept across restarts, with an
+in-process TTLCache in front. Redis entries expire after LLM_CACHE_TTL seconds and the oldest
+are evicted once more than LLM_CACHE_MAXSIZE are stored. Without Redis only the in-process
+layer is used.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+import unicodedata
+from typing import Any, Dict, Optional
+
+from cache import TTLCache
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "contentflow:llm:"
+INDEX_KEY = KEY_PREFIX + "index"  # sorted set of entry keys scored by insertion time
+STATS_KEY = KEY_PREFIX + "stats"  # hit/miss counters summed over all processes, pushed in batches
+LOCAL_MAXSIZE = 1024
+RECONNECT_INTERVAL = 30  # seconds between reconnect attempts
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Form of a post text used for hashing: NFKC, collapsed whitespace, trimmed."""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text or "")).strip()
+
+
+def content_hash(value: Any) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def cache_key(kind: str, text: str, model: str, prompt_template: str, channels: Any = None) -> str:
+    """Key for one LLM response: (normalized text, model, prompt template, channel set)."""
+    parts = (
+        content_hash(normalize_text(text)),
+        model or "",
+        content_hash(prompt_template),
+        content_hash(channels) if channels is not None else "",
+    )
+    return f"{KEY_PREFIX}{kind}:{content_hash('|'.join(parts))}"
+
+
+class LLMResponseCache:
+    def __init__(self, url: str, enabled: bool = True, ttl: int = 604800, maxsize: int = 50000):
+        self.url = url
+        self.enabled = enabled
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.local = TTLCache(ttl=ttl, maxsize=min(maxsize, LOCAL_MAXSIZE))
+        self.redis = None
+        self._last_attempt = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._unshared = {"hits": 0, "misses": 0}  # counted here, not yet added to STATS_KEY
+    
+    async def _client(self):
+        """Connected client, or None while Redis is unavailable (retried every RECONNECT_INTERVAL)."""
+        if self.redis is not None:
+            return self.redis
+        if time.monotonic() - self._last_attempt < RECONNECT_INTERVAL:
+            return None
+        self._last_attempt = time.monotonic()
+    
+        try:
+            import redis.asyncio as aioredis
+            client = aioredis.from_url(self.url, decode_responses=True)
+            await client.ping()
+            self.redis = client
+            logger.info("Connected to Redis LLM response cache")
+        except Exception as e:
+            logger.warning(f"Redis LLM response cache unavailable, using the in-process cache only: {str(e)}")
+        return self.redis
+    
+    async def _disconnect(self, error: Exception):
+        logger.warning(f"Redis LLM response cache error, using the in-process cache only: {str(error)}")
+        client, self.redis = self.redis, None
+        self._last_attempt = time.monotonic()
+        if client is not None:
+            try:
+                await client.aclose()
+            except Exception:
+                pass
+    
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
+            self.redis = None
+    
+    def _count(self, field: str):
+        setattr(self, field, getattr(self, field) + 1)
+        self._unshared[field] += 1
+    
+    def _share_counts(self, pipe) -> Dict[str, int]:
+        """Queue this process's unshared hit/miss counts on `pipe`; returns what was queued."""
+        queued, self._unshared = self._unshared, {"hits": 0, "misses": 0}
+        for field, count in queued.items():
+            if count:
+                pipe.hincrby(STATS_KEY, field, count)
+        return queued
+    
+    def _unshare(self, queued: Dict[str, int]):
+        """Put counts back after the pipeline that carried them failed."""
+        for field, count in queued.items():
+            self._unshared[field] += count
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Cached response for `key`, or None.
+        
+        A hit in the in-process layer never touches Redis. The shared counters are
+        updated in batch, piggybacked on the next request that goes to Redis anyway.
+        """
+        if not self.enabled:
+            return None
+    
+        value = self.local.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+    
+        client = await self._client()
+        if client is not None:
+            queued = None
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.get(key)
+                    queued = self._share_counts(pipe)
+                    raw = (await pipe.execute())[0]
+                    queued = None
+                if raw is not None:
+                    value = json.loads(raw)
+                    self.local.set(key, value)
+            except Exception as e:
+                if queued:
+                    self._unshare(queued)
+                await self._disconnect(e)
+    
+        self._count("hits" if value is not None else "misses")
+        return value
+    
+    async def set(self, key: str, value: Any):
+        if not self.enabled or value is None:
+            return
+        self.local.set(key, value)
+    
+        client = await self._client()
+        if client is None:
+            return
+        try:
+            now = time.time()
+            async with client.pipeline(transaction=False) as pipe:
+                pipe.set(key, json.dumps(value, ensure_ascii=False), ex=self.ttl)
+                pipe.zadd(INDEX_KEY, {key: now})
+                pipe.zremrangebyscore(INDEX_KEY, "-inf", now - self.ttl)  # already expired in Redis
+                pipe.zcard(INDEX_KEY)
+                size = (await pipe.execute())[-1]
+    
+            # Size bound: drop the oldest entries beyond maxsize
+            if size > self.maxsize:
+                evicted = await client.zpopmin(INDEX_KEY, size - self.maxsize)
+                if evicted:
+                    await client.delete(*[entry_key for entry_key, _ in evicted])
+        except Exception as e:
+            await self._disconnect(e)
+    
+    async def stats(self) -> Dict[str, Any]:
+        """Counters of this process plus the shared Redis counters and size."""
+        result = {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "maxsize": self.maxsize,
+            "process": {"hits": self.hits, "misses": self.misses},
+            "local": self.local.stats(),
+            "shared": None,
+        }
+        client = await self._client() if self.enabled else None
+        if client is not None:
+            queued = None
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    queued = self._share_counts(pipe)
+                    pipe.hgetall(STATS_KEY)
+                    pipe.zcard(INDEX_KEY)
+                    counters, size = (await pipe.execute())[-2:]
+                    queued = None
+                result["shared"] = {
+                    "hits": int(counters.get("hits", 0)),
+                    "misses": int(counters.get("misses", 0)),
+                    "size": size,
+                }
+            except Exception as e:
+                if queued:
+                    self._unshare(queued)
+                await self._disconnect(e)
+        return result
+
+
+llm_response_cache = LLMResponseCache(
+    settings.redis_url,
+    enabled=settings.llm_cache_enabled,
+    ttl=settings.llm_cache_ttl,
+    maxsize=settings.llm_cache_maxsize,
+)
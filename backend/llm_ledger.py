@@ -0,0 +1,229 @@
+"""Token, cost and latency ledger of LLM requests (table llm_calls).
+
+model_router records every attempt it makes: model, HTTP status, latency and the `usage`
+block of the response (OpenRouter adds `cost` to it because requests ask for usage
+accounting). Callers that know which posts a request is for wrap it in `track()`:
+
+    with llm_ledger.track("classification", post_ids=[post.id]) as call:
+        response = await classifier.classify_post(...)
+        call.set_channel(post.id, channel_id)
+
+Attempts made inside the block are then written once per post, with tokens and cost
+split evenly across the batch; without a block they are written as one row without a
+post. A block that made no request but was answered from the LLM cache (`mark_cache_hit`)
+writes cache rows, so cache hit rates and saved spend can be read off the same table.
+
+Rows are kept in memory and inserted in one statement every LLM_LEDGER_FLUSH_SECONDS or
+every LLM_LEDGER_BATCH_SIZE rows, from a thread, so the LLM path never waits on the
+database. Processes call `close()` on shutdown to write what is left.
+"""
+import asyncio
+import contextvars
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+
+from config import settings
+from database import SessionLocal
+from models import LLMCall
+
+logger = logging.getLogger(__name__)
+
+MAX_BUFFER = 10000  # rows kept while the database is unreachable; older ones are dropped
+
+_current: contextvars.ContextVar[Optional["TrackedCall"]] = contextvars.ContextVar("llm_call", default=None)
+
+
+class TrackedCall:
+    """Posts, target channels and attempts of one logical LLM call (see `LLMLedger.track`)."""
+    
+    def __init__(self, task: str, post_ids: Iterable[int], channel_id: Optional[int] = None):
+        self.task = task
+        self.post_ids = list(post_ids)
+        self.channels: Dict[int, Optional[int]] = {post_id: channel_id for post_id in self.post_ids}
+        self.channel_id = channel_id  # for a call without posts
+        self.attempts: List[Dict[str, Any]] = []
+        self.cache_model: Optional[str] = None
+    
+    def set_channel(self, post_id: int, channel_id: Optional[int]):
+        """Target channel a post was classified into, once it is known."""
+        if post_id in self.channels:
+            self.channels[post_id] = channel_id
+    
+    def mark_cache_hit(self, model: Optional[str]):
+        self.cache_model = model
+
+
+class LLMLedger:
+    def __init__(self, enabled: bool = True, flush_seconds: float = 5.0, batch_size: int = 200):
+        self.enabled = enabled
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.buffer: List[Dict[str, Any]] = []
+        self.written = 0
+        self.dropped = 0
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushing: Optional[asyncio.Task] = None
+    
+    @contextmanager
+    def track(self, task: str, post_ids: Iterable[int] = (), channel_id: Optional[int] = None):
+        """Attribute the LLM requests made inside the block to `post_ids`."""
+        call = TrackedCall(task, post_ids, channel_id)
+        token = _current.set(call)
+        try:
+            yield call
+        finally:
+            _current.reset(token)
+            self._finish(call)
+    
+    def mark_cache_hit(self, model: Optional[str]):
+        """The current tracked call was answered from the LLM response cache."""
+        call = _current.get()
+        if call is not None:
+            call.mark_cache_hit(model)
+    
+    def record_cache_hits(self, task: str, model: Optional[str], channels: Dict[int, Optional[int]]):
+        """Posts of a batch that were answered from the cache, post id -> target channel id."""
+        if channels:
+            self._add_rows(task, channels, self._cache_attempt(model))
+    
+    def record_attempt(
+        self,
+        task: str,
+        model: str,
+        latency: float,
+        outcome: str,
+        status_code: Optional[int] = None,
+        usage: Optional[Dict[str, Any]] = None,
+    ):
+        """One request to one model, called by model_router."""
+        usage = usage or {}
+        attempt = {
+            "model": model,
+            "prompt_tokens": usage.get("prompt_tokens"),
+            "completion_tokens": usage.get("completion_tokens"),
+            "cost": usage.get("cost"),
+            "latency_ms": round(latency * 1000),
+            "cache_hit": False,
+            "outcome": outcome,
+            "status_code": status_code,
+        }
+        call = _current.get()
+        if call is not None:
+            call.attempts.append(attempt)
+        else:
+            self._add_rows(task, {None: None}, attempt)
+    
+    @staticmethod
+    def _cache_attempt(model: Optional[str]) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cost": 0.0,
+            "latency_ms": 0,
+            "cache_hit": True,
+            "outcome": "cache",
+            "status_code": None,
+        }
+    
+    def _finish(self, call: TrackedCall):
+        attempts = call.attempts
+        if not attempts and call.cache_model is not None:
+            attempts = [self._cache_attempt(call.cache_model)]
+        channels = call.channels or {None: call.channel_id}
+        for attempt in attempts:
+            self._add_rows(call.task, channels, attempt)
+    
+    def _add_rows(self, task: str, channels: Dict[Optional[int], Optional[int]], attempt: Dict[str, Any]):
+        if not self.enabled:
+            return
+        request_id = uuid.uuid4().hex
+        size = len(channels)
+    
+        def share(value, index: int):
+            if value is None:
+                return None
+            if isinstance(value, float):
+                return value / size
+            base, remainder = divmod(value, size)
+            return base + (1 if index < remainder else 0)  # the shares add up to the total
+    
+        cost = float(attempt["cost"]) if attempt["cost"] is not None else None
+        for index, (post_id, channel_id) in enumerate(channels.items()):
+            self.buffer.append({
+                **attempt,
+                "prompt_tokens": share(attempt["prompt_tokens"], index),
+                "completion_tokens": share(attempt["completion_tokens"], index),
+                "cost": share(cost, index),
+                "request_id": request_id,
+                "task": task,
+                "post_id": post_id,
+                "target_channel_id": channel_id,
+                "batch_size": size,
+            })
+        if len(self.buffer) > MAX_BUFFER:
+            overflow = len(self.buffer) - MAX_BUFFER
+            del self.buffer[:overflow]
+            self.dropped += overflow
+        self._schedule()
+    
+    def _schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # sync caller; the rows go out with the next flush or close()
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._flusher = loop.create_task(self._flush_loop())
+        if len(self.buffer) >= self.batch_size and (self._flushing is None or self._flushing.done()):
+            self._flushing = loop.create_task(self.flush())
+    
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+    
+    def _write(self, rows: List[Dict[str, Any]]):
+        db = SessionLocal()
+        try:
+            db.execute(insert(LLMCall), rows)
+            db.commit()
+        finally:
+            db.close()
+    
+    async def flush(self):
+        rows, self.buffer = self.buffer, []
+        if not rows:
+            return
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            logger.warning(f"Could not write {len(rows)} llm_calls rows, will retry: {str(e)}")
+            self.buffer[:0] = rows[-MAX_BUFFER:]
+            return
+        self.written += len(rows)
+        logger.debug(f"📒 llm_calls: {len(rows)} rows written in {time.monotonic() - started:.3f}s")
+    
+    async def close(self):
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        if self._flushing is not None and self._flushing.get_loop() is asyncio.get_running_loop():
+            await asyncio.gather(self._flushing, return_exceptions=True)
+            self._flushing = None
+        await self.flush()
+    
+    def stats(self) -> Dict[str, int]:
+        return {"buffered": len(self.buffer), "written": self.written, "dropped": self.dropped}
+
+
+llm_ledger = LLMLedger(
+    enabled=settings.llm_ledger_enabled,
+    flush_seconds=settings.llm_ledger_flush_seconds,
+    batch_size=settings.llm_ledger_batch_size,
+)
@@ -0,0 +1,254 @@
+"""Request budget, retries and circuit breaker for OpenRouter calls.
+
+All LLM requests of a process go through one `LLMThrottle`:
+
+- two token buckets keep it under LLM_REQUESTS_PER_MINUTE and LLM_TOKENS_PER_MINUTE (prompt
+  size estimated by services/prompt_budget.py, plus the requested max_tokens);
+- 429 and 5xx responses and transport errors are retried with exponential backoff and full
+  jitter, honouring Retry-After; a 429 also pauses the buckets so concurrent callers back off
+  together instead of each hitting the limit;
+- after LLM_CIRCUIT_FAILURE_THRESHOLD consecutive failures of a model (429 excluded: throttling
+  is not an outage) its circuit opens and requests to it fail fast for LLM_CIRCUIT_RESET_SECONDS,
+  then a single probe decides whether it closes again. Circuits are per model so the fallback
+  models of model_router.py stay usable while one of them is down.
+
+When a request cannot be completed, LLMUnavailableError is raised so callers can keep the
+post for a later attempt instead of treating the failure as a classification result.
+"""
+import asyncio
+import logging
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+import httpx
+
+from config import settings
+from services.prompt_budget import estimate_tokens as estimate_text_tokens
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class LLMUnavailableError(Exception):
+    """The provider could not serve the request (throttled, failing or circuit open)."""
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute up to one minute's worth."""
+    
+    def __init__(self, rate_per_minute: float):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = rate_per_minute
+        self.tokens = rate_per_minute
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    async def acquire(self, amount: float = 1):
+        if self.rate <= 0:
+            return
+        # A single request larger than the bucket would wait forever; let it drain the bucket
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+    
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+    
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+    
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._probing:
+            self._probing = True  # let exactly one request test the provider
+            return True
+        return False
+    
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("✅ OpenRouter circuit closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+    
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            logger.warning(f"🚫 OpenRouter circuit opened for {self.reset_seconds}s after {self.failures} failures")
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(payload: Optional[dict]) -> int:
+    """Rough prompt + completion size of a chat completion payload."""
+    if not payload:
+        return 1
+    prompt = sum(estimate_text_tokens(str(message.get("content", ""))) for message in payload.get("messages", []))
+    return prompt + int(payload.get("max_tokens") or 0)
+
+
+class LLMThrottle:
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        tokens_per_minute: int = 200000,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        failure_threshold: int = 5,
+        reset_seconds: float = 60,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+    
+    def _backoff(self, attempt: int) -> float:
+        cap = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, cap)  # full jitter
+    
+    def breaker(self, model: Optional[str]) -> CircuitBreaker:
+        key = model or ""
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        return self.breakers[key]
+    
+    async def request(
+        self,
+        client: httpx.AsyncClient,
+        method: str,
+        url: str,
+        max_retries: Optional[int] = None,
+        stream: bool = False,
+        **kwargs,
+    ) -> httpx.Response:
+        """Send a request within the budget, retrying throttling and server errors.
+    
+        Returns the response for success and non-retryable errors (e.g. 400/401);
+        raises LLMUnavailableError when retries are exhausted or the circuit is open.
+        `max_retries` overrides LLM_MAX_RETRIES (the router retries less before falling back).
+        With `stream` the response is returned once its headers arrive, with the body unread;
+        the caller must close it. Retries happen only before that point.
+        """
+        payload = kwargs.get("json") or {}
+        estimated = estimate_tokens(payload)
+        breaker = self.breaker(payload.get("model"))
+        max_retries = self.max_retries if max_retries is None else max_retries
+        last_error = "circuit open"
+    
+        for attempt in range(max_retries + 1):
+            if not breaker.allow():
+                raise LLMUnavailableError(f"OpenRouter circuit open ({last_error})")
+    
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated)
+    
+            delay = None
+            try:
+                if stream:
+                    response = await client.send(client.build_request(method, url, **kwargs), stream=True)
+                else:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                last_error = f"{type(e).__name__}: {str(e)}"
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    breaker.record_success()
+                    return response
+    
+                last_error = f"HTTP {response.status_code}"
+                if stream:
+                    await response.aclose()
+                delay = _retry_after(response)
+                if response.status_code == 429:
+                    # Throttled: everyone in this process waits, and the circuit stays closed
+                    breaker.record_success()
+                    pause = delay if delay is not None else self._backoff(attempt)
+                    self.requests.pause(pause)
+                    self.tokens.pause(pause)
+                else:
+                    breaker.record_failure()
+    
+            if attempt == max_retries or breaker.state == "open":
+                break
+            if delay is None:
+                delay = self._backoff(attempt)
+            delay = min(delay, self.max_delay)
+            logger.warning(f"⏳ OpenRouter {last_error}, retry {attempt + 1}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    
+        raise LLMUnavailableError(f"OpenRouter request failed after {attempt + 1} attempts ({last_error})")
+    
+    def stats(self) -> dict:
+        return {
+            "circuits": {
+                model or "default": {"state": breaker.state, "consecutive_failures": breaker.failures}
+                for model, breaker in self.breakers.items()
+            },
+            "request_tokens": round(self.requests.tokens, 1),
+            "llm_tokens": round(self.tokens.tokens, 1),
+        }
+
+
+llm_throttle = LLMThrottle(
+    requests_per_minute=settings.llm_requests_per_minute,
+    tokens_per_minute=settings.llm_tokens_per_minute,
+    max_retries=settings.llm_max_retries,
+    base_delay=settings.llm_retry_base_delay,
+    max_delay=settings.llm_retry_max_delay,
+    failure_threshold=settings.llm_circuit_failure_threshold,
+    reset_seconds=settings.llm_circuit_reset_seconds,
+)
@@ -2,11 +2,15 @@ import asyncio
 import logging
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from database import SessionLocal
+from database import SessionLocal, get_pool_metrics
 from models import Post, PostStatus
 import crud
+from notifications import notification_hub
+from job_queue import post_queue, job_post_ids
 from openrouter_service import openrouter_service
+from http_client import llm_http_client
+from llm_cache import llm_response_cache
+from llm_ledger import llm_ledger
 
 # Configure logging
 logging.basicConfig(
@@ -16,11 +20,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+QUEUE_GROUP = "llm_worker"
+
+
 class LLMWorker:
     def __init__(self):
         self.running = False
         self.tasks = set()
         self.db = SessionLocal()
+        self.worker_id = crud.make_worker_id("llm_worker")
     
     async def start(self):
         """Start the LLM worker with database control."""
@@ -69,6 +77,7 @@ class LLMWorker:
     
     async def check_database_status(self):
         """Check database for should_run flag and stop if needed."""
+        control = notification_hub.subscribe("service_control:llm_worker_status")
         while True:
             try:
                 llm_worker_status = crud.get_llm_worker_status(self.db)
@@ -77,7 +86,7 @@ class LLMWorker:
                     self.running = False
                     break
                 
-                await asyncio.sleep(5)  # Check every 5 seconds
+                await control.wait(5)  # Woken by should_run changes, polls every 5 seconds without LISTEN
             except Exception as e:
                 logger.error(f"Error checking database status: {str(e)}")
                 await asyncio.sleep(10)
@@ -87,6 +96,7 @@ class LLMWorker:
         while self.running:
             try:
                 crud.update_llm_worker_status(self.db, heartbeat=True)
+                logger.debug(f"DB pool: {get_pool_metrics()['sync']}")
                 await asyncio.sleep(30)  # Send heartbeat every 30 seconds
             except Exception as e:
                 logger.error(f"Error sending heartbeat: {str(e)}")
@@ -95,49 +105,53 @@ class LLMWorker:
     async def process_posts(self):
         """Process pending posts with OpenRouter."""
         logger.info("LLM post processing loop started")
+        posts_ready = notification_hub.subscribe("posts:pending", "posts:processed")
+        jobs = []
         
         while self.running:
             try:
                 db = SessionLocal()
-                
-                # Get pending posts that haven't been processed yet
-                pending_posts = db.query(Post).filter(
-                    Post.status == PostStatus.PENDING,
-                    Post.processed_at.is_(None)
-                ).limit(5).all()
-                
-                for post in pending_posts:
-                    try:
-                        await self.process_single_post(db, post)
-                    except Exception as e:
-                        logger.error(f"Error processing post {post.id}: {str(e)}")
-                
-                # Get processed posts that need rewriting with target channel prompt
-                # Only get posts that haven't been rewritten yet (processed_text is None or empty)
-                processed_posts = db.query(Post).filter(
-                    Post.status == PostStatus.PROCESSED,
-                    Post.target_channel_id.isnot(None),
-                    Post.llm_classification_confidence.isnot(None),
-                    or_(Post.processed_text.is_(None), Post.processed_text == '')
-                ).limit(5).all()
-                
-                logger.debug(f"🔄 Found {len(processed_posts)} processed posts for rewriting")
-                if processed_posts:
+                pending_posts = []
+                processed_posts = []
+                try:
+                    # Claim pending posts that haven't been processed yet (only the queued ones if there are jobs)
+                    pending_ids = job_post_ids(jobs, PostStatus.PENDING) if jobs else None
+                    pending_posts = crud.claim_pending_posts(db, self.worker_id, limit=5, post_ids=pending_ids)
+                    
+                    for post in pending_posts:
+                        try:
+                            await self.process_single_post(db, post)
+                        except Exception as e:
+                            logger.error(f"Error processing post {post.id}: {str(e)}")
+                    
+                    # Get processed posts that need rewriting with target channel prompt
+                    # Only get posts that haven't been rewritten yet (processed_text is None or empty)
+                    processed_ids = job_post_ids(jobs, PostStatus.PROCESSED) if jobs else None
+                    processed_posts = crud.claim_posts_for_channel_rewrite(db, self.worker_id, limit=5, post_ids=processed_ids)
+                    
+                    logger.debug(f"🔄 Found {len(processed_posts)} processed posts for rewriting")
+                    if processed_posts:
+                        for post in processed_posts:
+                            logger.debug(f"📝 Processing post {post.id} for rewriting (target_channel_id: {post.target_channel_id})")
+                    else:
+                        logger.debug("📭 No processed posts found for rewriting")
+                    
                     for post in processed_posts:
-                        logger.debug(f"📝 Processing post {post.id} for rewriting (target_channel_id: {post.target_channel_id})")
-                else:
-                    logger.debug("📭 No processed posts found for rewriting")
-                
-                for post in processed_posts:
+                        try:
+                            await self.rewrite_post_for_target_channel(db, post)
+                        except Exception as e:
+                            logger.error(f"Error rewriting post {post.id}: {str(e)}")
+                finally:
                     try:
-                        await self.rewrite_post_for_target_channel(db, post)
-                    except Exception as e:
-                        logger.error(f"Error rewriting post {post.id}: {str(e)}")
+                        crud.release_posts(db, pending_posts + processed_posts)
+                    finally:
+                        db.close()
+                await post_queue.ack(QUEUE_GROUP, jobs)
                 
-                db.close()
-                
-                # Wait before processing more posts
-                await asyncio.sleep(10)
+                # Wait for the next batch from the job queue; an empty batch means poll the database
+                jobs = await post_queue.next_jobs(
+                    QUEUE_GROUP, self.worker_id, (PostStatus.PENDING, PostStatus.PROCESSED), posts_ready, 10
+                )
                 
             except Exception as e:
                 logger.error(f"Error in LLM post processing loop: {str(e)}")
@@ -191,10 +205,12 @@ class LLMWorker:
             context = f"Source: {channel_name}" if source_channel else None
             
             # Rewrite text using OpenRouter
-            processed_text = await openrouter_service.rewrite_text(
-                post.original_text,
-                context=context
-            )
+            with llm_ledger.track("rewrite", [post.id], channel_id=post.target_channel_id):
+                processed_text = await openrouter_service.rewrite_text(
+                    post.original_text,
+                    context=context,
+                    use_cache=True
+                )
             
             if processed_text:
                 # Update post with processed text
@@ -238,10 +254,11 @@ class LLMWorker:
             formatted_prompt = target_channel.rewrite_prompt.format(original_text=post.original_text)
             
             # Rewrite text using OpenRouter with the formatted prompt
-            rewritten_text = await openrouter_service.rewrite_text_with_custom_prompt(
-                post.original_text,
-                custom_prompt=formatted_prompt
-            )
+            with llm_ledger.track("rewrite", [post.id], channel_id=target_channel.id):
+                rewritten_text = await openrouter_service.rewrite_text_with_custom_prompt(
+                    post.original_text,
+                    custom_prompt=formatted_prompt
+                )
             
             if rewritten_text:
                 # Update post with rewritten text
@@ -267,6 +284,9 @@ async def main():
     logger.info("🚀 LLM Worker main() function started - ENTRY POINT")
     logger.info("LLM Worker process started")
     
+    control = notification_hub.subscribe("service_control:llm_worker_status")
+    llm_http_client.open()
+    
     while True:
         try:
             # Check if LLM worker should run
@@ -293,8 +313,8 @@ async def main():
             
             db.close()
             
-            # Wait before checking again
-            await asyncio.sleep(10)
+            # Wait before checking again (or until should_run changes)
+            await control.wait(10)
             
         except KeyboardInterrupt:
             logger.info("Received interrupt signal")
@@ -303,6 +323,10 @@ async def main():
             logger.error(f"Unexpected error in main loop: {str(e)}")
             await asyncio.sleep(30)
     
+    await llm_ledger.close()
+    await llm_http_client.close()
+    
+    await llm_response_cache.close()
     logger.info("LLM Worker process stopped")
 
 
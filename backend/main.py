@@ -1,37 +1,50 @@
 from fastapi import FastAPI, Depends, HTTPException, status, Body, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional
 from datetime import timedelta, datetime, timezone
+import json
 import logging
 
-from database import get_db, engine
+from database import get_db, get_async_db, engine, async_engine, get_pool_metrics
 from models import Base, User, PostStatus
 from schemas import (
     UserLogin, UserCreate, Token, User as UserSchema,
     SourceChannel, SourceChannelCreate, SourceChannelUpdate,
     TargetChannel, TargetChannelCreate, TargetChannelUpdate,
-    Post, PostUpdate, PostApproval, PostSchedule, PostPublish,
+    Post, PostPage, PostUpdate, PostApproval, PostSchedule, PostPublish,
     Setting, SettingCreate, SettingUpdate,
     DashboardStats, MessageResponse,
     SessionGenerationStart, SessionGenerationVerify,
     AIModelCreate, AIModel, AIModelUpdate,
-    ServiceStatus
+    ServiceStatus, LLMCall
 )
 import crud
+import async_crud
+from job_queue import post_queue
 from auth import authenticate_user, create_access_token, get_current_user, get_current_admin_user, create_admin_user
 from config import settings
 from telegram_service import telegram_service
 from openrouter_service import openrouter_service
+from http_client import llm_http_client
+from llm_throttle import llm_throttle, LLMUnavailableError
+from model_router import model_router
+from llm_cache import llm_response_cache
+from llm_ledger import llm_ledger
+from notifications import notification_hub, install_triggers
+from settings_cache import settings_cache
 from upload_service import upload_service
 # LLM Worker now runs as separate service
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-# Create database tables
+# Create database tables, and the NOTIFY triggers the migrations would add (Postgres only)
 Base.metadata.create_all(bind=engine)
+install_triggers(engine)
 
 app = FastAPI(
     title="Auto Poster Bot API",
@@ -126,6 +139,13 @@ async def startup_event():
     
     db.close()
     
+    # Shared keep-alive client for OpenRouter calls
+    llm_http_client.open()
+    
+    # NOTIFY keeps the settings cache and the post counters fresh; without it the settings
+    # cache checks a table watermark and the counters wait for their TTL
+    await notification_hub.ensure_listening()
+    
     # Test external services
     telegram_ok = await telegram_service.test_bot_token()
     openrouter_ok = await openrouter_service.test_connection()
@@ -140,14 +160,19 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on application shutdown."""
     # LLM Worker now runs as separate service
-    pass
+    await post_queue.close()
+    await llm_ledger.close()
+    await llm_http_client.close()
+    await llm_response_cache.close()
+    await notification_hub.close()
+    await async_engine.dispose()
 
 
 # Authentication endpoints
 @app.post("/api/auth/register", response_model=UserSchema)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Check if user already exists
-    existing_user = crud.get_user_by_username(db, user_data.username)
+    existing_user = await async_crud.get_user_by_username(db, user_data.username)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -155,13 +180,13 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    user = crud.create_user(db, user_data)
+    user = await async_crud.create_user(db, user_data)
     return user
 
 
 @app.post("/api/auth/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    user = authenticate_user(db, user_credentials.username, user_credentials.password)
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    user = await authenticate_user(db, user_credentials.username, user_credentials.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -183,10 +208,11 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
 # Dashboard endpoint
 @app.get("/api/dashboard/stats", response_model=DashboardStats)
 async def get_dashboard_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    return crud.get_dashboard_stats(db)
+    await notification_hub.ensure_listening()  # reconnect a dropped LISTEN connection (rate-limited)
+    return await async_crud.get_dashboard_stats(db)
 
 
 # Source channels endpoints
@@ -195,20 +221,20 @@ async def get_source_channels(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    return crud.get_source_channels(db, skip=skip, limit=limit, active_only=active_only)
+    return await async_crud.get_source_channels(db, skip=skip, limit=limit, active_only=active_only)
 
 
 @app.post("/api/source-channels", response_model=SourceChannel)
 async def create_source_channel(
     channel: SourceChannelCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     # Check if channel already exists
-    existing = crud.get_source_channel_by_telegram_id(db, channel.channel_id)
+    existing = await async_crud.get_source_channel_by_telegram_id(db, channel.channel_id)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -223,16 +249,16 @@ async def create_source_channel(
             detail="Channel not found or bot doesn't have access"
         )
     
-    return crud.create_source_channel(db, channel)
+    return await async_crud.create_source_channel(db, channel)
 
 
 @app.get("/api/source-channels/{channel_id}", response_model=SourceChannel)
 async def get_source_channel(
     channel_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    channel = crud.get_source_channel(db, channel_id)
+    channel = await async_crud.get_source_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     return channel
@@ -242,10 +268,10 @@ async def get_source_channel(
 async def update_source_channel(
     channel_id: int,
     channel_update: SourceChannelUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    channel = crud.update_source_channel(db, channel_id, channel_update)
+    channel = await async_crud.update_source_channel(db, channel_id, channel_update)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     return channel
@@ -254,10 +280,10 @@ async def update_source_channel(
 @app.delete("/api/source-channels/{channel_id}", response_model=MessageResponse)
 async def delete_source_channel(
     channel_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    success = crud.delete_source_channel(db, channel_id)
+    success = await async_crud.delete_source_channel(db, channel_id)
     if not success:
         raise HTTPException(status_code=404, detail="Channel not found")
     return {"message": "Channel deleted successfully"}
@@ -269,20 +295,20 @@ async def get_target_channels(
     skip: int = 0,
     limit: int = 100,
     active_only: bool = False,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    return crud.get_target_channels(db, skip=skip, limit=limit, active_only=active_only)
+    return await async_crud.get_target_channels(db, skip=skip, limit=limit, active_only=active_only)
 
 
 @app.post("/api/target-channels", response_model=TargetChannel)
 async def create_target_channel(
     channel: TargetChannelCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     # Check if channel already exists
-    existing = crud.get_target_channel_by_telegram_id(db, channel.channel_id)
+    existing = await async_crud.get_target_channel_by_telegram_id(db, channel.channel_id)
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -297,16 +323,16 @@ async def create_target_channel(
             detail="Bot doesn't have permission to post in this channel"
         )
     
-    return crud.create_target_channel(db, channel)
+    return await async_crud.create_target_channel(db, channel)
 
 
 @app.get("/api/target-channels/{channel_id}", response_model=TargetChannel)
 async def get_target_channel(
     channel_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    channel = crud.get_target_channel(db, channel_id)
+    channel = await async_crud.get_target_channel(db, channel_id)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     return channel
@@ -316,10 +342,10 @@ async def get_target_channel(
 async def update_target_channel(
     channel_id: int,
     channel_update: TargetChannelUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    channel = crud.update_target_channel(db, channel_id, channel_update)
+    channel = await async_crud.update_target_channel(db, channel_id, channel_update)
     if not channel:
         raise HTTPException(status_code=404, detail="Channel not found")
     return channel
@@ -328,10 +354,10 @@ async def update_target_channel(
 @app.delete("/api/target-channels/{channel_id}", response_model=MessageResponse)
 async def delete_target_channel(
     channel_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    success = crud.delete_target_channel(db, channel_id)
+    success = await async_crud.delete_target_channel(db, channel_id)
     if not success:
         raise HTTPException(status_code=404, detail="Channel not found")
     return {"message": "Channel deleted successfully"}
@@ -341,39 +367,44 @@ async def delete_target_channel(
 @app.post("/api/posts/{post_id}/classify", response_model=Post)
 async def classify_post(
     post_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Manually trigger LLM classification for a specific post"""
     from services.llm_classifier import LLMClassifier
     from config import settings
     
-    post = crud.get_post(db, post_id)
+    post = await async_crud.get_post(db, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
     # Get OpenRouter API key from database
-    openrouter_key_setting = crud.get_setting(db, "openrouter_api_key")
-    if not openrouter_key_setting or not openrouter_key_setting.value.strip():
+    openrouter_key = await db.run_sync(lambda session: settings_cache.get("openrouter_api_key", session))
+    if not openrouter_key or not openrouter_key.strip():
         raise HTTPException(status_code=500, detail="OpenRouter API key not configured in database")
     
     # Get model from settings or use default
     model = settings.openrouter_model or "anthropic/claude-3-haiku"
     
-    classifier = LLMClassifier(openrouter_key_setting.value, model)
-    success = await classifier.process_post_classification(db, post)
+    classifier = LLMClassifier(openrouter_key, model, router=model_router, json_mode=settings.llm_json_mode)
+    try:
+        success = await classifier.process_post_classification_async(db, post)
+    except LLMUnavailableError as e:
+        raise HTTPException(status_code=503, detail=f"LLM provider unavailable: {str(e)}")
     
     if not success:
         raise HTTPException(status_code=500, detail="Failed to classify post")
     
-    return post
+    async_crud.invalidate_post_counts()
+    # Re-read with relationships: the target channel may have changed
+    return await async_crud.get_post(db, post_id)
 
 
 # Posts endpoints
 @app.post("/api/posts", response_model=Post)
 async def create_post(
     post_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create a new post from frontend."""
@@ -386,7 +417,8 @@ async def create_post(
             raise HTTPException(status_code=400, detail="Either text or media files are required")
         
         # Create the post
-        post = crud.create_post_from_frontend(db, post_data, current_user.id)
+        post = await async_crud.create_post_from_frontend(db, post_data, current_user.id)
+        await post_queue.enqueue(post.status, [post.id])
         
         logger.info(f"Post {post.id} created successfully by user {current_user.id}")
         return post
@@ -406,7 +438,7 @@ async def get_posts(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     is_manual: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     # Parse date strings to datetime objects
@@ -425,7 +457,7 @@ async def get_posts(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date_to format. Use ISO format.")
     
-    return crud.get_posts(
+    return await async_crud.get_posts(
         db, 
         skip=skip, 
         limit=limit, 
@@ -438,6 +470,54 @@ async def get_posts(
     )
 
 
+@app.get("/api/posts/page", response_model=PostPage)
+async def get_posts_page(
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    status: Optional[str] = None,
+    source_channel_id: Optional[int] = None,
+    target_channel_id: Optional[int] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    is_manual: Optional[bool] = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Cursor-paginated posts: pass back `next_cursor` to get the following page."""
+    # Parse date strings to datetime objects
+    parsed_date_from = None
+    parsed_date_to = None
+    
+    if date_from:
+        try:
+            parsed_date_from = datetime.fromisoformat(date_from.replace('Z', '+00:00'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date_from format. Use ISO format.")
+    
+    if date_to:
+        try:
+            parsed_date_to = datetime.fromisoformat(date_to.replace('Z', '+00:00'))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid date_to format. Use ISO format.")
+    
+    try:
+        posts, next_cursor = await async_crud.get_posts_page(
+            db,
+            cursor=cursor,
+            limit=limit,
+            status=status,
+            source_channel_id=source_channel_id,
+            target_channel_id=target_channel_id,
+            date_from=parsed_date_from,
+            date_to=parsed_date_to,
+            is_manual=is_manual
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    return {"items": posts, "next_cursor": next_cursor}
+
+
 @app.get("/api/posts/count")
 async def get_posts_count(
     status: Optional[str] = None,
@@ -446,9 +526,16 @@ async def get_posts_count(
     date_from: Optional[str] = None,
     date_to: Optional[str] = None,
     is_manual: Optional[bool] = None,
-    db: Session = Depends(get_db),
+    approximate: bool = False,
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
+    """Count posts matching the filters.
+    
+    approximate=true returns the Postgres planner estimate when it is above
+    settings.approximate_count_threshold, which avoids scanning a large archive;
+    smaller results (and non-Postgres databases) fall back to the cached exact count.
+    """
     # Parse date strings to datetime objects
     parsed_date_from = None
     parsed_date_to = None
@@ -465,8 +552,7 @@ async def get_posts_count(
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid date_to format. Use ISO format.")
     
-    count = crud.get_posts_count(
-        db,
+    filters = dict(
         status=status,
         source_channel_id=source_channel_id,
         target_channel_id=target_channel_id,
@@ -475,31 +561,50 @@ async def get_posts_count(
         is_manual=is_manual
     )
     
-    return {"count": count}
+    if approximate:
+        estimate = await async_crud.estimate_posts_count(db, **filters)
+        if estimate is not None and estimate >= settings.approximate_count_threshold:
+            return {"count": estimate, "approximate": True}
+    
+    count = await async_crud.get_posts_count(db, **filters)
+    
+    return {"count": count, "approximate": False}
 
 
 @app.get("/api/posts/{post_id}", response_model=Post)
 async def get_post(
     post_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    post = crud.get_post(db, post_id)
+    post = await async_crud.get_post(db, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     return post
 
 
+@app.get("/api/posts/{post_id}/llm-calls", response_model=List[LLMCall])
+async def get_post_llm_calls(
+    post_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """LLM requests made for a post: model, tokens, cost, latency and outcome"""
+    return await async_crud.get_post_llm_calls(db, post_id)
+
+
 @app.put("/api/posts/{post_id}", response_model=Post)
 async def update_post(
     post_id: int,
     post_update: PostUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    post = crud.update_post(db, post_id, post_update)
+    post = await async_crud.update_post(db, post_id, post_update)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
+    if post_update.status is not None or post_update.scheduled_at is not None:
+        await post_queue.enqueue(post.status, [post.id])
     return post
 
 
@@ -507,7 +612,7 @@ async def update_post(
 async def approve_post(
     post_id: int,
     approval_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     target_channel_id = approval_data.get('target_channel_id')
@@ -516,7 +621,7 @@ async def approve_post(
     if not target_channel_id:
         raise HTTPException(status_code=400, detail="Target channel ID is required")
     
-    post = crud.approve_post(
+    post = await async_crud.approve_post(
         db, post_id, current_user.id, target_channel_id, admin_notes
     )
     
@@ -530,10 +635,10 @@ async def approve_post(
 async def schedule_post(
     post_id: int,
     schedule: PostSchedule,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    post = crud.schedule_post(
+    post = await async_crud.schedule_post(
         db, post_id, current_user.id, schedule.target_channel_id, 
         schedule.scheduled_at, schedule.admin_notes
     )
@@ -543,8 +648,10 @@ async def schedule_post(
     
     # Update processed text if provided
     if schedule.processed_text:
-        post = crud.update_post(db, post_id, PostUpdate(processed_text=schedule.processed_text))
+        post = await async_crud.update_post(db, post_id, PostUpdate(processed_text=schedule.processed_text))
     
+    # Wake the publisher so it waits for this post's time rather than its previous deadline
+    await post_queue.enqueue(PostStatus.SCHEDULED, [post_id])
     return post
 
 
@@ -552,11 +659,11 @@ async def schedule_post(
 async def publish_post(
     post_id: int,
     publish_data: PostPublish,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     # Get the post and verify it can be published
-    post = crud.get_post(db, post_id)
+    post = await async_crud.get_post(db, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
@@ -568,8 +675,9 @@ async def publish_post(
     post.status = PostStatus.PUBLISHING  # Mark as being published
     post.scheduled_at = datetime.now(timezone.utc)  # Set to publish immediately
     
-    db.commit()
-    db.refresh(post)
+    await db.commit()
+    async_crud.invalidate_post_counts()
+    await post_queue.enqueue(PostStatus.PUBLISHING, [post_id])
     
     logger.info(f"Post {post_id} marked for immediate publishing to channel {publish_data.target_channel_id}")
     
@@ -577,8 +685,8 @@ async def publish_post(
     import asyncio
     await asyncio.sleep(5)
     
-    # Refresh post to get updated status
-    db.refresh(post)
+    # Re-read post (with relationships) to get updated status
+    post = await async_crud.get_post(db, post_id)
     
     if post.status == "published":
         logger.info(f"Post {post_id} successfully published via manual publish button")
@@ -592,10 +700,10 @@ async def publish_post(
 @app.get("/api/posts/pending", response_model=List[Post])
 async def get_pending_posts(
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    return crud.get_pending_posts(db, limit=limit)
+    return await async_crud.get_pending_posts(db, limit=limit)
 
 
 @app.post("/api/posts/improve-text")
@@ -644,24 +752,79 @@ async def improve_text_with_prompt(
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+def _sse_event(data: dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _improved_text_stream(chunks: AsyncIterator[str]) -> StreamingResponse:
+    """Server-sent events: `data: {"delta": ...}` per chunk, then `event: done` or `event: error`."""
+    async def events():
+        try:
+            async for delta in chunks:
+                yield _sse_event({"delta": delta})
+            yield _sse_event({}, event="done")
+        except Exception as e:
+            # The status line is already sent, so failures are reported in the stream
+            logger.error(f"Error streaming improved text: {str(e)}")
+            yield _sse_event({"detail": "Failed to improve text"}, event="error")
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/api/posts/improve-text/stream")
+async def improve_text_stream(
+    request: dict = Body(...),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Streaming variant of /api/posts/improve-text (server-sent events)."""
+    text = request.get("text")
+    if not text or not text.strip():
+        raise HTTPException(status_code=400, detail="Text is required")
+    
+    return _improved_text_stream(openrouter_service.stream_rewrite_text(text))
+
+
+@app.post("/api/posts/improve-text-with-prompt/stream")
+async def improve_text_with_prompt_stream(
+    request: dict = Body(...),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Streaming variant of /api/posts/improve-text-with-prompt (server-sent events)."""
+    text = request.get("text")
+    prompt = request.get("prompt")
+    
+    if not text or not text.strip():
+        raise HTTPException(status_code=400, detail="Text is required")
+    if not prompt or not prompt.strip():
+        raise HTTPException(status_code=400, detail="Prompt is required")
+    
+    return _improved_text_stream(openrouter_service.stream_improve_text_with_prompt(text, prompt))
+
+
 # Settings endpoints
 @app.get("/api/settings", response_model=List[Setting])
 async def get_settings(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    return crud.get_settings(db, skip=skip, limit=limit)
+    return await async_crud.get_settings(db, skip=skip, limit=limit)
 
 
 @app.get("/api/settings/{key}", response_model=Setting)
 async def get_setting(
     key: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    setting = crud.get_setting(db, key)
+    setting = await async_crud.get_setting(db, key)
     if not setting:
         raise HTTPException(status_code=404, detail="Setting not found")
     return setting
@@ -671,13 +834,13 @@ async def get_setting(
 async def update_setting(
     key: str,
     setting_update: SettingUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    setting = crud.update_setting(db, key, setting_update)
+    setting = await async_crud.update_setting(db, key, setting_update)
     if not setting:
         # Create new setting if it doesn't exist
-        setting = crud.upsert_setting(db, key, setting_update.value, setting_update.description)
+        setting = await async_crud.upsert_setting(db, key, setting_update.value, setting_update.description)
     return setting
 
 
@@ -688,7 +851,7 @@ session_generation_state = {}
 @app.post("/api/telegram/generate-session/start")
 async def start_session_generation(
     request: SessionGenerationStart,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Start session generation process by sending phone number"""
@@ -698,8 +861,8 @@ async def start_session_generation(
         import uuid
         
         # Get API credentials
-        api_id_setting = crud.get_setting(db, "telegram_api_id")
-        api_hash_setting = crud.get_setting(db, "telegram_api_hash")
+        api_id_setting = await async_crud.get_setting(db, "telegram_api_id")
+        api_hash_setting = await async_crud.get_setting(db, "telegram_api_hash")
         
         if not all([api_id_setting, api_hash_setting]):
             raise HTTPException(
@@ -747,7 +910,7 @@ async def start_session_generation(
 @app.post("/api/telegram/generate-session/verify")
 async def verify_session_code(
     request: SessionGenerationVerify,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Verify code and complete session generation"""
@@ -821,11 +984,11 @@ async def verify_session_code(
         logger.info(f"Generated session string length: {len(session_string)}")
         
         # Save session to database
-        saved_setting = crud.upsert_setting(db, "telegram_session_string", session_string)
+        saved_setting = await async_crud.upsert_setting(db, "telegram_session_string", session_string)
         logger.info(f"Session saved to database with ID: {saved_setting.id}, value length: {len(saved_setting.value)}")
         
         # Verify it was saved correctly
-        verification_setting = crud.get_setting(db, "telegram_session_string")
+        verification_setting = await async_crud.get_setting(db, "telegram_session_string")
         if verification_setting and verification_setting.value:
             logger.info(f"Session verification successful, stored value length: {len(verification_setting.value)}")
         else:
@@ -901,7 +1064,7 @@ async def cancel_session_generation(
 @app.post("/api/telegram/settings")
 async def save_telegram_settings(
     settings_data: dict = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Save Telegram settings to database"""
@@ -923,7 +1086,7 @@ async def save_telegram_settings(
                 str_value = str(value).strip() if value else ''
                 
                 if str_value:  # Only save non-empty values
-                    setting = crud.upsert_setting(
+                    setting = await async_crud.upsert_setting(
                         db, 
                         key, 
                         str_value, 
@@ -951,7 +1114,7 @@ async def save_telegram_settings(
 
 @app.get("/api/telegram/settings")
 async def get_telegram_settings(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get current Telegram settings from database"""
@@ -966,7 +1129,7 @@ async def get_telegram_settings(
         settings_data = {}
         
         for key in telegram_keys:
-            setting = crud.get_setting(db, key)
+            setting = await async_crud.get_setting(db, key)
             if setting:
                 # Mask sensitive values for security
                 if 'token' in key or 'hash' in key or 'session' in key:
@@ -1007,7 +1170,7 @@ async def get_telegram_settings(
 
 @app.post("/api/telegram/test-session")
 async def test_telegram_session(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Test Telegram session connectivity"""
@@ -1017,9 +1180,9 @@ async def test_telegram_session(
         from telethon.sessions import StringSession
         
         # Get current settings
-        session_string_setting = crud.get_setting(db, "telegram_session_string")
-        api_id_setting = crud.get_setting(db, "telegram_api_id")
-        api_hash_setting = crud.get_setting(db, "telegram_api_hash")
+        session_string_setting = await async_crud.get_setting(db, "telegram_session_string")
+        api_id_setting = await async_crud.get_setting(db, "telegram_api_id")
+        api_hash_setting = await async_crud.get_setting(db, "telegram_api_hash")
         
         if not all([session_string_setting, api_id_setting, api_hash_setting]):
             raise HTTPException(
@@ -1076,13 +1239,13 @@ async def test_telegram_session(
 
 @app.post("/api/worker/start")
 async def start_worker(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Start the worker process by setting should_run flag in database"""
     try:
         # Update worker status in database to indicate it should run
-        worker_status = crud.update_worker_status(db, should_run=True)
+        worker_status = await async_crud.update_worker_status(db, should_run=True)
         
         return {
             "status": "success",
@@ -1104,13 +1267,13 @@ async def start_worker(
 
 @app.post("/api/worker/stop")
 async def stop_worker(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Stop the worker process by setting should_run flag to false in database"""
     try:
         # Update worker status in database to indicate it should stop
-        worker_status = crud.update_worker_status(db, should_run=False)
+        worker_status = await async_crud.update_worker_status(db, should_run=False)
         
         return {
             "status": "success",
@@ -1132,12 +1295,12 @@ async def stop_worker(
 
 @app.get("/api/worker/status")
 async def get_worker_status(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get worker process status from database"""
     try:
-        worker_status = crud.get_worker_status(db)
+        worker_status = await async_crud.get_worker_status(db)
         
         if not worker_status:
             return {
@@ -1261,22 +1424,22 @@ async def serve_media_by_path(
 async def get_ai_models(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get all AI models"""
-    models = crud.get_ai_models(db, skip=skip, limit=limit)
+    models = await async_crud.get_ai_models(db, skip=skip, limit=limit)
     return models
 
 
 @app.get("/api/ai-models/{model_id}", response_model=AIModel)
 async def get_ai_model(
     model_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get AI model by ID"""
-    model = crud.get_ai_model(db, model_id=model_id)
+    model = await async_crud.get_ai_model(db, model_id=model_id)
     if not model:
         raise HTTPException(status_code=404, detail="AI model not found")
     return model
@@ -1285,68 +1448,73 @@ async def get_ai_model(
 @app.post("/api/ai-models", response_model=AIModel)
 async def create_ai_model(
     model: AIModelCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create new AI model"""
     # Check if model with same model_id already exists
-    existing_model = crud.get_ai_model_by_model_id(db, model_id=model.model_id)
+    existing_model = await async_crud.get_ai_model_by_model_id(db, model_id=model.model_id)
     if existing_model:
         raise HTTPException(
             status_code=400,
             detail="AI model with this model_id already exists"
         )
     
-    return crud.create_ai_model(db=db, model=model)
+    created = await async_crud.create_ai_model(db=db, model=model)
+    model_router.invalidate()
+    return created
 
 
 @app.put("/api/ai-models/{model_id}", response_model=AIModel)
 async def update_ai_model(
     model_id: int,
     model_update: AIModelUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Update AI model"""
-    model = crud.update_ai_model(db, model_id=model_id, model_update=model_update)
+    model = await async_crud.update_ai_model(db, model_id=model_id, model_update=model_update)
     if not model:
         raise HTTPException(status_code=404, detail="AI model not found")
+    model_router.invalidate()
     return model
 
 
 @app.delete("/api/ai-models/{model_id}")
 async def delete_ai_model(
     model_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Delete AI model"""
-    success = crud.delete_ai_model(db, model_id=model_id)
+    success = await async_crud.delete_ai_model(db, model_id=model_id)
     if not success:
         raise HTTPException(status_code=404, detail="AI model not found or cannot be deleted")
+    model_router.invalidate()
     return {"message": "AI model deleted successfully"}
 
 
 @app.post("/api/ai-models/{model_id}/set-default")
 async def set_default_ai_model(
     model_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Set AI model as default"""
-    model = crud.set_default_ai_model(db, model_id=model_id)
+    model = await async_crud.set_default_ai_model(db, model_id=model_id)
     if not model:
         raise HTTPException(status_code=404, detail="AI model not found")
+    model_router.invalidate()
     return {"message": "AI model set as default successfully", "model": model}
 
 
 @app.get("/api/ai-models/default", response_model=AIModel)
 async def get_default_ai_model(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get default AI model"""
-    model = crud.get_default_ai_model(db)
+    model = await async_crud.get_default_ai_model(db)
     if not model:
         raise HTTPException(status_code=404, detail="No default AI model found")
     return model
@@ -1378,7 +1546,7 @@ async def create_post_with_media(
     text: str = Form(None),
     target_channel_id: int = Form(...),
     files: List[UploadFile] = File(default=[]),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create a new post with multipart form data including text and media files."""
@@ -1406,7 +1574,8 @@ async def create_post_with_media(
         }
         
         # Create the post
-        post = crud.create_post_from_frontend(db, post_data, current_user.id)
+        post = await async_crud.create_post_from_frontend(db, post_data, current_user.id)
+        await post_queue.enqueue(post.status, [post.id])
         
         logger.info(f"Post {post.id} created successfully with {len(media_files)} media files by user {current_user.id}")
         return post
@@ -1444,139 +1613,206 @@ async def upload_multiple_files(
 # Service Management endpoints
 @app.get("/api/scrapper/status", response_model=ServiceStatus)
 async def get_scrapper_status(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get scrapper service status"""
-    status = crud.get_or_create_scrapper_status(db)
+    status = await async_crud.get_or_create_scrapper_status(db)
     return status
 
 
 @app.post("/api/scrapper/start")
 async def start_scrapper(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Start scrapper service"""
-    crud.update_scrapper_status(db, should_run=True)
+    await async_crud.update_scrapper_status(db, should_run=True)
     return {"message": "Scrapper start signal sent", "status": "success"}
 
 
 @app.post("/api/scrapper/stop")
 async def stop_scrapper(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Stop scrapper service"""
-    crud.update_scrapper_status(db, should_run=False)
+    await async_crud.update_scrapper_status(db, should_run=False)
     return {"message": "Scrapper stop signal sent", "status": "success"}
 
 
 @app.post("/api/scrapper/restart")
 async def restart_scrapper(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Restart scrapper service"""
     # First stop, then start
-    crud.update_scrapper_status(db, should_run=False)
+    await async_crud.update_scrapper_status(db, should_run=False)
     # Give it a moment to stop
     import asyncio
     await asyncio.sleep(2)
-    crud.update_scrapper_status(db, should_run=True)
+    await async_crud.update_scrapper_status(db, should_run=True)
     return {"message": "Scrapper restart signal sent", "status": "success"}
 
 
 @app.get("/api/publisher/status", response_model=ServiceStatus)
 async def get_publisher_status(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get publisher service status"""
-    status = crud.get_or_create_publisher_status(db)
+    status = await async_crud.get_or_create_publisher_status(db)
     return status
 
 
 @app.post("/api/publisher/start")
 async def start_publisher(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Start publisher service"""
-    crud.update_publisher_status(db, should_run=True)
+    await async_crud.update_publisher_status(db, should_run=True)
     return {"message": "Publisher start signal sent", "status": "success"}
 
 
 @app.post("/api/publisher/stop")
 async def stop_publisher(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Stop publisher service"""
-    crud.update_publisher_status(db, should_run=False)
+    await async_crud.update_publisher_status(db, should_run=False)
     return {"message": "Publisher stop signal sent", "status": "success"}
 
 
 @app.post("/api/publisher/restart")
 async def restart_publisher(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Restart publisher service"""
     # First stop, then start
-    crud.update_publisher_status(db, should_run=False)
+    await async_crud.update_publisher_status(db, should_run=False)
     # Give it a moment to stop
     import asyncio
     await asyncio.sleep(2)
-    crud.update_publisher_status(db, should_run=True)
+    await async_crud.update_publisher_status(db, should_run=True)
     return {"message": "Publisher restart signal sent", "status": "success"}
 
 
 @app.get("/api/llm-worker/status", response_model=ServiceStatus)
 async def get_llm_worker_status(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Get LLM worker service status"""
-    status = crud.get_or_create_llm_worker_status(db)
+    status = await async_crud.get_or_create_llm_worker_status(db)
     return status
 
 
 @app.post("/api/llm-worker/start")
 async def start_llm_worker_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Start LLM worker service"""
-    crud.update_llm_worker_status(db, should_run=True)
+    await async_crud.update_llm_worker_status(db, should_run=True)
     return {"message": "LLM Worker start signal sent", "status": "success"}
 
 
 @app.post("/api/llm-worker/stop")
 async def stop_llm_worker_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Stop LLM worker service"""
-    crud.update_llm_worker_status(db, should_run=False)
+    await async_crud.update_llm_worker_status(db, should_run=False)
     return {"message": "LLM Worker stop signal sent", "status": "success"}
 
 
 @app.post("/api/llm-worker/restart")
 async def restart_llm_worker_endpoint(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """Restart LLM worker service"""
     # First stop, then start
-    crud.update_llm_worker_status(db, should_run=False)
+    await async_crud.update_llm_worker_status(db, should_run=False)
     # Give it a moment to stop
     import asyncio
     await asyncio.sleep(2)
-    crud.update_llm_worker_status(db, should_run=True)
+    await async_crud.update_llm_worker_status(db, should_run=True)
     return {"message": "LLM Worker restart signal sent", "status": "success"}
 
 
+@app.get("/api/system/db-pool")
+async def get_db_pool_metrics(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get connection pool sizing and checkout/wait metrics of the API process"""
+    return get_pool_metrics()
+
+
+@app.get("/api/system/llm-cache")
+async def get_llm_cache_stats(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get hit/miss counters and size of the LLM response cache"""
+    return await llm_response_cache.stats()
+
+
+@app.get("/api/system/llm-throttle")
+async def get_llm_throttle_stats(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get the circuit breaker state and remaining request budget of the API process"""
+    return llm_throttle.stats()
+
+
+@app.get("/api/system/settings-cache")
+async def get_settings_cache_stats(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get hit/miss counters and invalidation mode of the API process settings cache"""
+    return settings_cache.stats()
+
+
+@app.get("/api/system/llm-models")
+async def get_llm_model_routing(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get the model chain per task and per-model latency/error stats of the API process"""
+    return await model_router.snapshot()
+
+
+@app.get("/api/system/llm-usage")
+async def get_llm_usage(
+    hours: int = 24,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Get LLM requests, tokens, spend and latency over the last `hours`, per model, channel and task"""
+    if hours < 1:
+        raise HTTPException(status_code=400, detail="hours must be positive")
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    
+    def with_throughput(rows):
+        for row in rows:
+            row["posts_per_hour"] = round(row["posts"] / hours, 2)
+        return rows
+    
+    return {
+        "since": since,
+        "hours": hours,
+        "total": with_throughput(await async_crud.get_llm_usage(db, since))[0],
+        "by_model": with_throughput(await async_crud.get_llm_usage(db, since, "model")),
+        "by_channel": with_throughput(await async_crud.get_llm_usage(db, since, "channel")),
+        "by_task": with_throughput(await async_crud.get_llm_usage(db, since, "task")),
+        "ledger": llm_ledger.stats(),
+    }
+
+
 # Health check
 @app.get("/api/health")
 async def health_check():
@@ -0,0 +1,235 @@
+"""Per-task model selection and fallback chain over the ai_models table.
+
+Each task ("classification", "rewrite") gets a chain of active models: the ones assigned to
+the task, then the ones with no task, each group ordered by `priority` (lower first) and the
+default model first among equals. OPENROUTER_MODEL is always appended as the last resort,
+so an empty table behaves as before.
+
+A request walks the chain: a timeout, an error response or an open circuit on one model
+falls through to the next. Latency and outcome of every attempt are kept per model (last
+LLM_ROUTER_WINDOW requests) and feed back into the order:
+
+- a model whose error rate is above LLM_ROUTER_MAX_ERROR_RATE (after LLM_ROUTER_MIN_SAMPLES
+  requests) is moved to the end of the chain, until it has gone UNHEALTHY_COOLDOWN seconds
+  without a failure;
+- among models of the same priority the one with the lower p50 latency goes first.
+
+The chain is read from the database every LLM_ROUTER_REFRESH_SECONDS; the API refreshes it
+immediately when models are edited. Stats are per process; every attempt is also written
+to the llm_calls ledger (llm_ledger.py), with the `usage` block of the response.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+import crud
+from config import settings
+from database import SessionLocal
+from http_client import llm_http_client
+from llm_ledger import llm_ledger
+from llm_throttle import LLMUnavailableError
+
+logger = logging.getLogger(__name__)
+
+TASKS = ("classification", "rewrite")
+UNHEALTHY_COOLDOWN = 300  # seconds without failures after which a demoted model is tried first again
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def _usage(response: httpx.Response) -> Optional[Dict[str, Any]]:
+    try:
+        usage = response.json().get("usage")
+    except (ValueError, AttributeError):
+        return None
+    return usage if isinstance(usage, dict) else None
+
+
+class ModelStats:
+    """Latency and outcome of the last `window` requests to one model."""
+    
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)  # (latency seconds, succeeded)
+        self.last_failure_at = 0.0
+    
+    def record(self, latency: float, ok: bool):
+        self.samples.append((latency, ok))
+        if not ok:
+            self.last_failure_at = time.monotonic()
+    
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+    
+    def latency(self, fraction: float) -> Optional[float]:
+        return _percentile([latency for latency, ok in self.samples if ok], fraction)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.latency(0.5), self.latency(0.95)
+        return {
+            "requests": len(self.samples),
+            "error_rate": round(self.error_rate, 3),
+            "p50_ms": round(p50 * 1000) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000) if p95 is not None else None,
+        }
+
+
+class ModelRouter:
+    def __init__(
+        self,
+        default_model: str,
+        refresh_seconds: int = 60,
+        window: int = 100,
+        max_error_rate: float = 0.5,
+        min_samples: int = 5,
+        fallback_retries: int = 1,
+    ):
+        self.default_model = default_model
+        self.refresh_seconds = refresh_seconds
+        self.window = window
+        self.max_error_rate = max_error_rate
+        self.min_samples = min_samples
+        self.fallback_retries = fallback_retries
+        self.models: List[Dict[str, Any]] = []
+        self.loaded_at = 0.0
+        self.stats: Dict[str, ModelStats] = {}
+    
+    def _load(self) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return [
+                {
+                    "model_id": model.model_id,
+                    "task": model.task,
+                    "priority": model.priority or 0,
+                    "is_default": bool(model.is_default),
+                }
+                for model in crud.get_ai_models(db, limit=1000, active_only=True)
+            ]
+        finally:
+            db.close()
+    
+    async def refresh(self, force: bool = False):
+        if not force and time.monotonic() - self.loaded_at < self.refresh_seconds:
+            return
+        self.loaded_at = time.monotonic()
+        try:
+            self.models = await asyncio.to_thread(self._load)
+        except Exception as e:
+            logger.warning(f"Could not load ai_models, keeping the previous routing: {str(e)}")
+    
+    def invalidate(self):
+        """Re-read ai_models on the next request."""
+        self.loaded_at = 0.0
+    
+    def _stats(self, model_id: str) -> ModelStats:
+        if model_id not in self.stats:
+            self.stats[model_id] = ModelStats(self.window)
+        return self.stats[model_id]
+    
+    def _unhealthy(self, model_id: str) -> bool:
+        stats = self.stats.get(model_id)
+        if not stats or len(stats.samples) < self.min_samples or stats.error_rate <= self.max_error_rate:
+            return False
+        # A demoted model gets few requests, so its error rate would never recover on its own
+        return time.monotonic() - stats.last_failure_at < UNHEALTHY_COOLDOWN
+    
+    def _order_key(self, model: Dict[str, Any]):
+        p50 = self.stats[model["model_id"]].latency(0.5) if model["model_id"] in self.stats else None
+        return (
+            self._unhealthy(model["model_id"]),
+            model["task"] is None,
+            model["priority"],
+            p50 if p50 is not None else 0.0,  # untried models get a chance first
+            not model["is_default"],
+        )
+    
+    async def chain(self, task: str) -> List[str]:
+        """Model ids to try for `task`, in order."""
+        await self.refresh()
+        candidates = sorted(
+            (model for model in self.models if model["task"] in (task, None)),
+            key=self._order_key,
+        )
+        chain = []
+        for model_id in [model["model_id"] for model in candidates] + [self.default_model]:
+            if model_id and model_id not in chain:
+                chain.append(model_id)
+        return chain
+    
+    async def primary(self, task: str) -> str:
+        """First model of the chain; identifies the task's model in cache keys."""
+        return (await self.chain(task))[0]
+    
+    async def post(
+        self, task: str, url: str, payload: Dict[str, Any], stream: bool = False, **kwargs
+    ) -> httpx.Response:
+        """POST a chat completion `payload` (without "model") down the task's chain.
+    
+        Returns the first 200 response, or the last model's error response. Raises
+        LLMUnavailableError when the last model could not be reached at all. With `stream`
+        the body is unread (the caller closes it), latency is time to response headers and the
+        ledger row is left to the caller, since usage only arrives at the end of the stream.
+        """
+        chain = await self.chain(task)
+        response = None
+        for index, model_id in enumerate(chain):
+            last = index == len(chain) - 1
+            started = time.monotonic()
+            try:
+                response = await llm_http_client.post(
+                    url,
+                    json={**payload, "model": model_id, "usage": {"include": True}},
+                    max_retries=None if last else self.fallback_retries,
+                    stream=stream,
+                    **kwargs,
+                )
+            except LLMUnavailableError as e:
+                self._stats(model_id).record(time.monotonic() - started, False)
+                llm_ledger.record_attempt(task, model_id, time.monotonic() - started, "unavailable")
+                if last:
+                    raise
+                logger.warning(f"🔀 {task}: {model_id} unavailable ({str(e)}), falling back to {chain[index + 1]}")
+                continue
+    
+            ok = response.status_code == 200
+            latency = time.monotonic() - started
+            self._stats(model_id).record(latency, ok)
+            if not stream:
+                llm_ledger.record_attempt(
+                    task, model_id, latency, "ok" if ok else "http_error",
+                    status_code=response.status_code, usage=_usage(response) if ok else None,
+                )
+            if ok or last:
+                return response
+            if stream:
+                await response.aclose()
+            logger.warning(f"🔀 {task}: {model_id} returned HTTP {response.status_code}, falling back to {chain[index + 1]}")
+        return response
+    
+    async def snapshot(self) -> Dict[str, Any]:
+        return {
+            "chains": {task: await self.chain(task) for task in TASKS},
+            "models": {model_id: stats.snapshot() for model_id, stats in self.stats.items()},
+        }
+
+
+model_router = ModelRouter(
+    settings.openrouter_model,
+    refresh_seconds=settings.llm_router_refresh_seconds,
+    window=settings.llm_router_window,
+    max_error_rate=settings.llm_router_max_error_rate,
+    min_samples=settings.llm_router_min_samples,
+    fallback_retries=settings.llm_router_fallback_retries,
+)
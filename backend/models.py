@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, Float, SmallInteger, String, Text, Boolean, DateTime, ForeignKey, JSON, Index, UniqueConstraint, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -19,6 +19,7 @@ class PostStatus(str, Enum):
     PUBLISHING = "publishing"
     PUBLISHED = "published"
     FAILED = "failed"  # Ошибка обработки
+    DUPLICATE = "duplicate"  # Почти дубликат уже полученного поста (см. duplicate_of_id)
 
 
 class User(Base):
@@ -92,6 +93,9 @@ class Post(Base):
     # Manual post flag
     is_manual = Column(Boolean, default=False, nullable=False)
     
+    # Earlier post this one nearly duplicates (status DUPLICATE, see crud.mark_near_duplicates)
+    duplicate_of_id = Column(Integer, ForeignKey("posts.id", ondelete="SET NULL"), nullable=True)
+    
     # Status and timestamps
     status = Column(String, default=PostStatus.PENDING)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -101,6 +105,10 @@ class Post(Base):
     published_at = Column(DateTime(timezone=True), nullable=True)
     published_message_id = Column(Integer, nullable=True)
     
+    # Worker lease (crud.claim_posts)
+    claimed_by = Column(String, nullable=True)
+    claim_expires_at = Column(DateTime(timezone=True), nullable=True)
+    
     # Admin notes
     admin_notes = Column(Text, nullable=True)
     approved_by = Column(Integer, ForeignKey("users.id"), nullable=True)
@@ -109,6 +117,39 @@ class Post(Base):
     source_channel = relationship("SourceChannel", back_populates="posts")
     target_channel = relationship("TargetChannel", back_populates="posts")
     approver = relationship("User")
+    
+    # Indexes matched to the worker polls (see migration i1j2k3l4m5n6).
+    # Partial indexes stay small: rows drop out of them once the post moves on.
+    __table_args__ = (
+        UniqueConstraint("source_channel_id", "original_message_id", name="uq_posts_source_message"),
+        Index("ix_posts_scraped_unclassified", "id",
+              postgresql_where=text("status = 'scraped' AND llm_classification_confidence IS NULL")),
+        Index("ix_posts_pending_unprocessed", "id",
+              postgresql_where=text("status = 'pending' AND processed_at IS NULL")),
+        Index("ix_posts_processed_not_rewritten", "id",
+              postgresql_where=text("status = 'processed' AND target_channel_id IS NOT NULL "
+                                    "AND (processed_text IS NULL OR processed_text = '')")),
+        Index("ix_posts_scheduled_at", "scheduled_at",
+              postgresql_where=text("status = 'scheduled'")),
+        Index("ix_posts_publishing", "id",
+              postgresql_where=text("status = 'publishing'")),
+        Index("ix_posts_status_created_at", "status", "created_at"),
+        Index("ix_posts_created_at_id", "created_at", "id"),
+    )
+
+
+class PostLSHBand(Base):
+    """MinHash LSH bucket of a post's text per band (services/near_duplicates.py)."""
+    __tablename__ = "post_lsh_bands"
+    
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    band = Column(SmallInteger, primary_key=True)
+    bucket = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_post_lsh_bands_band_bucket", "band", "bucket", "created_at"),
+    )
 
 
 class Settings(Base):
@@ -131,10 +172,45 @@ class AIModel(Base):
     description = Column(Text, nullable=True)
     is_active = Column(Boolean, default=True)
     is_default = Column(Boolean, default=False)
+    # Routing (model_router.py): task the model serves ("classification", "rewrite", None = any)
+    # and its place in the fallback chain, lower first
+    task = Column(String, nullable=True)
+    priority = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
 
+class LLMCall(Base):
+    """Ledger of LLM requests (llm_ledger.py), one row per post the request covered.
+    
+    A batch request is split across its posts: tokens and cost are divided evenly and
+    `request_id` groups the rows back. post_id/target_channel_id are plain columns, not
+    foreign keys: rows are written in batches after the fact and must survive deleted posts.
+    """
+    __tablename__ = "llm_calls"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    request_id = Column(String(32), nullable=False)
+    task = Column(String, nullable=False)  # classification, rewrite
+    model = Column(String, nullable=True)
+    post_id = Column(Integer, nullable=True, index=True)
+    target_channel_id = Column(Integer, nullable=True)
+    batch_size = Column(Integer, nullable=False, default=1)
+    prompt_tokens = Column(Integer, nullable=True)
+    completion_tokens = Column(Integer, nullable=True)
+    cost = Column(Float, nullable=True)  # USD, as reported by OpenRouter
+    latency_ms = Column(Integer, nullable=True)
+    cache_hit = Column(Boolean, nullable=False, default=False)
+    outcome = Column(String, nullable=False)  # ok, cache, http_error, stream_error, unavailable
+    status_code = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        Index("ix_llm_calls_created_at", "created_at"),
+        Index("ix_llm_calls_channel_created_at", "target_channel_id", "created_at"),
+    )
+
+
 class WorkerStatus(Base):
     __tablename__ = "worker_status"
     
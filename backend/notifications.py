@@ -0,0 +1,261 @@
+"""Postgres LISTEN/NOTIFY wake-ups for the worker loops.
+
+Triggers from migration l4m5n6o7p8q9 send:
+    posts            payload = new status, when a post is inserted or its status changes
+    service_control  payload = status table name, when a service's should_run flips
+    settings         payload = setting key, when a setting is created, changed or deleted
+                     (migration o7p8q9r0s1t2)
+
+Workers subscribe to topics such as "posts:scraped" or "service_control:publisher_status"
+and wait on them instead of sleeping a fixed interval. The poll stays as a fallback: while
+the listener is connected and the triggers of every channel the loop waits on exist (looked
+up in pg_trigger), the loop still wakes every NOTIFY_FALLBACK_POLL_SECONDS; otherwise
+(SQLite, connection lost, migration not applied) it polls at its old interval.
+
+A schema created by Base.metadata.create_all gets the same triggers from install_triggers().
+
+Caches register callbacks for a whole channel instead (add_callback); they are called with
+the payload, or with None after a reconnect since anything may have changed meanwhile.
+"""
+import asyncio
+import logging
+import time
+import weakref
+from typing import Callable, Dict, List, Optional, Set
+
+from sqlalchemy import text
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ("posts", "service_control", "settings")
+RECONNECT_INTERVAL = 30  # seconds between reconnect attempts
+MIN_WAIT = 1.0  # floor for max_wait: an overdue deadline must not turn a worker loop into a busy loop
+SERVICE_STATUS_TABLES = ("worker_status", "scrapper_status", "publisher_status", "llm_worker_status")
+
+# Triggers that feed each channel (same DDL as the migrations), by trigger name
+TRIGGERS: Dict[str, Dict[str, str]] = {
+    "posts": {
+        "posts_status_notify": """
+            CREATE TRIGGER posts_status_notify
+            AFTER INSERT OR UPDATE OF status ON posts
+            FOR EACH ROW EXECUTE PROCEDURE notify_post_status()
+        """,
+    },
+    "service_control": {
+        f"{table}_should_run_notify": f"""
+            CREATE TRIGGER {table}_should_run_notify
+            AFTER UPDATE OF should_run ON {table}
+            FOR EACH ROW EXECUTE PROCEDURE notify_service_control()
+        """
+        for table in SERVICE_STATUS_TABLES
+    },
+    "settings": {
+        "settings_change_notify": """
+            CREATE TRIGGER settings_change_notify
+            AFTER INSERT OR UPDATE OR DELETE ON settings
+            FOR EACH ROW EXECUTE PROCEDURE notify_settings_change()
+        """,
+    },
+}
+TRIGGER_FUNCTIONS = (
+    """
+    CREATE OR REPLACE FUNCTION notify_post_status() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('posts', NEW.status);
+        ELSIF NEW.status IS DISTINCT FROM OLD.status THEN
+            PERFORM pg_notify('posts', NEW.status);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION notify_service_control() RETURNS trigger AS $$
+    BEGIN
+        IF NEW.should_run IS DISTINCT FROM OLD.should_run THEN
+            PERFORM pg_notify('service_control', TG_TABLE_NAME);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION notify_settings_change() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM pg_notify('settings', OLD.key);
+        END IF;
+        IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.key IS DISTINCT FROM OLD.key) THEN
+            PERFORM pg_notify('settings', NEW.key);
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+)
+_EXISTING_TRIGGERS = "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal AND tgname = ANY(:names)"
+_EXISTING_TRIGGERS_ASYNCPG = "SELECT tgname FROM pg_trigger WHERE NOT tgisinternal AND tgname = ANY($1::name[])"
+
+
+def install_triggers(engine):
+    """Create the NOTIFY triggers missing from a schema built without the migrations (Postgres only)."""
+    if engine.dialect.name != "postgresql":
+        return
+    wanted = {name: ddl for triggers in TRIGGERS.values() for name, ddl in triggers.items()}
+    with engine.begin() as connection:
+        existing = set(connection.execute(text(_EXISTING_TRIGGERS), {"names": list(wanted)}).scalars())
+        missing = [name for name in wanted if name not in existing]
+        if not missing:
+            return
+        for ddl in TRIGGER_FUNCTIONS:
+            connection.execute(text(ddl))
+        for name in missing:
+            connection.execute(text(wanted[name]))
+    logger.info(f"Installed NOTIFY triggers: {', '.join(missing)}")
+
+
+def _asyncpg_dsn(url: str) -> Optional[str]:
+    """Plain postgresql:// DSN for asyncpg, or None if the database is not Postgres."""
+    for prefix in ("postgresql+psycopg2://", "postgresql+asyncpg://", "postgresql://", "postgres://"):
+        if url.startswith(prefix):
+            return "postgresql://" + url[len(prefix):]
+    return None
+
+
+class Subscription:
+    """Wake-up flag for one worker loop; notifications received while the loop is busy are kept."""
+    
+    def __init__(self, hub: "NotificationHub", topics: Set[str]):
+        self.hub = hub
+        self.topics = topics
+        self.event = asyncio.Event()
+    
+    async def wait(self, poll_interval: float, max_wait: Optional[float] = None) -> bool:
+        """Wait for a notification on any topic, or until the fallback poll is due.
+    
+        `max_wait` caps the wait (e.g. the next scheduled post is due sooner), but never
+        below MIN_WAIT.
+        Returns True if woken by a notification.
+        """
+        await self.hub.ensure_listening()
+        channels = {topic.split(":", 1)[0] for topic in self.topics}
+        if all(self.hub.notifying(channel) for channel in channels):
+            timeout = max(poll_interval, settings.notify_fallback_poll_seconds)
+        else:
+            timeout = poll_interval
+        if max_wait is not None:
+            timeout = min(timeout, max(max_wait, MIN_WAIT))
+    
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            woken = True
+        except asyncio.TimeoutError:
+            woken = False
+        self.event.clear()
+        return woken
+
+
+class NotificationHub:
+    """One LISTEN connection per process, fanning notifications out to subscriptions."""
+    
+    def __init__(self, database_url: str):
+        self.dsn = _asyncpg_dsn(database_url)
+        self.connection = None
+        # Weak so a subscription goes away with the worker loop that created it
+        self._subscriptions: Dict[str, "weakref.WeakSet[Subscription]"] = {}
+        self._callbacks: Dict[str, List[Callable[[Optional[str]], None]]] = {}
+        self._last_attempt = 0.0
+        self.channels_with_triggers: Set[str] = set()
+        self._triggers_checked_at = 0.0
+    
+    @property
+    def listening(self) -> bool:
+        return self.connection is not None and not self.connection.is_closed()
+    
+    def notifying(self, channel: str) -> bool:
+        """Listening, and the triggers that send on `channel` exist in the database."""
+        return self.listening and channel in self.channels_with_triggers
+    
+    def subscribe(self, *topics: str) -> Subscription:
+        subscription = Subscription(self, set(topics))
+        for topic in topics:
+            self._subscriptions.setdefault(topic, weakref.WeakSet()).add(subscription)
+        return subscription
+    
+    def add_callback(self, channel: str, callback: Callable[[Optional[str]], None]):
+        """Call `callback(payload)` for every notification on `channel` (None after a reconnect)."""
+        self._callbacks.setdefault(channel, []).append(callback)
+    
+    def unsubscribe(self, subscription: Subscription):
+        for topic in subscription.topics:
+            if topic in self._subscriptions:
+                self._subscriptions[topic].discard(subscription)
+    
+    async def _check_triggers(self):
+        """Note the channels whose triggers all exist (rechecked by ensure_listening until they all do)."""
+        self._triggers_checked_at = time.monotonic()
+        names = [name for triggers in TRIGGERS.values() for name in triggers]
+        try:
+            rows = await self.connection.fetch(_EXISTING_TRIGGERS_ASYNCPG, names)
+        except Exception as e:
+            logger.warning(f"Could not look up NOTIFY triggers, polling at the normal interval: {str(e)}")
+            self.channels_with_triggers = set()
+            return
+        existing = {row["tgname"] for row in rows}
+        self.channels_with_triggers = {
+            channel for channel, triggers in TRIGGERS.items() if existing.issuperset(triggers)
+        }
+    
+    async def ensure_listening(self):
+        """(Re)connect the LISTEN connection, at most once per RECONNECT_INTERVAL."""
+        if self.dsn is None:
+            return
+        if self.listening:
+            if (set(TRIGGERS) - self.channels_with_triggers
+                    and time.monotonic() - self._triggers_checked_at >= RECONNECT_INTERVAL):
+                await self._check_triggers()
+            return
+        if time.monotonic() - self._last_attempt < RECONNECT_INTERVAL:
+            return
+        self._last_attempt = time.monotonic()
+    
+        try:
+            import asyncpg
+            self.connection = await asyncpg.connect(self.dsn)
+            for channel in CHANNELS:
+                await self.connection.add_listener(channel, self._on_notification)
+            logger.info(f"Listening for notifications on {', '.join(CHANNELS)}")
+            await self._check_triggers()
+            missing = sorted(set(TRIGGERS) - self.channels_with_triggers)
+            if missing:
+                logger.warning(f"NOTIFY triggers missing for {', '.join(missing)}, polling at the normal interval")
+            # Anything may have happened while we were not listening
+            self._wake_all()
+        except Exception as e:
+            logger.warning(f"LISTEN connection unavailable, falling back to polling: {str(e)}")
+            self.connection = None
+    
+    async def close(self):
+        if self.connection is not None and not self.connection.is_closed():
+            await self.connection.close()
+        self.connection = None
+    
+    def _on_notification(self, connection, pid, channel, payload):
+        for callback in self._callbacks.get(channel, ()):
+            callback(payload)
+        for subscription in list(self._subscriptions.get(f"{channel}:{payload}", ())):
+            subscription.event.set()
+    
+    def _wake_all(self):
+        for callbacks in self._callbacks.values():
+            for callback in callbacks:
+                callback(None)
+        for subscriptions in self._subscriptions.values():
+            for subscription in list(subscriptions):
+                subscription.event.set()
+
+
+notification_hub = NotificationHub(settings.database_url)
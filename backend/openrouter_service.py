@@ -1,14 +1,27 @@
 import httpx
 import asyncio
-from typing import Optional
+import json
+import time
+from typing import AsyncIterator, Optional
 from config import settings
 import logging
 from sqlalchemy.orm import Session
-from database import get_db
-import crud
+from http_client import llm_http_client
+from llm_throttle import LLMUnavailableError
+from model_router import model_router
+from llm_cache import llm_response_cache, cache_key
+from llm_ledger import llm_ledger
+from settings_cache import settings_cache
 
 logger = logging.getLogger(__name__)
 
+REWRITE_SYSTEM_PROMPT = "Ты профессиональный редактор контента. Твоя задача - переписать текст, сохранив основную идею, но изменив формулировку, стиль и структуру. Текст должен быть уникальным, но передавать ту же информацию."
+IMPROVE_SYSTEM_PROMPT = "Ты профессиональный редактор контента. Твоя задача - улучшить текст согласно указаниям пользователя, сохранив основную идею и важную информацию."
+
+
+class OpenRouterStreamError(Exception):
+    """OpenRouter rejected a streaming request or reported an error mid-stream."""
+
 
 class OpenRouterService:
     def __init__(self):
@@ -22,49 +35,66 @@ class OpenRouterService:
             "X-Title": "Auto Poster Bot"
         }
     
-    async def rewrite_text(self, original_text: str, context: Optional[str] = None) -> Optional[str]:
-        """Rewrite text using OpenRouter API."""
+    async def rewrite_text(self, original_text: str, context: Optional[str] = None, use_cache: bool = False) -> Optional[str]:
+        """Rewrite text using OpenRouter API.
+        
+        `use_cache` reuses the rewrite of an identical text (pipeline workers); the editor's
+        improve button leaves it off so every click samples a fresh rewrite.
+        """
         if not original_text or not original_text.strip():
             return None
         
         try:
             prompt = self._create_rewrite_prompt(original_text, context)
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Ты профессиональный редактор контента. Твоя задача - переписать текст, сохранив основную идею, но изменив формулировку, стиль и структуру. Текст должен быть уникальным, но передавать ту же информацию."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "max_tokens": 1000,
-                        "temperature": 0.7,
-                        "top_p": 0.9
-                    }
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if "choices" in data and len(data["choices"]) > 0:
-                        rewritten_text = data["choices"][0]["message"]["content"].strip()
-                        logger.info(f"Successfully rewrote text: {len(original_text)} -> {len(rewritten_text)} chars")
-                        return rewritten_text
-                    else:
-                        logger.error(f"No choices in OpenRouter response: {data}")
-                        return None
+            key = None
+            if use_cache:
+                key = cache_key("rewrite", original_text, await model_router.primary("rewrite"), prompt.replace(original_text, "{original_text}"))
+                cached = await llm_response_cache.get(key)
+                if cached is not None:
+                    logger.info(f"Rewrite served from cache: {len(original_text)} -> {len(cached)} chars")
+                    llm_ledger.mark_cache_hit(await model_router.primary("rewrite"))
+                    return cached
+            
+            response = await model_router.post(
+                "rewrite",
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                payload={
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": REWRITE_SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    "max_tokens": 1000,
+                    "temperature": 0.7,
+                    "top_p": 0.9
+                }
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                if "choices" in data and len(data["choices"]) > 0:
+                    rewritten_text = data["choices"][0]["message"]["content"].strip()
+                    logger.info(f"Successfully rewrote text: {len(original_text)} -> {len(rewritten_text)} chars")
+                    if key:
+                        await llm_response_cache.set(key, rewritten_text)
+                    return rewritten_text
                 else:
-                    logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                    logger.error(f"No choices in OpenRouter response: {data}")
                     return None
-                    
+            else:
+                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                return None
+                
+        except LLMUnavailableError as e:
+            logger.error(f"OpenRouter unavailable: {str(e)}")
+            return None
         except httpx.TimeoutException:
             logger.error("OpenRouter API timeout")
             return None
@@ -75,13 +105,8 @@ class OpenRouterService:
     def _create_rewrite_prompt(self, original_text: str, context: Optional[str] = None) -> str:
         """Create a prompt for text rewriting using database setting."""
         try:
-            db = next(get_db())
-            setting = crud.get_setting(db, "rewrite_prompt")
-            db.close()
-            
-            if setting and setting.value:
-                prompt_template = setting.value
-            else:
+            prompt_template = settings_cache.get("rewrite_prompt")
+            if not prompt_template:
                 # Fallback to default prompt if setting not found
                 prompt_template = """Перепиши следующий текст, сохранив основную идею и информацию, но изменив формулировку:
 
@@ -135,41 +160,51 @@ class OpenRouterService:
             return None
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Ты профессиональный редактор контента. Твоя задача - переписать текст согласно предоставленному промпту, сохранив важную информацию и создав качественный контент."
-                            },
-                            {
-                                "role": "user",
-                                "content": custom_prompt
-                            }
-                        ],
-                        "max_tokens": 1000,
-                        "temperature": 0.7,
-                        "top_p": 0.9
-                    }
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if "choices" in data and len(data["choices"]) > 0:
-                        rewritten_text = data["choices"][0]["message"]["content"].strip()
-                        logger.info(f"Successfully rewrote text with custom prompt: {len(original_text)} -> {len(rewritten_text)} chars")
-                        return rewritten_text
-                    else:
-                        logger.error(f"No choices in OpenRouter response: {data}")
-                        return None
+            key = cache_key("custom_rewrite", original_text, await model_router.primary("rewrite"), custom_prompt.replace(original_text, "{original_text}"))
+            cached = await llm_response_cache.get(key)
+            if cached is not None:
+                logger.info(f"Custom prompt rewrite served from cache: {len(original_text)} -> {len(cached)} chars")
+                llm_ledger.mark_cache_hit(await model_router.primary("rewrite"))
+                return cached
+            
+            response = await model_router.post(
+                "rewrite",
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                payload={
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": "Ты профессиональный редактор контента. Твоя задача - переписать текст согласно предоставленному промпту, сохранив важную информацию и создав качественный контент."
+                        },
+                        {
+                            "role": "user",
+                            "content": custom_prompt
+                        }
+                    ],
+                    "max_tokens": 1000,
+                    "temperature": 0.7,
+                    "top_p": 0.9
+                }
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                if "choices" in data and len(data["choices"]) > 0:
+                    rewritten_text = data["choices"][0]["message"]["content"].strip()
+                    logger.info(f"Successfully rewrote text with custom prompt: {len(original_text)} -> {len(rewritten_text)} chars")
+                    await llm_response_cache.set(key, rewritten_text)
+                    return rewritten_text
                 else:
-                    logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                    logger.error(f"No choices in OpenRouter response: {data}")
                     return None
-                    
+            else:
+                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                return None
+                
+        except LLMUnavailableError as e:
+            logger.error(f"OpenRouter unavailable: {str(e)}")
+            return None
         except httpx.TimeoutException:
             logger.error("OpenRouter API timeout")
             return None
@@ -185,41 +220,43 @@ class OpenRouterService:
         try:
             prompt = self._create_improve_prompt(original_text, user_prompt)
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=self.headers,
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {
-                                "role": "system",
-                                "content": "Ты профессиональный редактор контента. Твоя задача - улучшить текст согласно указаниям пользователя, сохранив основную идею и важную информацию."
-                            },
-                            {
-                                "role": "user",
-                                "content": prompt
-                            }
-                        ],
-                        "max_tokens": 1000,
-                        "temperature": 0.7,
-                        "top_p": 0.9
-                    }
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    if "choices" in data and len(data["choices"]) > 0:
-                        improved_text = data["choices"][0]["message"]["content"].strip()
-                        logger.info(f"Successfully improved text with custom prompt: {len(original_text)} -> {len(improved_text)} chars")
-                        return improved_text
-                    else:
-                        logger.error(f"No choices in OpenRouter response: {data}")
-                        return None
+            response = await model_router.post(
+                "rewrite",
+                f"{self.base_url}/chat/completions",
+                headers=self.headers,
+                payload={
+                    "messages": [
+                        {
+                            "role": "system",
+                            "content": IMPROVE_SYSTEM_PROMPT
+                        },
+                        {
+                            "role": "user",
+                            "content": prompt
+                        }
+                    ],
+                    "max_tokens": 1000,
+                    "temperature": 0.7,
+                    "top_p": 0.9
+                }
+            )
+            
+            if response.status_code == 200:
+                data = response.json()
+                if "choices" in data and len(data["choices"]) > 0:
+                    improved_text = data["choices"][0]["message"]["content"].strip()
+                    logger.info(f"Successfully improved text with custom prompt: {len(original_text)} -> {len(improved_text)} chars")
+                    return improved_text
                 else:
-                    logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                    logger.error(f"No choices in OpenRouter response: {data}")
                     return None
-                    
+            else:
+                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                return None
+                
+        except LLMUnavailableError as e:
+            logger.error(f"OpenRouter unavailable: {str(e)}")
+            return None
         except httpx.TimeoutException:
             logger.error("OpenRouter API timeout")
             return None
@@ -227,16 +264,91 @@ class OpenRouterService:
             logger.error(f"Error improving text with OpenRouter: {str(e)}")
             return None
     
+    async def stream_rewrite_text(self, original_text: str) -> AsyncIterator[str]:
+        """Streaming counterpart of rewrite_text: yields the text as OpenRouter generates it.
+        
+        Like the editor's rewrite_text calls, it always samples afresh (no response cache).
+        Raises LLMUnavailableError or OpenRouterStreamError when the request fails.
+        """
+        prompt = self._create_rewrite_prompt(original_text)
+        length = 0
+        async for delta in self._stream_completion(REWRITE_SYSTEM_PROMPT, prompt):
+            length += len(delta)
+            yield delta
+        
+        if length:
+            logger.info(f"Successfully streamed rewrite: {len(original_text)} -> {length} chars")
+    
+    async def stream_improve_text_with_prompt(self, original_text: str, user_prompt: str) -> AsyncIterator[str]:
+        """Streaming counterpart of improve_text_with_prompt."""
+        prompt = self._create_improve_prompt(original_text, user_prompt)
+        async for delta in self._stream_completion(IMPROVE_SYSTEM_PROMPT, prompt):
+            yield delta
+    
+    async def _stream_completion(self, system_prompt: str, prompt: str) -> AsyncIterator[str]:
+        """Yield content deltas of a streamed chat completion (OpenRouter server-sent events).
+        
+        The ledger row is written here: `usage` comes with the last chunk.
+        """
+        started = time.monotonic()
+        response = await model_router.post(
+            "rewrite",
+            f"{self.base_url}/chat/completions",
+            headers=self.headers,
+            payload={
+                "messages": [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                "max_tokens": 1000,
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "stream": True
+            },
+            stream=True,
+        )
+        usage = None
+        outcome = "http_error"
+        try:
+            if response.status_code != 200:
+                body = (await response.aread()).decode("utf-8", errors="replace")
+                raise OpenRouterStreamError(f"OpenRouter API error: {response.status_code} - {body}")
+            outcome = "stream_error"
+            
+            async for line in response.aiter_lines():
+                # Skip event separators and ": OPENROUTER PROCESSING" keep-alive comments
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    chunk = json.loads(data)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping malformed OpenRouter stream chunk: {data[:200]}")
+                    continue
+                if chunk.get("error"):
+                    raise OpenRouterStreamError(f"OpenRouter stream error: {chunk['error']}")
+                if chunk.get("usage"):
+                    usage = chunk["usage"]
+                
+                choices = chunk.get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    yield delta
+            outcome = "ok"
+        finally:
+            await response.aclose()
+            llm_ledger.record_attempt(
+                "rewrite", json.loads(response.request.content).get("model"), time.monotonic() - started,
+                outcome, status_code=response.status_code, usage=usage,
+            )
+    
     def _create_improve_prompt(self, original_text: str, user_prompt: str) -> str:
         """Create a prompt for text improvement with user instructions using database setting."""
         try:
-            db = next(get_db())
-            setting = crud.get_setting(db, "improve_prompt")
-            db.close()
-            
-            if setting and setting.value:
-                prompt_template = setting.value
-            else:
+            prompt_template = settings_cache.get("improve_prompt")
+            if not prompt_template:
                 # Fallback to default prompt if setting not found
                 prompt_template = """Улучши следующий текст согласно указаниям пользователя:
 
@@ -285,12 +397,13 @@ class OpenRouterService:
     async def test_connection(self) -> bool:
         """Test connection to OpenRouter API."""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/models",
-                    headers=self.headers
-                )
-                return response.status_code == 200
+            client = llm_http_client.get()
+            response = await client.get(
+                f"{self.base_url}/models",
+                headers=self.headers,
+                timeout=10.0
+            )
+            return response.status_code == 200
         except Exception as e:
             logger.error(f"OpenRouter connection test failed: {str(e)}")
             return False
@@ -2,9 +2,11 @@ import asyncio
 import logging
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import SessionLocal, get_pool_metrics
 from models import Post, PostStatus
 import crud
+from notifications import notification_hub
+from job_queue import post_queue, job_post_ids
 from telegram_service import telegram_service
 # openrouter_service import removed - now handled by separate LLM Worker
 from telegram.constants import ParseMode
@@ -18,11 +20,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+QUEUE_GROUP = "publisher"
+
+
 class PostPublisher:
     def __init__(self):
         self.running = False
         self.tasks = set()
         self.db = SessionLocal()
+        self.worker_id = crud.make_worker_id("publisher")
     
     async def start(self):
         """Start the post publisher worker with database control."""
@@ -73,6 +79,7 @@ class PostPublisher:
     
     async def check_database_status(self):
         """Check database for should_run flag and stop if needed."""
+        control = notification_hub.subscribe("service_control:publisher_status")
         while True:
             try:
                 publisher_status = crud.get_publisher_status(self.db)
@@ -81,7 +88,7 @@ class PostPublisher:
                     self.running = False
                     break
                 
-                await asyncio.sleep(5)  # Check every 5 seconds
+                await control.wait(5)  # Woken by should_run changes, polls every 5 seconds without LISTEN
             except Exception as e:
                 logger.error(f"Error checking database status: {str(e)}")
                 await asyncio.sleep(10)
@@ -91,6 +98,7 @@ class PostPublisher:
         while self.running:
             try:
                 crud.update_publisher_status(self.db, heartbeat=True)
+                logger.debug(f"DB pool: {get_pool_metrics()['sync']}")
                 await asyncio.sleep(30)  # Send heartbeat every 30 seconds
             except Exception as e:
                 logger.error(f"Error sending heartbeat: {str(e)}")
@@ -101,39 +109,62 @@ class PostPublisher:
     async def publish_posts(self):
         """Publish scheduled posts and posts marked for immediate publishing."""
         logger.info("Post publishing loop started (scheduled and immediate publishing)")
+        posts_ready = notification_hub.subscribe("posts:publishing", "posts:scheduled")
+        jobs = []
         
         while self.running:
             try:
                 db = SessionLocal()
-                
-                # Get scheduled posts that are ready to be published
-                scheduled_posts = crud.get_scheduled_posts_ready_to_publish(db, limit=5)
-                
-                # Get posts marked for immediate publishing (status = "publishing")
-                immediate_posts = db.query(Post).filter(
-                    Post.status == PostStatus.PUBLISHING
-                ).limit(5).all()
-                
-                # Publish scheduled posts that are ready
-                for post in scheduled_posts:
-                    try:
-                        logger.info(f"📅 Publishing scheduled post {post.id} (scheduled for {post.scheduled_at})")
-                        await self.publish_single_post(db, post)
-                    except Exception as e:
-                        logger.error(f"Error publishing scheduled post {post.id}: {str(e)}")
-                
-                # Publish posts marked for immediate publishing
-                for post in immediate_posts:
+                scheduled_posts = []
+                immediate_posts = []
+                try:
+                    if jobs:
+                        # Posts handed over through the job queue
+                        immediate_posts = crud.claim_publishing_posts(
+                            db, self.worker_id, post_ids=job_post_ids(jobs, PostStatus.PUBLISHING)
+                        )
+                        if job_post_ids(jobs, PostStatus.SCHEDULED):
+                            # A post was (re)scheduled: publish it now if it is already due
+                            scheduled_posts = crud.claim_scheduled_posts(db, self.worker_id, limit=5)
+                    else:
+                        # Claim scheduled posts that are ready to be published
+                        scheduled_posts = crud.claim_scheduled_posts(db, self.worker_id, limit=5)
+                        
+                        # Claim posts marked for immediate publishing (status = "publishing")
+                        immediate_posts = crud.claim_publishing_posts(db, self.worker_id, limit=5)
+                    
+                    # Publish scheduled posts that are ready
+                    for post in scheduled_posts:
+                        try:
+                            logger.info(f"📅 Publishing scheduled post {post.id} (scheduled for {post.scheduled_at})")
+                            await self.publish_single_post(db, post)
+                        except Exception as e:
+                            logger.error(f"Error publishing scheduled post {post.id}: {str(e)}")
+                    
+                    # Publish posts marked for immediate publishing
+                    for post in immediate_posts:
+                        try:
+                            logger.info(f"🚀 Publishing immediate post {post.id} (manual publish request)")
+                            await self.publish_single_post(db, post)
+                        except Exception as e:
+                            logger.error(f"Error publishing immediate post {post.id}: {str(e)}")
+                    
+                    next_scheduled_at = crud.get_next_scheduled_at(db)
+                finally:
                     try:
-                        logger.info(f"🚀 Publishing immediate post {post.id} (manual publish request)")
-                        await self.publish_single_post(db, post)
-                    except Exception as e:
-                        logger.error(f"Error publishing immediate post {post.id}: {str(e)}")
+                        crud.release_posts(db, scheduled_posts + immediate_posts)
+                    finally:
+                        db.close()
+                await post_queue.ack(QUEUE_GROUP, jobs)
                 
-                db.close()
-                
-                # Wait before checking for more posts
-                await asyncio.sleep(15)
+                # Wait for a post to be queued, the next scheduled post to fall due, or the fallback poll
+                due_in = None
+                if next_scheduled_at:
+                    due_in = (next_scheduled_at - datetime.now(timezone.utc)).total_seconds()
+                jobs = await post_queue.next_jobs(
+                    QUEUE_GROUP, self.worker_id, (PostStatus.PUBLISHING, PostStatus.SCHEDULED), posts_ready, 15,
+                    max_wait=due_in
+                )
                 
             except Exception as e:
                 logger.error(f"Error in post publishing loop: {str(e)}")
@@ -353,6 +384,8 @@ async def main():
     logger.info("🚀 Publisher main() function started - ENTRY POINT")
     logger.info("Publisher process started")
     
+    control = notification_hub.subscribe("service_control:publisher_status")
+    
     while True:
         try:
             # Check if publisher should run
@@ -379,8 +412,8 @@ async def main():
             
             db.close()
             
-            # Wait before checking again
-            await asyncio.sleep(10)
+            # Wait before checking again (or until should_run changes)
+            await control.wait(10)
             
         except KeyboardInterrupt:
             logger.info("Received interrupt signal")
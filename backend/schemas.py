@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 from enum import Enum
 from models import PostStatus
@@ -152,6 +152,7 @@ class Post(PostBase):
     llm_classification_confidence: Optional[int] = None
     llm_classification_result: Optional[str] = None
     is_manual: bool = False
+    duplicate_of_id: Optional[int] = None
     status: PostStatus
     created_at: datetime
     processed_at: Optional[datetime]
@@ -171,6 +172,11 @@ class Post(PostBase):
         from_attributes = True
 
 
+class PostPage(BaseModel):
+    items: List[Post]
+    next_cursor: Optional[str] = None
+
+
 # Settings schemas
 class SettingBase(BaseModel):
     key: str
@@ -214,6 +220,8 @@ class AIModelBase(BaseModel):
     name: str
     model_id: str
     description: Optional[str] = None
+    task: Optional[Literal["classification", "rewrite"]] = None  # None: used for any task
+    priority: int = 0  # position in the task's fallback chain, lower first
 
 
 class AIModelCreate(AIModelBase):
@@ -226,6 +234,8 @@ class AIModelUpdate(BaseModel):
     description: Optional[str] = None
     is_active: Optional[bool] = None
     is_default: Optional[bool] = None
+    task: Optional[Literal["classification", "rewrite"]] = None
+    priority: Optional[int] = None
 
 
 # Service Status Schemas
@@ -256,6 +266,28 @@ class AIModel(AIModelBase):
         from_attributes = True
 
 
+# LLM call ledger schemas
+class LLMCall(BaseModel):
+    id: int
+    request_id: str
+    task: str
+    model: Optional[str]
+    post_id: Optional[int]
+    target_channel_id: Optional[int]
+    batch_size: int
+    prompt_tokens: Optional[int]
+    completion_tokens: Optional[int]
+    cost: Optional[float]
+    latency_ms: Optional[int]
+    cache_hit: bool
+    outcome: str
+    status_code: Optional[int]
+    created_at: Optional[datetime]
+    
+    class Config:
+        from_attributes = True
+
+
 # Response schemas
 class MessageResponse(BaseModel):
     message: str
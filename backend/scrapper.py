@@ -2,9 +2,11 @@ import asyncio
 import logging
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database import SessionLocal, get_pool_metrics
 from models import SourceChannel, Post, PostStatus
 import crud
+from notifications import notification_hub
+from job_queue import post_queue
 from schemas import PostCreate
 from telegram_scraper_service import telegram_scraper
 from telegram_service import telegram_service
@@ -91,6 +93,7 @@ class ChannelScrapper:
     
     async def check_database_status(self):
         """Check database for should_run flag and stop if needed."""
+        control = notification_hub.subscribe("service_control:scrapper_status")
         while True:
             try:
                 scrapper_status = crud.get_scrapper_status(self.db)
@@ -99,7 +102,7 @@ class ChannelScrapper:
                     self.running = False
                     break
                 
-                await asyncio.sleep(5)  # Check every 5 seconds
+                await control.wait(5)  # Woken by should_run changes, polls every 5 seconds without LISTEN
             except Exception as e:
                 logger.error(f"Error checking database status: {str(e)}")
                 await asyncio.sleep(10)
@@ -109,6 +112,7 @@ class ChannelScrapper:
         while self.running:
             try:
                 crud.update_scrapper_status(self.db, heartbeat=True)
+                logger.debug(f"DB pool: {get_pool_metrics()['sync']}")
                 await asyncio.sleep(30)  # Send heartbeat every 30 seconds
             except Exception as e:
                 logger.error(f"Error sending heartbeat: {str(e)}")
@@ -210,9 +214,11 @@ class ChannelScrapper:
         
         try:
             db = SessionLocal()
-            
-            # Get active source channels
-            channels = crud.get_source_channels(db, active_only=True)
+            try:
+                # Get active source channels
+                channels = crud.get_source_channels(db, active_only=True)
+            finally:
+                db.close()
             
             if not channels:
                 logger.info("📭 Нет активных каналов для мониторинга")
@@ -254,57 +260,56 @@ class ChannelScrapper:
             logger.info(f"📝 Message text: {message_data.get('message', 'No text')[:100]}...")
             
             db = SessionLocal()
-            
-            # Find the source channel
-            # Try with @ prefix first, then without
-            channel = crud.get_source_channel_by_id(db, f"@{channel_name}")
-            if not channel:
-                channel = crud.get_source_channel_by_id(db, channel_name)
-            if not channel:
-                logger.warning(f"❌ Source channel {channel_name} (tried @{channel_name} and {channel_name}) not found in database")
-                return
-            
-            logger.info(f"✅ Found source channel: {channel.channel_name} (ID: {channel.id})")
-            
-            # Check if message already exists
-            existing_post = crud.get_post_by_message_id(db, message_data['message_id'], channel.id)
-            if existing_post:
-                logger.info(f"⚠️ Message {message_data['message_id']} already exists as post {existing_post.id}")
-                return  # Message already processed
+            try:
+                # Find the source channel
+                # Try with @ prefix first, then without
+                channel = crud.get_source_channel_by_id(db, f"@{channel_name}")
+                if not channel:
+                    channel = crud.get_source_channel_by_id(db, channel_name)
+                if not channel:
+                    logger.warning(f"❌ Source channel {channel_name} (tried @{channel_name} and {channel_name}) not found in database")
+                    return
+                
+                logger.info(f"✅ Found source channel: {channel.channel_name} (ID: {channel.id})")
+                
+                # Check if message has content (text or media)
+                message_text = message_data.get('message', '')
+                media_info = message_data.get('media')
+                has_media = bool(media_info or message_data.get('media_type'))
+                
+                if not message_text.strip() and not has_media:
+                    logger.info(f"⏭️ Пропускаю сообщение {message_data['message_id']} - нет текста и медиафайлов")
+                    return
 
-            # Check if message has content (text or media)
-            message_text = message_data.get('message', '')
-            media_info = message_data.get('media')
-            has_media = bool(media_info or message_data.get('media_type'))
-            
-            if not message_text.strip() and not has_media:
-                logger.info(f"⏭️ Пропускаю сообщение {message_data['message_id']} - нет текста и медиафайлов")
-                return
+                # Prepare media data for storage
+                original_media = None
+                if media_info:
+                    # New format with media groups support
+                    original_media = media_info
+                elif message_data.get('media_type'):
+                    # Legacy format - convert to new format
+                    original_media = {
+                        'type': message_data.get('media_type'),
+                        'path': message_data.get('media_path')
+                    }
 
-            # Prepare media data for storage
-            original_media = None
-            if media_info:
-                # New format with media groups support
-                original_media = media_info
-            elif message_data.get('media_type'):
-                # Legacy format - convert to new format
-                original_media = {
-                    'type': message_data.get('media_type'),
-                    'path': message_data.get('media_path')
+                # Create new post from message
+                post_data = {
+                    'source_channel_id': channel.id,
+                    'original_message_id': message_data['message_id'],
+                    'original_text': message_data['message'],
+                    'original_media': original_media
                 }
-
-            # Create new post from message
-            post_data = {
-                'source_channel_id': channel.id,
-                'original_message_id': message_data['message_id'],
-                'original_text': message_data['message'],
-                'original_media': original_media
-            }
-            
-            new_post = crud.create_post(db, PostCreate(**post_data))
-            logger.info(f"🎉 Created new post {new_post.id} from message {message_data['message_id']} in {channel_name}")
-            
-            db.close()
+                
+                # ON CONFLICT DO NOTHING replaces the separate "already exists" lookup
+                new_post_ids = crud.bulk_create_posts(db, [PostCreate(**post_data)])
+                if not new_post_ids:
+                    logger.info(f"⚠️ Message {message_data['message_id']} already exists as a post")
+                    return  # Message already processed
+                await post_queue.enqueue(PostStatus.SCRAPED, new_post_ids)
+                logger.info(f"🎉 Created new post {new_post_ids[0]} from message {message_data['message_id']} in {channel_name}")
+            finally:
+                db.close()
             
         except Exception as e:
             logger.error(f"💥 Error handling new message from {channel_name}: {str(e)}")
@@ -413,7 +418,7 @@ class ChannelScrapper:
             logger.info(f"✅ Найдено {len(messages)} сообщений в канале {channel.channel_name}")
             logger.info(f"📊 Начинаю анализ сообщений...")
             
-            new_posts_count = 0
+            new_posts = []
             latest_message_id = channel.last_message_id or 0
             
             for i, message in enumerate(messages, 1):
@@ -437,23 +442,14 @@ class ChannelScrapper:
                         latest_message_id = max(latest_message_id, message_id)
                         continue
                     
-                    # Check if we already have this post
-                    existing_post = crud.get_post_by_source_message(db, channel.id, message_id)
-                    if not existing_post:
-                        # Create new post
-                        post_data = {
-                            'source_channel_id': channel.id,
-                            'original_message_id': message_id,
-                            'original_text': message_text,
-                            'original_media': message.get('media', None)
-                        }
-                        
-                        new_post = crud.create_post(db, PostCreate(**post_data))
-                        new_posts_count += 1
-                        logger.info(f"✅ Создан новый пост ID: {new_post.id} из сообщения {message_id}")
-                        logger.info(f"📊 Длина текста: {len(message_text)} символов")
-                    else:
-                        logger.info(f"⚠️ Сообщение {message_id} уже существует как пост {existing_post.id}")
+                    # Collect the post; the whole batch is inserted below
+                    post_data = {
+                        'source_channel_id': channel.id,
+                        'original_message_id': message_id,
+                        'original_text': message_text,
+                        'original_media': message.get('media', None)
+                    }
+                    new_posts.append(PostCreate(**post_data))
                     
                     latest_message_id = max(latest_message_id, message_id)
                 else:
@@ -461,6 +457,15 @@ class ChannelScrapper:
                 
                 logger.info(f"{'─' * 50}")  # Separator between messages
             
+            # Insert all new posts in one transaction; messages we already have are skipped
+            new_post_ids = crud.bulk_create_posts(db, new_posts)
+            new_posts_count = len(new_post_ids)
+            await post_queue.enqueue(PostStatus.SCRAPED, new_post_ids)
+            if new_post_ids:
+                logger.info(f"✅ Созданы новые посты ID: {new_post_ids}")
+            if len(new_posts) > new_posts_count:
+                logger.info(f"⚠️ {len(new_posts) - new_posts_count} сообщений уже существуют как посты")
+            
             # Update channel's last checked time and message ID
             crud.update_source_channel_last_checked(db, channel.id, latest_message_id)
             
@@ -491,6 +496,8 @@ async def main():
     logger.info("🚀 Scrapper main() function started - ENTRY POINT")
     logger.info("Scrapper process started")
     
+    control = notification_hub.subscribe("service_control:scrapper_status")
+    
     while True:
         try:
             # Check if scrapper should run
@@ -517,8 +524,8 @@ async def main():
             
             db.close()
             
-            # Wait before checking again
-            await asyncio.sleep(10)
+            # Wait before checking again (or until should_run changes)
+            await control.wait(10)
             
         except KeyboardInterrupt:
             logger.info("Received interrupt signal")
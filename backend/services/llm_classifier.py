@@ -1,76 +1,273 @@
 from typing import Optional, List, Dict, Any
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from models import TargetChannel, Post, PostStatus
 from schemas import TargetChannel as TargetChannelSchema
-import httpx
+from http_client import llm_http_client
+from llm_throttle import LLMUnavailableError
+from model_router import ModelRouter
+from llm_cache import llm_response_cache, cache_key
+from llm_ledger import llm_ledger
+from services.pre_classifier import LocalPreClassifier
+from services.llm_output import extract_json, parse_classification, parse_batch_classification
+from services.prompt_budget import PromptBudget, classification_prompt_budget, estimate_tokens
 import json
+import time
+from datetime import datetime, timezone
 import logging
 
 logger = logging.getLogger(__name__)
 
+BATCH_ITEM_MAX_TOKENS = 150  # response budget per post in a batch request
+REWRITE_MAX_TOKENS = 1000  # extra response budget per post when the rewrite is requested too
+REWRITE_CANDIDATES = 2  # channels per post whose rewrite instructions go into the prompt
+
 class LLMClassifier:
     """Service for classifying posts using LLM models"""
     
-    def __init__(self, api_key: str, model: str = "anthropic/claude-3-haiku"):
+    def __init__(self, api_key: str, model: str = "anthropic/claude-3-haiku",
+                 pre_classifier: Optional[LocalPreClassifier] = None, combined_rewrite: bool = False,
+                 router: Optional[ModelRouter] = None, prompt_budget: Optional[PromptBudget] = None,
+                 json_mode: bool = False):
         self.api_key = api_key
         self.model = model
+        # Picks the model (with fallbacks) from ai_models; None always uses `model`
+        self.router = router
         self.base_url = "https://openrouter.ai/api/v1"
+        # Settles obvious posts locally; None sends every post to the LLM
+        self.pre_classifier = pre_classifier
+        # Ranks the channels a post may go to (learned profiles when the pre-classifier has them)
+        self.candidate_ranker = pre_classifier or LocalPreClassifier()
+        # Ask for the target channel rewrite in the classification request itself
+        self.combined_rewrite = combined_rewrite
+        # Bounds the prompt size: long posts are trimmed, channel descriptions compacted
+        self.prompt_budget = prompt_budget or classification_prompt_budget
+        # Ask for response_format json_object on single-post requests (ignored by models without it)
+        self.json_mode = json_mode
     
     async def classify_post(self, db: Session, post: Post) -> Optional[Dict[str, Any]]:
         """Classify a post and determine the best target channel
         
         Returns:
-            Dict with 'target_channel_id', 'confidence', and 'reasoning'
-            or None if no suitable channel found
+            Dict with 'target_channel_id', 'confidence', and 'reasoning' (plus 'rewritten_text'
+            in combined mode) or None if no suitable channel found
         """
         try:
-            # Get all target channels with their descriptions and tags
-            target_channels = db.query(TargetChannel).all()
-            
-            if not target_channels:
+            channels_info = self._get_channels_info(db)
+            if not channels_info:
                 logger.warning("No target channels found for classification")
                 return None
             
-            # Prepare channel descriptions for LLM
-            channels_info = []
-            for channel in target_channels:
-                channel_info = {
-                    "id": channel.id,
-                    "name": channel.channel_name,
-                    "description": channel.description or "",
-                    "tags": channel.tags or []
-                }
-                channels_info.append(channel_info)
-            
-            # Create prompt for LLM
             post_text = post.original_text or post.processed_text or ""
-            prompt = self._create_classification_prompt(post_text, channels_info)
-            
-            # Call OpenAI API
-            response = await self._call_openai_api(prompt)
+            local = self._pre_classify(db, post, post_text, channels_info)
+            if local is not None:
+                self._store_classification(post, local)
+                db.commit()
+                return local
             
+            response = await self._classify_with_llm(post, post_text, channels_info)
             if response:
-                # Update post with classification data
-                post.llm_classification_confidence = response.get('confidence')
-                post.llm_classification_result = json.dumps(response)
+                self._store_classification(post, response)
                 db.commit()
                 
                 return response
             
             return None
             
+        except LLMUnavailableError:
+            raise  # not a classification result: the post stays queued for a later attempt
         except Exception as e:
             logger.error(f"Error classifying post {post.id}: {str(e)}")
             return None
     
-    def _create_classification_prompt(self, post_text: str, channels_info: List[Dict]) -> str:
-        """Create a prompt for LLM classification"""
-        channels_desc = "\n".join([
-            f"Channel {ch['id']}: {ch['name']}\n"
-            f"Description: {ch['description']}\n"
-            f"Tags: {', '.join(ch['tags'])}\n"
+    async def _classify_with_llm(self, post: Post, post_text: str, channels_info: List[Dict]) -> Optional[Dict[str, Any]]:
+        """Classification of one post by the LLM (or the response cache); touches no database"""
+        channels_info = self._with_candidate_rewrites(channels_info, [post_text])
+        
+        # Create prompt for LLM
+        prompt = self._create_classification_prompt(post_text, channels_info)
+        
+        # Identical text against the same channels and model was classified before
+        model = await self._model()
+        key = self._classification_cache_key(post_text, channels_info, model)
+        with llm_ledger.track("classification", [post.id]) as call:
+            response = await llm_response_cache.get(key)
+            if response is not None:
+                logger.info(f"Post {post.id} classification served from cache")
+                call.mark_cache_hit(model)
+            else:
+                # Call OpenAI API
+                max_tokens = 500 + (REWRITE_MAX_TOKENS if self._rewrite_channels(channels_info) else 0)
+                response = parse_classification(
+                    await self._call_openai_api(prompt, max_tokens=max_tokens, json_object=True)
+                )
+                await llm_response_cache.set(key, response)
+            if isinstance(response, dict):
+                call.set_channel(post.id, response.get("target_channel_id"))
+        return response
+    
+    async def classify_posts_batch(self, db: Session, posts: List[Post]) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Classify several posts with one request, sending the channel catalogue once
+        
+        Cached posts are answered from the cache. Posts the batch response leaves out or
+        answers with a malformed item fall back to a single-post classify_post call.
+        Raises LLMUnavailableError (nothing committed) when OpenRouter can't be reached.
+        
+        Returns:
+            Dict of post id -> classification (as classify_post returns it, or None)
+        """
+        channels_info = self._get_channels_info(db)
+        if not channels_info:
+            logger.warning("No target channels found for classification")
+            return {post.id: None for post in posts}
+        
+        results: Dict[int, Optional[Dict[str, Any]]] = {}
+        model = await self._model()
+        keys = {}
+        uncached = []
+        cache_hits = {}
+        for post in posts:
+            post_text = post.original_text or post.processed_text or ""
+            local = self._pre_classify(db, post, post_text, channels_info)
+            if local is not None:
+                self._store_classification(post, local)
+                results[post.id] = local
+                continue
+            
+            keys[post.id] = self._classification_cache_key(
+                post_text, self._with_candidate_rewrites(channels_info, [post_text]), model
+            )
+            cached = await llm_response_cache.get(keys[post.id])
+            if cached is not None:
+                logger.info(f"Post {post.id} classification served from cache")
+                self._store_classification(post, cached)
+                results[post.id] = cached
+                cache_hits[post.id] = cached.get("target_channel_id") if isinstance(cached, dict) else None
+            else:
+                uncached.append(post)
+        llm_ledger.record_cache_hits("classification", model, cache_hits)
+        
+        batch_items = {}
+        batch_channels = self._with_candidate_rewrites(
+            channels_info, [post.original_text or post.processed_text or "" for post in uncached]
+        )
+        # Posts over their share of the batch prompt are classified on their own, trimmed
+        post_budget = self._batch_post_budget(len(uncached), batch_channels)
+        batched = [
+            post for post in uncached
+            if self.prompt_budget.fits(post.original_text or post.processed_text or "", post_budget)
+        ]
+        if len(batched) > 1:
+            prompt = self._create_batch_classification_prompt(batched, batch_channels)
+            item_tokens = BATCH_ITEM_MAX_TOKENS + (REWRITE_MAX_TOKENS if self._rewrite_channels(batch_channels) else 0)
+            with llm_ledger.track("classification", [post.id for post in batched]) as call:
+                response = await self._call_openai_api(prompt, max_tokens=item_tokens * len(batched) + 100)
+                batch_items = self._parse_batch_response(response, {post.id for post in batched})
+                for post_id, item in batch_items.items():
+                    call.set_channel(post_id, item.get("target_channel_id"))
+            logger.info(f"Batch classification answered {len(batch_items)}/{len(batched)} posts in one request")
+        
+        for post in uncached:
+            item = batch_items.get(post.id)
+            if item is None:
+                # Missing or malformed in the batch answer (or a batch of one): classify on its own
+                results[post.id] = await self.classify_post(db, post)
+                continue
+            await llm_response_cache.set(keys[post.id], item)
+            self._store_classification(post, item)
+            results[post.id] = item
+        
+        db.commit()
+        return results
+    
+    def _pre_classify(self, db: Session, post: Post, post_text: str, channels_info: List[Dict]) -> Optional[Dict[str, Any]]:
+        """Local decision for an obvious post, or None to ask the LLM"""
+        if not self.pre_classifier:
+            return None
+        try:
+            local = self.pre_classifier.classify(db, post_text, channels_info)
+        except Exception as e:
+            logger.error(f"Local pre-classifier failed for post {post.id}: {str(e)}")
+            return None
+        if local is not None:
+            logger.info(f"Post {post.id} classified locally without LLM: {local['reasoning']}")
+        return local
+    
+    def _get_channels_info(self, db: Session) -> List[Dict[str, Any]]:
+        """Target channel catalogue (id, name, description, tags, threshold) for the prompts
+        
+        In combined mode each channel also carries its rewrite prompt.
+        """
+        channels_info = []
+        for channel in db.query(TargetChannel).order_by(TargetChannel.id).all():
+            channel_info = {
+                "id": channel.id,
+                "name": channel.channel_name,
+                "description": channel.description or "",
+                "tags": channel.tags or [],
+                "threshold": channel.classification_threshold
+            }
+            if self.combined_rewrite:
+                channel_info["rewrite_prompt"] = (channel.rewrite_prompt or "").strip()
+            channels_info.append(channel_info)
+        return channels_info
+    
+    def _rewrite_channels(self, channels_info: List[Dict]) -> List[Dict]:
+        """Channels whose rewrite is requested together with the classification"""
+        return [ch for ch in channels_info if ch.get("rewrite_prompt")]
+    
+    def _with_candidate_rewrites(self, channels_info: List[Dict], post_texts: List[str]) -> List[Dict]:
+        """Catalogue keeping rewrite instructions only for the posts' likeliest channels
+        
+        Sending every channel's rewrite prompt would cost tokens on every request for channels
+        the post won't go to. If the LLM picks a channel outside the candidates, the rewrite
+        stage rewrites the post afterwards, as for a trimmed post.
+        """
+        if not self._rewrite_channels(channels_info):
+            return channels_info
+        candidates = set()
+        for post_text in post_texts:
+            candidates.update(self.candidate_ranker.candidates(post_text, channels_info, REWRITE_CANDIDATES))
+        return [
+            ch if ch["id"] in candidates or not ch.get("rewrite_prompt") else {**ch, "rewrite_prompt": ""}
             for ch in channels_info
-        ])
+        ]
+    
+    async def _model(self) -> str:
+        """Model expected to answer: the head of the router's chain, or the fixed model"""
+        return await self.router.primary("classification") if self.router else self.model
+    
+    def _classification_cache_key(self, post_text: str, channels_info: List[Dict], model: str) -> str:
+        kind = "classification_rewrite" if self._rewrite_channels(channels_info) else "classification"
+        return cache_key(
+            kind, post_text, model,
+            self._create_classification_prompt("{post_text}", []), channels_info
+        )
+    
+    def _store_classification(self, post: Post, response: Dict[str, Any]):
+        """Update post with classification data"""
+        post.llm_classification_confidence = response.get('confidence')
+        # The rewrite goes to processed_text (see _apply_classification_rules), not the result log
+        post.llm_classification_result = json.dumps(
+            {key: value for key, value in response.items() if key != 'rewritten_text'}
+        )
+    
+    def _create_classification_prompt(self, post_text: str, channels_info: List[Dict]) -> str:
+        """Create a prompt for LLM classification
+        
+        The post is trimmed to what the prompt budget leaves for it. A trimmed post is
+        classified without the combined rewrite, which needs the full text; the rewrite
+        stage picks it up afterwards.
+        """
+        post_budget = self.prompt_budget.post_budget(estimate_tokens(self._classification_prompt("", channels_info)))
+        if not self.prompt_budget.fits(post_text, post_budget) and self._rewrite_channels(channels_info):
+            channels_info = [{**ch, "rewrite_prompt": ""} for ch in channels_info]
+            post_budget = self.prompt_budget.post_budget(estimate_tokens(self._classification_prompt("", channels_info)))
+        return self._classification_prompt(self.prompt_budget.fit_post(post_text, post_budget), channels_info)
+    
+    def _classification_prompt(self, post_text: str, channels_info: List[Dict]) -> str:
+        channels_desc = self._format_channels(channels_info)
+        rewrite_section, rewrite_field, rewrite_example = self._rewrite_prompt_parts(channels_info)
         
         prompt = f"""
 You are a content classifier. Analyze the following post and determine which target channel it best fits.
@@ -80,11 +277,11 @@ Post text:
 
 Available channels:
 {channels_desc}
-
+{rewrite_section}
 Please respond with a JSON object containing:
 - "target_channel_id": the ID of the best matching channel (or null if no good match)
 - "confidence": confidence percentage (50-100)
-- "reasoning": brief explanation of your choice
+- "reasoning": brief explanation of your choice{rewrite_field}
 
 If the post doesn't fit any channel well, set target_channel_id to null and confidence to 0.
 
@@ -92,47 +289,134 @@ Response format:
 {{
   "target_channel_id": 1,
   "confidence": 85,
-  "reasoning": "This post matches channel 1 because..."
+  "reasoning": "This post matches channel 1 because..."{rewrite_example}
 }}
 """
         return prompt
     
-    async def _call_openai_api(self, prompt: str) -> Optional[Dict[str, Any]]:
-        """Call OpenRouter API for classification"""
+    def _rewrite_prompt_parts(self, channels_info: List[Dict]):
+        """Extra prompt text asking for the channel rewrite in combined mode (empty otherwise)"""
+        rewrite_channels = self._rewrite_channels(channels_info)
+        if not rewrite_channels:
+            return "", "", ""
+        
+        instructions = "\n".join([
+            f"Channel {ch['id']} (threshold {ch['threshold']}%):\n"
+            f"{ch['rewrite_prompt'].replace('{original_text}', '[the post text above]')}\n"
+            for ch in rewrite_channels
+        ])
+        section = f"""
+Rewrite instructions (only some channels have them):
+{instructions}
+If the best matching channel has rewrite instructions and your confidence is at or above its
+threshold, also rewrite the post for that channel following its instructions. Otherwise do not
+rewrite.
+"""
+        field = '\n- "rewritten_text": the rewritten post, or null if no rewrite was requested'
+        example = ',\n  "rewritten_text": "..."'
+        return section, field, example
+    
+    def _format_channels(self, channels_info: List[Dict]) -> str:
+        return self.prompt_budget.channels_block(channels_info)
+    
+    def _batch_post_budget(self, posts: int, channels_info: List[Dict]) -> int:
+        """Tokens each post may take in a batch prompt of `posts` posts"""
+        empty = self._create_batch_classification_prompt([], channels_info)
+        return self.prompt_budget.post_budget(estimate_tokens(empty), posts)
+    
+    def _create_batch_classification_prompt(self, posts: List[Post], channels_info: List[Dict]) -> str:
+        """Create one prompt classifying several posts against the channel catalogue"""
+        rewrite_section, rewrite_field, _ = self._rewrite_prompt_parts(channels_info)
+        rewrite_example = ', "rewritten_text": "..."' if rewrite_field else ""
+        post_budget = self._batch_post_budget(len(posts), channels_info) if posts else 0
+        posts_desc = "\n".join([
+            f"[Post {post.id}]\n{self.prompt_budget.fit_post(post.original_text or post.processed_text or '', post_budget)}\n"
+            for post in posts
+        ])
+        
+        prompt = f"""
+You are a content classifier. For each post below, determine which target channel it best fits.
+
+Available channels:
+{self._format_channels(channels_info)}
+{rewrite_section.replace("the post text above", "the post text")}
+Posts:
+{posts_desc}
+
+Please respond with a JSON array containing one object per post, in the same order, each with:
+- "post_id": the post number shown in brackets
+- "target_channel_id": the ID of the best matching channel (or null if no good match)
+- "confidence": confidence percentage (50-100)
+- "reasoning": brief explanation of your choice{rewrite_field}
+
+If a post doesn't fit any channel well, set its target_channel_id to null and confidence to 0.
+
+Response format:
+[
+  {{"post_id": {posts[0].id if posts else 1}, "target_channel_id": 1, "confidence": 85, "reasoning": "This post matches channel 1 because..."{rewrite_example}}}
+]
+"""
+        return prompt
+    
+    def _parse_batch_response(self, response: Any, post_ids: set) -> Dict[int, Dict[str, Any]]:
+        """Valid items of a batch answer by post id; anything malformed is left out"""
+        items = {}
+        for item in parse_batch_classification(response):
+            post_id = item["post_id"]
+            if post_id in post_ids and post_id not in items:
+                items[post_id] = {key: value for key, value in item.items() if key != "post_id"}
+        return items
+    
+    async def _call_openai_api(self, prompt: str, max_tokens: int = 500, json_object: bool = False) -> Optional[Any]:
+        """Call OpenRouter API for classification
+        
+        Returns the JSON value recovered from the completion (see services/llm_output.py),
+        unvalidated. `json_object` requests JSON mode when the classifier has it enabled;
+        the batch prompt answers with an array, which JSON mode does not allow.
+        """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    json={
-                        "model": self.model,
-                        "messages": [
-                            {"role": "system", "content": "You are a helpful content classifier. Always respond with valid JSON."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.3,
-                        "max_tokens": 500
-                    }
+            url = f"{self.base_url}/chat/completions"
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+            payload = {
+                "messages": [
+                    {"role": "system", "content": "You are a helpful content classifier. Always respond with valid JSON."},
+                    {"role": "user", "content": prompt}
+                ],
+                "temperature": 0.3,
+                "max_tokens": max_tokens
+            }
+            if json_object and self.json_mode:
+                payload["response_format"] = {"type": "json_object"}
+            if self.router:
+                response = await self.router.post("classification", url, payload, headers=headers)
+            else:
+                started = time.monotonic()
+                response = await llm_http_client.post(url, headers=headers, json={**payload, "model": self.model})
+                llm_ledger.record_attempt(
+                    "classification", self.model, time.monotonic() - started,
+                    "ok" if response.status_code == 200 else "http_error",
+                    status_code=response.status_code,
+                    usage=response.json().get("usage") if response.status_code == 200 else None,
                 )
+            
+            if response.status_code != 200:
+                logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
+                return None
+            
+            response_data = response.json()
+            content = response_data["choices"][0]["message"]["content"].strip()
+            
+            # Parse JSON response, tolerating fences, surrounding prose and small syntax slips
+            result = extract_json(content)
+            if result is None:
+                logger.error(f"Failed to parse LLM response as JSON: {content}")
+            return result
                 
-                if response.status_code != 200:
-                    logger.error(f"OpenRouter API error: {response.status_code} - {response.text}")
-                    return None
-                
-                response_data = response.json()
-                content = response_data["choices"][0]["message"]["content"].strip()
-                
-                # Parse JSON response
-                try:
-                    result = json.loads(content)
-                    return result
-                except json.JSONDecodeError:
-                    logger.error(f"Failed to parse LLM response as JSON: {content}")
-                    return None
-                    
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"OpenRouter API error: {str(e)}")
             return None
@@ -142,53 +426,115 @@ Response format:
         
         Returns:
             True if post was processed successfully, False otherwise
+        
+        Raises:
+            LLMUnavailableError: OpenRouter could not be reached; the post is left unchanged
         """
         try:
             # Classify the post
             classification_result = await self.classify_post(db, post)
-            
-            if not classification_result or not classification_result.get('target_channel_id'):
-                # No suitable channel found, mark as waiting for manual review
-                post.status = PostStatus.WAITING
-                db.commit()
-                logger.info(f"Post {post.id} marked as WAITING - no suitable channel found")
-                return True
-            
-            target_channel_id = classification_result['target_channel_id']
-            confidence = classification_result['confidence']
-            
-            # Get target channel
-            target_channel = db.query(TargetChannel).filter(
-                TargetChannel.id == target_channel_id
-            ).first()
-            
-            if not target_channel:
-                logger.error(f"Target channel {target_channel_id} not found")
-                post.status = PostStatus.WAITING
-                db.commit()
-                return False
-            
-            # Update post with target channel
-            post.target_channel_id = target_channel_id
-            
-            # Apply classification rules
-            if confidence >= target_channel.classification_threshold:
-                if target_channel.auto_publish_enabled:
-                    # Auto-publish: rewrite and publish
-                    post.status = PostStatus.PENDING  # Will be published by publisher worker
-                    logger.info(f"Post {post.id} marked for auto-publishing to channel {target_channel_id}")
-                else:
-                    # Manual approval required: rewrite but don't publish
-                    post.status = PostStatus.PROCESSED
-                    logger.info(f"Post {post.id} processed but requires manual approval")
+            return self._apply_classification_rules(db, post, classification_result)
+        except LLMUnavailableError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing post classification {post.id}: {str(e)}")
+            return False
+    
+    async def process_post_classification_async(self, db: AsyncSession, post: Post) -> bool:
+        """process_post_classification for an AsyncSession (the API)
+        
+        The database work goes through run_sync, so it never blocks the event loop. The post
+        is always sent to the LLM: a manual classification skips the pre-classifier.
+        
+        Raises:
+            LLMUnavailableError: OpenRouter could not be reached; the post is left unchanged
+        """
+        try:
+            channels_info = await db.run_sync(self._get_channels_info)
+            classification_result = None
+            if channels_info:
+                post_text = post.original_text or post.processed_text or ""
+                classification_result = await self._classify_with_llm(post, post_text, channels_info)
             else:
-                # Confidence too low, wait for manual review
-                post.status = PostStatus.WAITING
-                logger.info(f"Post {post.id} marked as WAITING - confidence {confidence}% below threshold {target_channel.classification_threshold}%")
-            
-            db.commit()
-            return True
-            
+                logger.warning("No target channels found for classification")
+            if classification_result:
+                self._store_classification(post, classification_result)
+            return await db.run_sync(self._apply_classification_rules, post, classification_result)
+        except LLMUnavailableError:
+            raise
         except Exception as e:
             logger.error(f"Error processing post classification {post.id}: {str(e)}")
-            return False
\ No newline at end of file
+            return False
+    
+    async def process_posts_classification(self, db: Session, posts: List[Post]) -> Dict[int, bool]:
+        """Batch counterpart of process_post_classification
+        
+        Returns:
+            Dict of post id -> True if the post was processed successfully
+        """
+        classifications = await self.classify_posts_batch(db, posts)
+        processed = {}
+        for post in posts:
+            try:
+                processed[post.id] = self._apply_classification_rules(db, post, classifications.get(post.id))
+            except Exception as e:
+                logger.error(f"Error processing post classification {post.id}: {str(e)}")
+                db.rollback()
+                processed[post.id] = False
+        return processed
+    
+    def _apply_classification_rules(self, db: Session, post: Post, classification_result: Optional[Dict[str, Any]]) -> bool:
+        """Set target channel and status from a classification (commits)"""
+        if not classification_result or not classification_result.get('target_channel_id'):
+            # No suitable channel found, mark as waiting for manual review
+            post.status = PostStatus.WAITING
+            db.commit()
+            logger.info(f"Post {post.id} marked as WAITING - no suitable channel found")
+            return True
+        
+        target_channel_id = classification_result['target_channel_id']
+        confidence = classification_result['confidence']
+        
+        # Get target channel
+        target_channel = db.query(TargetChannel).filter(
+            TargetChannel.id == target_channel_id
+        ).first()
+        
+        if not target_channel:
+            logger.error(f"Target channel {target_channel_id} not found")
+            post.status = PostStatus.WAITING
+            db.commit()
+            return False
+        
+        # Update post with target channel
+        post.target_channel_id = target_channel_id
+        rewritten_text = classification_result.get('rewritten_text')
+        
+        # Apply classification rules
+        if confidence >= target_channel.classification_threshold:
+            if target_channel.auto_publish_enabled:
+                # Auto-publish: rewrite and publish
+                post.status = PostStatus.PENDING  # Will be published by publisher worker
+                logger.info(f"Post {post.id} marked for auto-publishing to channel {target_channel_id}")
+            else:
+                # Manual approval required: rewrite but don't publish
+                post.status = PostStatus.PROCESSED
+                logger.info(f"Post {post.id} processed but requires manual approval")
+        else:
+            # Confidence too low, wait for manual review
+            post.status = PostStatus.WAITING
+            logger.info(f"Post {post.id} marked as WAITING - confidence {confidence}% below threshold {target_channel.classification_threshold}%")
+        
+        # Combined mode: the channel rewrite came with the classification, so the rewrite
+        # stage (processed_text empty / processed_at unset) has nothing left to do
+        if (
+            post.status in (PostStatus.PENDING, PostStatus.PROCESSED)
+            and isinstance(rewritten_text, str) and rewritten_text.strip()
+            and target_channel.rewrite_prompt and target_channel.rewrite_prompt.strip()
+        ):
+            post.processed_text = rewritten_text.strip()
+            post.processed_at = datetime.now(timezone.utc)
+            logger.info(f"Post {post.id} rewritten for channel {target_channel_id} in the classification request")
+        
+        db.commit()
+        return True
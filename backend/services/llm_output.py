@@ -0,0 +1,179 @@
+"""Tolerant parsing of the JSON the classification model answers with.
+
+Models asked for "a JSON object" still wrap it in ```json fences, put a sentence before
+or after it, leave a trailing comma or use typographic quotes. `extract_json` takes the
+first JSON value it can recover from the completion:
+
+1. the completion as is, without a BOM and markdown fences;
+2. the first balanced {...} or [...] in it that parses (string-aware scan, so braces
+   inside the reasoning text don't cut it short);
+3. the same after removing trailing commas, then after straightening typographic quotes.
+
+What comes out is validated against ClassificationResult / BatchClassificationItem:
+numbers sent as strings ("85", "85%") or fractions (0.85) are coerced, and an item
+without a target_channel_id key, or with a channel but no usable confidence, is rejected
+rather than guessed.
+"""
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, ConfigDict, ValidationError, field_validator, model_validator
+
+logger = logging.getLogger(__name__)
+
+_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "«": '"', "»": '"'})
+_NULLS = {"", "null", "none", "nil", "n/a"}
+MAX_CANDIDATES = 50  # opening brackets tried per repair
+
+
+def _loads(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def _balanced(text: str, start: int) -> Optional[str]:
+    """The JSON object or array opening at `text[start]`, if its brackets close."""
+    depth = 0
+    in_string = escaped = False
+    for index in range(start, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                return text[start:index + 1]
+    return None
+
+
+def _candidates(text: str):
+    """`text` itself, then each balanced {...} / [...] in it, outermost first."""
+    yield text
+    index = 0
+    tried = 0
+    while index < len(text) and tried < MAX_CANDIDATES:
+        if text[index] in "{[":
+            tried += 1
+            candidate = _balanced(text, index)
+            if candidate:
+                yield candidate
+        index += 1
+
+
+def extract_json(content: Optional[str]) -> Any:
+    """First JSON object or array recoverable from a completion; None if there is none."""
+    if not content:
+        return None
+    text = content.strip().lstrip("\ufeff")
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    
+    without_commas = _TRAILING_COMMA.sub(r"\1", text)
+    # Repairs go from none to the riskiest: typographic quotes are also legitimate inside strings
+    for repaired in (text, without_commas, without_commas.translate(_QUOTES)):
+        for candidate in _candidates(repaired):
+            value = _loads(candidate)
+            if isinstance(value, (dict, list)):
+                return value
+    return None
+
+
+class ClassificationResult(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    target_channel_id: Optional[int]
+    confidence: Optional[int] = None
+    reasoning: str = ""
+    rewritten_text: Optional[str] = None
+    
+    @field_validator("target_channel_id", mode="before")
+    @classmethod
+    def _channel_id(cls, value):
+        if isinstance(value, str):
+            value = value.strip().lstrip("#")
+            if value.lower() in _NULLS:
+                return None
+        return value
+    
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def _confidence(cls, value):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            value = float(value.strip().rstrip("%").strip())
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise ValueError("confidence must be a number")
+        if isinstance(value, float) and 0 < value <= 1:
+            value *= 100  # answered as a fraction
+        return max(0, min(100, round(value)))
+    
+    @field_validator("reasoning", mode="before")
+    @classmethod
+    def _reasoning(cls, value):
+        return "" if value is None else str(value)
+    
+    @field_validator("rewritten_text", mode="before")
+    @classmethod
+    def _rewritten_text(cls, value):
+        if isinstance(value, str) and value.strip().lower() in _NULLS:
+            return None
+        return value
+    
+    @model_validator(mode="after")
+    def _confidence_required(self):
+        # Only a "no channel" answer may leave the confidence out
+        if self.confidence is None:
+            if self.target_channel_id is not None:
+                raise ValueError("confidence is required with a target_channel_id")
+            self.confidence = 0
+        return self
+
+
+class BatchClassificationItem(ClassificationResult):
+    post_id: int
+
+
+def parse_classification(value: Any) -> Optional[Dict[str, Any]]:
+    """Validated single-post classification from extract_json's output, or None."""
+    if isinstance(value, list) and len(value) == 1:
+        value = value[0]  # an object wrapped in an array
+    if not isinstance(value, dict):
+        return None
+    try:
+        return ClassificationResult.model_validate(value).model_dump()
+    except ValidationError as e:
+        logger.error(f"Classification response failed validation: {e.errors()[0]['msg']} in {value}")
+        return None
+
+
+def parse_batch_classification(value: Any) -> List[Dict[str, Any]]:
+    """Valid items of a batch classification answer; malformed ones are left out."""
+    if isinstance(value, dict):
+        # Some models wrap the array in an object ({"results": [...]})
+        value = next((item for item in value.values() if isinstance(item, list)), [value])
+    if not isinstance(value, list):
+        return []
+    items = []
+    for item in value:
+        try:
+            items.append(BatchClassificationItem.model_validate(item).model_dump())
+        except ValidationError:
+            continue
+    return items
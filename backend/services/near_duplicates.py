@@ -0,0 +1,70 @@
+"""MinHash signatures with LSH banding for near-duplicate post detection.
+
+Source channels often repost the same story with a few words changed, a link swapped or an
+emoji added. Posts are compared by the Jaccard similarity of their word and word-pair sets;
+at SIMILARITY_THRESHOLD or above they are treated as the same story.
+
+Comparing every new post against every recent one does not scale, so each post gets a MinHash
+signature of NUM_PERM values split into BANDS bands of ROWS values. Each band is hashed into a
+bucket stored in post_lsh_bands. Posts that share any bucket are candidates, and the exact
+similarity is then checked on the candidates' texts. With 8 bands of 4 rows a pair at 0.7
+similarity becomes a candidate ~89% of the time, at 0.8 ~98%, at 0.3 ~6%.
+"""
+import hashlib
+import random
+import re
+import unicodedata
+from typing import List, Optional, Set
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+SIMILARITY_THRESHOLD = 0.7
+MIN_TOKENS = 8  # shorter texts ("Фото", "Подписывайтесь") collide too easily to dedupe
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20240601)  # fixed seed: signatures must be stable across processes and restarts
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+_NOISE = re.compile(r"https?://\S+|t\.me/\S+|@\w+")  # links and mentions differ between reposts
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return _TOKEN.findall(_NOISE.sub(" ", text))
+
+
+def features(text: Optional[str]) -> Set[str]:
+    """Words and adjacent word pairs of the text; empty if it is too short to compare."""
+    tokens = tokenize(text)
+    if len(tokens) < MIN_TOKENS:
+        return set()
+    return set(tokens) | {f"{a} {b}" for a, b in zip(tokens, tokens[1:])}
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(feature_set: Set[str]) -> List[int]:
+    hashes = [_hash64(feature) for feature in feature_set]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(feature_set: Set[str]) -> List[int]:
+    """One signed 32-bit bucket per band (index = band number); empty without features."""
+    if not feature_set:
+        return []
+    signature = minhash(feature_set)
+    buckets = []
+    for band in range(BANDS):
+        rows = ",".join(str(value) for value in signature[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(rows.encode("ascii"), digest_size=4).digest()
+        buckets.append(int.from_bytes(digest, "big", signed=True))
+    return buckets
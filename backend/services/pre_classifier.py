@@ -0,0 +1,207 @@
+"""Local TF-IDF pre-classifier that settles obvious posts before they reach the LLM.
+
+Each target channel gets a term profile built from its tags (weighted TAG_WEIGHT), its
+description, and the texts of posts the LLM confidently routed to it earlier. The profiles
+are learned incrementally: every refresh only reads posts newer than the last one seen, and
+a channel's learned counts are halved once it knows more than MAX_LEARNED_TERMS terms, so
+the profile follows recent posts and stays bounded. The profile vectors are built once per
+catalogue and refresh, then reused. A post is scored by cosine similarity of its TF-IDF
+vector against every profile:
+
+- one channel clearly ahead (score >= match_score and leading by >= margin), with a local
+  confidence at or above that channel's classification threshold: routed locally;
+- anything else, including a post with no term in common with any channel (the channel may
+  just have sparse tags), goes to LLMClassifier as before.
+
+Words are cut to STEM_LENGTH characters, a crude stemmer that is good enough to match Russian
+word forms ("криптовалюта" / "криптовалюты") without a morphology dependency.
+"""
+import hashlib
+import json
+import logging
+import math
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from models import Post, PostStatus
+
+logger = logging.getLogger(__name__)
+
+STEM_LENGTH = 6
+MIN_TOKEN_LENGTH = 3
+MIN_POST_TERMS = 5  # too little text to decide anything locally
+TAG_WEIGHT = 3
+DEFAULT_THRESHOLD = 80  # TargetChannel.classification_threshold default
+TRAINING_MIN_CONFIDENCE = 80  # only confident LLM decisions teach the profiles
+TRAINING_BATCH = 2000  # posts read per refresh
+MAX_LEARNED_TERMS = 5000  # per channel; past this the learned counts decay
+SOURCE = "local_pre_classifier"  # marks local decisions in llm_classification_result
+
+_TOKEN = re.compile(r"\w+")
+_NOISE = re.compile(r"https?://\S+|t\.me/\S+|@\w+")
+
+
+def terms(text: Optional[str]) -> List[str]:
+    text = _NOISE.sub(" ", unicodedata.normalize("NFKC", text or "").casefold())
+    return [
+        token[:STEM_LENGTH]
+        for token in _TOKEN.findall(text)
+        if len(token) >= MIN_TOKEN_LENGTH and not token.isdigit()
+    ]
+
+
+def _decay(counts: Counter) -> Counter:
+    """Halve a channel's learned counts, dropping terms seen only once, within MAX_LEARNED_TERMS."""
+    decayed = Counter({term: count // 2 for term, count in counts.items() if count >= 2})
+    if len(decayed) > MAX_LEARNED_TERMS:
+        decayed = Counter(dict(decayed.most_common(MAX_LEARNED_TERMS)))
+    return decayed
+
+
+class Model:
+    """TF-IDF vectors of the channel profiles, with their norms."""
+    
+    def __init__(self, profiles: Dict[int, Counter]):
+        # A channel with no description, tags or history can't be ruled in or out locally
+        self.complete = all(profiles.values())
+        doc_freq = Counter(term for profile in profiles.values() for term in profile)
+        self.idf = {term: math.log((len(profiles) + 1) / (df + 1)) + 1 for term, df in doc_freq.items()}
+        # Terms no channel knows still count towards the post's norm, so one matching tag in
+        # an otherwise unrelated text does not look like a strong match
+        self.unknown_idf = math.log(len(profiles) + 1) + 1
+        self.vectors: Dict[int, Tuple[Dict[str, float], float]] = {}
+        for channel_id, profile in profiles.items():
+            vector = {term: (1 + math.log(count)) * self.idf[term] for term, count in profile.items()}
+            self.vectors[channel_id] = (vector, math.sqrt(sum(weight * weight for weight in vector.values())))
+
+
+class LocalPreClassifier:
+    def __init__(self, match_score: float = 0.25, margin: float = 0.15, refresh_seconds: int = 600):
+        self.match_score = match_score
+        self.margin = margin
+        self.refresh_seconds = refresh_seconds
+        self.learned: Dict[int, Counter] = {}  # channel id -> term counts from past decisions
+        self.version = 0  # bumped whenever `learned` changes
+        self._model: Optional[Tuple[str, Model]] = None  # (catalogue key, vectors) of `version`
+        self.last_post_id = 0
+        self.refreshed_at = 0.0
+        self.hits = 0
+        self.misses = 0
+    
+    def refresh(self, db: Session, force: bool = False):
+        """Learn from confident LLM decisions made since the last refresh."""
+        if not force and time.monotonic() - self.refreshed_at < self.refresh_seconds:
+            return
+        self.refreshed_at = time.monotonic()
+    
+        rows = (
+            db.query(Post.id, Post.original_text, Post.target_channel_id, Post.llm_classification_result)
+            .filter(
+                Post.id > self.last_post_id,
+                Post.target_channel_id.isnot(None),
+                Post.llm_classification_confidence >= TRAINING_MIN_CONFIDENCE,
+                Post.llm_classification_result.isnot(None),
+                Post.status.notin_([PostStatus.REJECTED, PostStatus.DUPLICATE]),
+            )
+            .order_by(Post.id)
+            .limit(TRAINING_BATCH)
+            .all()
+        )
+        learned = 0
+        for post_id, text, channel_id, result in rows:
+            self.last_post_id = post_id
+            if SOURCE in (result or ""):
+                continue  # never learn from our own guesses
+            counts = self.learned.setdefault(channel_id, Counter())
+            counts.update(set(terms(text)))
+            if len(counts) > MAX_LEARNED_TERMS:
+                self.learned[channel_id] = _decay(counts)
+            learned += 1
+        if learned:
+            self.version += 1
+            logger.info(f"🧠 Pre-classifier learned from {learned} posts (up to post {self.last_post_id})")
+    
+    def _profiles(self, channels_info: List[Dict[str, Any]]) -> Dict[int, Counter]:
+        profiles = {}
+        for channel in channels_info:
+            profile = Counter(terms(channel.get("description")))
+            for tag in channel.get("tags") or []:
+                for term in terms(str(tag)):
+                    profile[term] += TAG_WEIGHT
+            profile.update(self.learned.get(channel["id"], Counter()))
+            profiles[channel["id"]] = profile
+        return profiles
+    
+    def model(self, channels_info: List[Dict[str, Any]]) -> Model:
+        """Profile vectors for the catalogue, rebuilt only when it or the learned counts change."""
+        key = hashlib.sha256(json.dumps(
+            [self.version] + [[ch["id"], ch.get("description"), ch.get("tags")] for ch in channels_info],
+            ensure_ascii=False, sort_keys=True, default=str,
+        ).encode("utf-8")).hexdigest()
+        if self._model is None or self._model[0] != key:
+            self._model = (key, Model(self._profiles(channels_info)))
+        return self._model[1]
+    
+    def score(self, post_text: str, model: Model) -> Dict[int, float]:
+        """Cosine similarity of the post against every channel profile."""
+        post_terms = set(terms(post_text))
+        if not model.vectors or not post_terms:
+            return {}
+    
+        post_vector = {term: model.idf.get(term, model.unknown_idf) for term in post_terms}
+        post_norm = math.sqrt(sum(weight * weight for weight in post_vector.values())) or 1.0
+    
+        scores = {}
+        for channel_id, (vector, norm) in model.vectors.items():
+            dot = sum(weight * vector.get(term, 0.0) for term, weight in post_vector.items())
+            scores[channel_id] = dot / (norm * post_norm) if norm else 0.0
+        return scores
+    
+    def candidates(self, post_text: str, channels_info: List[Dict[str, Any]], limit: int) -> List[int]:
+        """Ids of up to `limit` channels sharing terms with the post, best first."""
+        scores = self.score(post_text, self.model(channels_info))
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [channel_id for channel_id, score in ranked[:limit] if score > 0]
+    
+    def classify(self, db: Session, post_text: str, channels_info: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """A classification in LLMClassifier's format for clear cases, None when the LLM should decide."""
+        if len(set(terms(post_text))) < MIN_POST_TERMS:
+            self.misses += 1
+            return None
+        self.refresh(db)
+    
+        model = self.model(channels_info)
+        if not model.vectors or not model.complete:
+            self.misses += 1
+            return None
+    
+        scores = self.score(post_text, model)
+        if not scores:
+            self.misses += 1
+            return None
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        best_id, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+    
+        if best >= self.match_score and best - runner_up >= self.margin:
+            confidence = min(95, int(round(50 + best * 100)))
+            # Below the channel's threshold the post would only land in WAITING: let the LLM decide
+            threshold = next(
+                (ch.get("threshold") for ch in channels_info if ch["id"] == best_id), None
+            ) or DEFAULT_THRESHOLD
+            if confidence >= threshold:
+                self.hits += 1
+                return {
+                    "target_channel_id": best_id,
+                    "confidence": confidence,
+                    "reasoning": f"Local pre-classifier: score {best:.2f}, next best {runner_up:.2f}",
+                    "source": SOURCE,
+                }
+    
+        self.misses += 1
+        return None
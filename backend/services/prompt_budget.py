@@ -0,0 +1,144 @@
+"""Token budget of the classification prompts.
+
+The classification prompt used to carry the whole post and every channel description
+verbatim, so one long post (or a channel with a page-long description) made the request
+slow and expensive, or failed on the model's context limit. The budget keeps it bounded:
+
+- tokens are estimated locally, per character class: Latin text runs about 4 characters a
+  token, Cyrillic and other non-ASCII scripts about 2 (no tokenizer dependency; the
+  estimate only has to be in the right range);
+- a post over its budget keeps its beginning and its end, cut at sentence or word
+  boundaries, with a marker in between: the lead and the closing call to action are what
+  decide the channel;
+- the channel catalogue is compacted once per distinct catalogue (descriptions trimmed the
+  same way, whitespace collapsed) and reused from a small cache across requests.
+"""
+import hashlib
+import json
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List
+
+from config import settings
+
+HEAD_SHARE = 0.7  # of a trimmed post's budget spent on its beginning, the rest on its end
+MIN_POST_TOKENS = 200  # a post never gets less than this, whatever the rest of the prompt costs
+CATALOGUE_CACHE_SIZE = 8
+TRIM_MARKER = "\n[…]\n"
+
+_NON_ASCII = re.compile(r"[^\x00-\x7f]")
+_BLANK_LINES = re.compile(r"\n\s*\n\s*\n+")
+_SPACES = re.compile(r"[ \t\u00a0]+")
+_LINE_EDGES = re.compile(r" ?\n ?")
+_SENTENCE_END = re.compile(r"[.!?…]\s|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of `text`."""
+    if not text:
+        return 0
+    non_ascii = len(_NON_ASCII.findall(text))
+    return (len(text) - non_ascii) // 4 + non_ascii // 2 + 1
+
+
+def _chars_for(text: str, tokens: int) -> int:
+    """Characters of `text` that fit in `tokens`, at the text's own characters-per-token ratio."""
+    return max(0, int(len(text) * tokens / max(estimate_tokens(text), 1)))
+
+
+def normalize_whitespace(text: str) -> str:
+    text = _LINE_EDGES.sub("\n", _SPACES.sub(" ", text or ""))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def _head(text: str, chars: int) -> str:
+    head = text[:chars]
+    boundaries = [match.end() for match in _SENTENCE_END.finditer(head)]
+    if boundaries and boundaries[-1] > chars // 2:
+        return head[:boundaries[-1]].rstrip()
+    cut = head.rfind(" ")
+    return (head[:cut] if cut > chars // 2 else head).rstrip()
+
+
+def _tail(text: str, chars: int) -> str:
+    tail = text[len(text) - chars:] if chars else ""
+    match = _SENTENCE_END.search(tail)
+    if match and match.end() < len(tail) // 2:
+        return tail[match.end():].lstrip()
+    cut = tail.find(" ")
+    return (tail[cut + 1:] if 0 <= cut < len(tail) // 2 else tail).lstrip()
+
+
+def fit_text(text: str, max_tokens: int) -> str:
+    """`text` with collapsed whitespace, trimmed to its beginning and end if over `max_tokens`."""
+    text = normalize_whitespace(text)
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max(max_tokens - estimate_tokens(TRIM_MARKER), 1)
+    head = _head(text, _chars_for(text, int(budget * HEAD_SHARE)))
+    tail = _tail(text, _chars_for(text, budget - int(budget * HEAD_SHARE)))
+    return f"{head}{TRIM_MARKER}{tail}" if tail else f"{head}{TRIM_MARKER.rstrip()}"
+
+
+class PromptBudget:
+    def __init__(
+        self,
+        prompt_max_tokens: int = 4000,
+        post_max_tokens: int = 1500,
+        channel_description_max_tokens: int = 120,
+    ):
+        self.prompt_max_tokens = prompt_max_tokens
+        self.post_max_tokens = post_max_tokens
+        self.channel_description_max_tokens = channel_description_max_tokens
+        self._catalogues: "OrderedDict[str, str]" = OrderedDict()
+        self.trimmed_posts = 0
+    
+    def post_budget(self, fixed_tokens: int, posts: int = 1) -> int:
+        """Tokens each of `posts` posts may take in a prompt whose other parts cost `fixed_tokens`."""
+        share = (self.prompt_max_tokens - fixed_tokens) // max(posts, 1)
+        return max(MIN_POST_TOKENS, min(self.post_max_tokens, share))
+    
+    def fits(self, text: str, max_tokens: int) -> bool:
+        return estimate_tokens(normalize_whitespace(text)) <= max_tokens
+    
+    def fit_post(self, text: str, max_tokens: int) -> str:
+        if not self.fits(text, max_tokens):
+            self.trimmed_posts += 1
+        return fit_text(text, max_tokens)
+    
+    def channels_block(self, channels_info: List[Dict[str, Any]]) -> str:
+        """Compact, canonical text of the channel catalogue, cached per catalogue."""
+        key = hashlib.sha256(
+            json.dumps(
+                [[ch["id"], ch["name"], ch["description"], ch["tags"]] for ch in channels_info],
+                ensure_ascii=False, sort_keys=True,
+            ).encode("utf-8")
+        ).hexdigest()
+        block = self._catalogues.get(key)
+        if block is None:
+            block = "\n".join(self._format_channel(ch) for ch in channels_info)
+            self._catalogues[key] = block
+            if len(self._catalogues) > CATALOGUE_CACHE_SIZE:
+                self._catalogues.popitem(last=False)
+        else:
+            self._catalogues.move_to_end(key)
+        return block
+    
+    def _format_channel(self, channel: Dict[str, Any]) -> str:
+        description = fit_text(channel["description"], self.channel_description_max_tokens)
+        tags = sorted({normalize_whitespace(str(tag)) for tag in channel["tags"] if str(tag).strip()})
+        return (
+            f"Channel {channel['id']}: {normalize_whitespace(channel['name'])}\n"
+            f"Description: {' '.join(description.split())}\n"
+            f"Tags: {', '.join(tags)}\n"
+        )
+    
+    def stats(self) -> Dict[str, int]:
+        return {"catalogues": len(self._catalogues), "trimmed_posts": self.trimmed_posts}
+
+
+classification_prompt_budget = PromptBudget(
+    prompt_max_tokens=settings.classification_prompt_max_tokens,
+    post_max_tokens=settings.classification_post_max_tokens,
+    channel_description_max_tokens=settings.classification_channel_description_max_tokens,
+)
@@ -0,0 +1,122 @@
+"""In-process cache of the settings table for the API and the workers.
+
+Settings (API keys, prompts, Telegram credentials) are read on every LLM call and client
+start but change about once a week. Values are kept in memory until they change, which is
+detected in two ways:
+
+- on Postgres, a trigger (migration o7p8q9r0s1t2) sends NOTIFY settings, '<key>' on every
+  insert, update or delete; while notification_hub is listening that key is dropped at once;
+- a watermark of the table, (row count, latest created_at, latest updated_at), is compared
+  and the whole cache is dropped when it moved: at most every SETTINGS_CACHE_CHECK_SECONDS
+  without notifications (SQLite, LISTEN connection down, trigger missing), and every
+  NOTIFY_FALLBACK_POLL_SECONDS as a backstop while they arrive.
+
+Writes made through crud/async_crud also drop the key in the writing process immediately.
+Every invalidation bumps `generation`, so a value read from the database while an
+invalidation came in is not stored.
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import Settings
+from notifications import notification_hub
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_WATERMARK = select(func.count(Settings.id), func.max(Settings.created_at), func.max(Settings.updated_at))
+
+
+class SettingsCache:
+    def __init__(self, check_seconds: float = 5.0):
+        self.check_seconds = check_seconds
+        self.values: Dict[str, Optional[str]] = {}  # key -> value, None for a missing row
+        self.generation = 0
+        self.watermark = None
+        self.checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()  # sync callers run in the API threadpool too
+        notification_hub.add_callback("settings", self._on_notification)
+    
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one key, or everything when `key` is None."""
+        with self._lock:
+            self.generation += 1
+            if key is None:
+                self.values.clear()
+            else:
+                self.values.pop(key, None)
+    
+    def _on_notification(self, key: Optional[str]):
+        self.invalidate(key)
+    
+    def _validation_due(self) -> bool:
+        interval = self.check_seconds
+        if notification_hub.notifying("settings"):
+            interval = max(interval, settings.notify_fallback_poll_seconds)
+        return time.monotonic() - self.checked_at >= interval
+    
+    def _apply_watermark(self, watermark: tuple):
+        self.checked_at = time.monotonic()
+        if watermark != self.watermark:
+            if self.watermark is not None:
+                logger.info("Settings changed, cache cleared")
+            self.watermark = watermark
+            self.invalidate()
+    
+    def _cached(self, key: str):
+        if self._validation_due():
+            return _MISSING
+        value = self.values.get(key, _MISSING)
+        if value is not _MISSING:
+            self.hits += 1
+        return value
+    
+    def _store(self, key: str, value: Optional[str], generation: int):
+        self.misses += 1
+        with self._lock:
+            if generation == self.generation:
+                self.values[key] = value
+    
+    def get(self, key: str, db: Optional[Session] = None) -> Optional[str]:
+        """Value of setting `key`, None if it is not set.
+    
+        `db` is only used on a miss or a watermark check; without it a session is opened then.
+        """
+        value = self._cached(key)
+        if value is not _MISSING:
+            return value
+    
+        session = db or SessionLocal()
+        try:
+            if self._validation_due():
+                self._apply_watermark(tuple(session.execute(_WATERMARK).one()))
+                value = self._cached(key)
+                if value is not _MISSING:
+                    return value
+            generation = self.generation
+            value = session.execute(select(Settings.value).where(Settings.key == key)).scalar()
+            self._store(key, value, generation)
+            return value
+        finally:
+            if db is None:
+                session.close()
+    
+    def stats(self) -> Dict[str, object]:
+        return {
+            "keys": len(self.values),
+            "hits": self.hits,
+            "misses": self.misses,
+            "mode": "notify" if notification_hub.notifying("settings") else "watermark",
+        }
+
+
+settings_cache = SettingsCache(check_seconds=settings.settings_cache_check_seconds)
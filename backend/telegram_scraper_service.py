@@ -10,7 +10,7 @@ from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
 from telethon.sessions import StringSession
 from config import settings
 from database import get_db
-from crud import get_setting
+from settings_cache import settings_cache
 
 # Configure logging
 logging.basicConfig(
@@ -114,12 +114,12 @@ class TelegramChannelScraper:
             db = next(get_db())
             try:
                 # Получаем настройки из БД
-                session_setting = get_setting(db, "telegram_session_string")
-                api_id_setting = get_setting(db, "telegram_api_id")
-                api_hash_setting = get_setting(db, "telegram_api_hash")
+                session_setting = settings_cache.get("telegram_session_string", db)
+                api_id_setting = settings_cache.get("telegram_api_id", db)
+                api_hash_setting = settings_cache.get("telegram_api_hash", db)
                 
                 # Проверяем наличие всех необходимых настроек
-                if not session_setting or not session_setting.value:
+                if not session_setting:
                     # Fallback к переменным окружения
                     self.session_string = settings.telegram_session_string
                     if not self.session_string:
@@ -127,29 +127,29 @@ class TelegramChannelScraper:
                         return False
                     logger.info("Session string loaded from environment variables")
                 else:
-                    self.session_string = session_setting.value
+                    self.session_string = session_setting
                     logger.info("Session string loaded from database")
                 
                 # API ID
-                if not api_id_setting or not api_id_setting.value:
+                if not api_id_setting:
                     self.api_id = settings.telegram_api_id
                     if not self.api_id:
                         logger.error("No API ID found in database or environment variables")
                         return False
                     logger.info("API ID loaded from environment variables")
                 else:
-                    self.api_id = int(api_id_setting.value)
+                    self.api_id = int(api_id_setting)
                     logger.info("API ID loaded from database")
                 
                 # API Hash
-                if not api_hash_setting or not api_hash_setting.value:
+                if not api_hash_setting:
                     self.api_hash = settings.telegram_api_hash
                     if not self.api_hash:
                         logger.error("No API Hash found in database or environment variables")
                         return False
                     logger.info("API Hash loaded from environment variables")
                 else:
-                    self.api_hash = api_hash_setting.value
+                    self.api_hash = api_hash_setting
                     logger.info("API Hash loaded from database")
                     
             finally:
@@ -698,13 +698,13 @@ class TelegramChannelScraper:
             # Получаем все настройки Telegram из базы данных
             db = next(get_db())
             try:
-                session_setting = get_setting(db, "telegram_session_string")
-                api_id_setting = get_setting(db, "telegram_api_id")
-                api_hash_setting = get_setting(db, "telegram_api_hash")
+                session_setting = settings_cache.get("telegram_session_string", db)
+                api_id_setting = settings_cache.get("telegram_api_id", db)
+                api_hash_setting = settings_cache.get("telegram_api_hash", db)
                 
                 # Session string
-                if session_setting and session_setting.value:
-                    session_string = session_setting.value
+                if session_setting:
+                    session_string = session_setting
                 else:
                     session_string = settings.telegram_session_string
                     
@@ -713,8 +713,8 @@ class TelegramChannelScraper:
                     return False
                 
                 # API ID
-                if api_id_setting and api_id_setting.value:
-                    api_id = int(api_id_setting.value)
+                if api_id_setting:
+                    api_id = int(api_id_setting)
                 else:
                     api_id = settings.telegram_api_id
                     
@@ -723,8 +723,8 @@ class TelegramChannelScraper:
                     return False
                 
                 # API Hash
-                if api_hash_setting and api_hash_setting.value:
-                    api_hash = api_hash_setting.value
+                if api_hash_setting:
+                    api_hash = api_hash_setting
                 else:
                     api_hash = settings.telegram_api_hash
                     
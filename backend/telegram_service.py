@@ -11,7 +11,7 @@ from telegram.constants import ParseMode
 from config import settings
 from datetime import datetime
 from database import get_db
-from crud import get_setting
+from settings_cache import settings_cache
 try:
     from telethon import TelegramClient
     from telethon.sessions import StringSession
@@ -128,9 +128,9 @@ class TelegramService:
             db = next(get_db())
             try:
                 # Get session string
-                session_setting = get_setting(db, "telegram_session_string")
-                if session_setting and session_setting.value:
-                    session_string = session_setting.value
+                session_setting = settings_cache.get("telegram_session_string", db)
+                if session_setting:
+                    session_string = session_setting
                     logger.info("Session string loaded from database for Telegram Client")
                 else:
                     # Fallback to environment variables
@@ -139,10 +139,10 @@ class TelegramService:
                         logger.info("Session string loaded from environment variables for Telegram Client")
                 
                 # Get API ID
-                api_id_setting = get_setting(db, "telegram_api_id")
-                if api_id_setting and api_id_setting.value:
+                api_id_setting = settings_cache.get("telegram_api_id", db)
+                if api_id_setting:
                     try:
-                        api_id = int(api_id_setting.value)
+                        api_id = int(api_id_setting)
                         logger.info("API ID loaded from database for Telegram Client")
                     except ValueError:
                         logger.error("Invalid API ID format in database")
@@ -153,9 +153,9 @@ class TelegramService:
                         logger.info("API ID loaded from environment variables for Telegram Client")
                 
                 # Get API Hash
-                api_hash_setting = get_setting(db, "telegram_api_hash")
-                if api_hash_setting and api_hash_setting.value:
-                    api_hash = api_hash_setting.value
+                api_hash_setting = settings_cache.get("telegram_api_hash", db)
+                if api_hash_setting:
+                    api_hash = api_hash_setting
                     logger.info("API Hash loaded from database for Telegram Client")
                 else:
                     # Fallback to environment variables
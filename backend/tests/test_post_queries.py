@@ -0,0 +1,131 @@
+"""Statement counts of the post list/detail paths (POST_LOAD_OPTIONS).
+
+A Post response carries its source channel, target channel and approver; loading them
+lazily costs one query per post and relationship. These tests count the statements the
+crud paths send to SQLite and require the same number whatever the number of posts.
+"""
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import async_crud
+import crud
+import schemas
+from models import Base, Post, PostStatus, SourceChannel, TargetChannel, User
+
+
+@contextmanager
+def count_statements(engine):
+    statements = []
+    
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+def seed(session, posts: int):
+    user = User(username="admin", hashed_password="x", is_admin=True)
+    session.add(user)
+    for index in range(posts):
+        # A channel pair per post, so every row has its own relationships to load
+        source = SourceChannel(channel_id=f"@source{index}", channel_name=f"Source {index}")
+        target = TargetChannel(channel_id=f"@target{index}", channel_name=f"Target {index}")
+        session.add(Post(
+            source_channel=source,
+            target_channel=target,
+            approver=user,
+            original_message_id=index + 1,
+            original_text=f"Post {index}",
+            status=PostStatus.APPROVED,
+        ))
+    session.commit()
+
+
+def serialize(posts):
+    """Build the API response, touching every relationship the schema exposes."""
+    return [schemas.Post.model_validate(post).model_dump() for post in posts]
+
+
+@pytest.fixture
+def sync_engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def async_engine(tmp_path):
+    return create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'posts.db'}")
+
+
+async def _seed_async(engine, posts: int):
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine) as session:
+        await session.run_sync(seed, posts)
+
+
+def _sync_get_posts_statements(engine, posts: int) -> int:
+    Session = sessionmaker(bind=engine)
+    with Session() as session:
+        seed(session, posts)
+    with Session() as session, count_statements(engine) as statements:
+        result = crud.get_posts(session)
+        assert len(serialize(result)) == posts
+    return len(statements)
+
+
+@pytest.mark.parametrize("posts", [1, 20])
+def test_get_posts_single_statement(sync_engine, posts):
+    assert _sync_get_posts_statements(sync_engine, posts) == 1
+
+
+def test_get_post_single_statement(sync_engine):
+    Session = sessionmaker(bind=sync_engine)
+    with Session() as session:
+        seed(session, 3)
+    with Session() as session, count_statements(sync_engine) as statements:
+        post = crud.get_post(session, 2)
+        response = serialize([post])[0]
+    assert response["source_channel"]["channel_name"] == "Source 1"
+    assert response["approver"]["username"] == "admin"
+    assert len(statements) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("posts", [1, 20])
+async def test_async_get_posts_single_statement(async_engine, posts):
+    await _seed_async(async_engine, posts)
+    Session = async_sessionmaker(async_engine, expire_on_commit=False)
+    async with Session() as session:
+        with count_statements(async_engine.sync_engine) as statements:
+            result = await async_crud.get_posts(session)
+            # A lazy load here would raise MissingGreenlet rather than add a statement
+            assert len(serialize(result)) == posts
+            page, _ = await async_crud.get_posts_page(session, limit=posts)
+            assert len(serialize(page)) == posts
+    await async_engine.dispose()
+    assert len(statements) == 2
+
+
+@pytest.mark.asyncio
+async def test_async_get_post_single_statement(async_engine):
+    await _seed_async(async_engine, 3)
+    Session = async_sessionmaker(async_engine, expire_on_commit=False)
+    async with Session() as session:
+        with count_statements(async_engine.sync_engine) as statements:
+            post = await async_crud.get_post(session, 2)
+            response = serialize([post])[0]
+    await async_engine.dispose()
+    assert response["target_channel"]["channel_name"] == "Target 1"
+    assert len(statements) == 1
@@ -9,6 +9,8 @@ from schemas import PostCreate
 from telegram_scraper_service import telegram_scraper
 from telegram_service import telegram_service
 from openrouter_service import openrouter_service
+from http_client import llm_http_client
+from llm_cache import llm_response_cache
 from telegram.constants import ParseMode
 from telegram.error import TimedOut
 
@@ -37,6 +39,7 @@ class ChannelMonitor:
         self.db = SessionLocal()
         self.monitored_channels = set()  # Track currently monitored channels
         self.continuous_task = None  # Track the main monitoring task
+        self.worker_id = crud.make_worker_id("worker")
     
     async def start(self):
         """Start the channel monitoring worker with database control."""
@@ -523,11 +526,8 @@ class ChannelMonitor:
             try:
                 db = SessionLocal()
                 
-                # Get pending posts that haven't been processed yet
-                pending_posts = db.query(Post).filter(
-                    Post.status == PostStatus.PENDING,
-                    Post.processed_at.is_(None)
-                ).limit(5).all()
+                # Claim pending posts that haven't been processed yet
+                pending_posts = crud.claim_pending_posts(db, self.worker_id, limit=5)
                 
                 for post in pending_posts:
                     try:
@@ -535,6 +535,7 @@ class ChannelMonitor:
                     except Exception as e:
                         logger.error(f"Error processing post {post.id}: {str(e)}")
                 
+                crud.release_posts(db, pending_posts)
                 db.close()
                 
                 # Wait before processing more posts
@@ -594,7 +595,8 @@ class ChannelMonitor:
             # Rewrite text using OpenRouter
             processed_text = await openrouter_service.rewrite_text(
                 post.original_text,
-                context=context
+                context=context,
+                use_cache=True
             )
             
             if processed_text:
@@ -620,13 +622,11 @@ class ChannelMonitor:
             try:
                 db = SessionLocal()
                 
-                # Get scheduled posts that are ready to be published
-                scheduled_posts = crud.get_scheduled_posts_ready_to_publish(db, limit=5)
+                # Claim scheduled posts that are ready to be published
+                scheduled_posts = crud.claim_scheduled_posts(db, self.worker_id, limit=5)
                 
-                # Get posts marked for immediate publishing (status = "publishing")
-                immediate_posts = db.query(Post).filter(
-                    Post.status == PostStatus.PUBLISHING
-                ).limit(5).all()
+                # Claim posts marked for immediate publishing (status = "publishing")
+                immediate_posts = crud.claim_publishing_posts(db, self.worker_id, limit=5)
                 
                 # Publish scheduled posts that are ready
                 for post in scheduled_posts:
@@ -644,6 +644,7 @@ class ChannelMonitor:
                     except Exception as e:
                         logger.error(f"Error publishing immediate post {post.id}: {str(e)}")
                 
+                crud.release_posts(db, scheduled_posts + immediate_posts)
                 db.close()
                 
                 # Wait before checking for more posts
@@ -843,6 +844,7 @@ async def main():
     """Main worker function with database-controlled lifecycle."""
     logger.info("🚀 Worker main() function started - ENTRY POINT")
     logger.info("Worker process started")
+    llm_http_client.open()
     
     while True:
         try:
@@ -880,6 +882,9 @@ async def main():
             logger.error(f"Unexpected error in main loop: {str(e)}")
             await asyncio.sleep(30)
     
+    await llm_http_client.close()
+    
+    await llm_response_cache.close()
     logger.info("Worker process stopped")
 
 
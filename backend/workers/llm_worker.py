@@ -2,13 +2,22 @@ import asyncio
 import logging
 import time
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 from sqlalchemy.orm import Session
 from database import SessionLocal
 from models import Post, PostStatus
 from services.llm_classifier import LLMClassifier
+from services.pre_classifier import LocalPreClassifier
 from config import settings
 import crud
+from notifications import notification_hub
+from job_queue import post_queue, job_post_ids
+from http_client import llm_http_client
+from llm_cache import llm_response_cache
+from llm_ledger import llm_ledger
+from settings_cache import settings_cache
+from llm_throttle import LLMUnavailableError
+from model_router import model_router
 
 # Configure detailed logging
 logging.basicConfig(
@@ -17,6 +26,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+QUEUE_GROUP = "llm_worker"
+
+
 class LLMWorker:
     """Worker for processing posts with LLM classification"""
     
@@ -27,7 +39,22 @@ class LLMWorker:
         self.start_time = None
         self.processed_posts_count = 0
         self.failed_posts_count = 0
+        self.worker_id = crud.make_worker_id("llm_worker")
+        # Classification runs up to `concurrency` requests at once, each covering up to
+        # `posts_per_request` posts; a cycle claims twice that so the next request is ready
+        # as soon as a slot frees up
+        self.concurrency = max(1, settings.llm_classification_concurrency)
+        self.posts_per_request = max(1, settings.llm_classification_batch_size)
+        self.batch_size = self.concurrency * self.posts_per_request * 2
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.llm_unavailable = False  # set by a cycle whose requests OpenRouter could not serve
+        # Kept across classifier re-creation so what it learned survives
+        self.pre_classifier = LocalPreClassifier(
+            match_score=settings.pre_classifier_match_score,
+            margin=settings.pre_classifier_margin,
+        ) if settings.pre_classifier_enabled else None
         logger.info(f"🔧 LLM Worker initialized with check_interval={check_interval}s")
+        logger.info(f"🚦 Classification concurrency: {self.concurrency} requests x {self.posts_per_request} posts (batch size {self.batch_size})")
         logger.info(f"📊 Worker stats: processed=0, failed=0")
     
     def _get_classifier(self, db: Session) -> Optional[LLMClassifier]:
@@ -35,21 +62,27 @@ class LLMWorker:
         logger.debug("🔑 Attempting to get LLM classifier from database")
         try:
             # Get OpenRouter API key from database
-            openrouter_key_setting = crud.get_setting(db, "openrouter_api_key")
-            if not openrouter_key_setting:
+            openrouter_key = settings_cache.get("openrouter_api_key", db)
+            if openrouter_key is None:
                 logger.warning("❌ OpenRouter API key setting not found in database")
                 return None
             
-            if not openrouter_key_setting.value or not openrouter_key_setting.value.strip():
+            if not openrouter_key.strip():
                 logger.warning("❌ OpenRouter API key is empty or contains only whitespace")
                 return None
             
-            # Get model from settings or use default
+            # Fallback model when ai_models has none for classification
             model = settings.openrouter_model or "anthropic/claude-3-haiku"
-            logger.info(f"🤖 Creating LLM classifier with model: {model}")
-            logger.info(f"🔑 API key length: {len(openrouter_key_setting.value)} characters")
+            logger.info(f"🤖 Creating LLM classifier (routed through ai_models, fallback model: {model})")
+            logger.info(f"🔑 API key length: {len(openrouter_key)} characters")
             
-            classifier = LLMClassifier(openrouter_key_setting.value, model)
+            classifier = LLMClassifier(
+                openrouter_key, model,
+                pre_classifier=self.pre_classifier,
+                combined_rewrite=settings.llm_combined_rewrite,
+                router=model_router,
+                json_mode=settings.llm_json_mode,
+            )
             logger.info("✅ LLM classifier successfully created")
             return classifier
         except Exception as e:
@@ -64,6 +97,8 @@ class LLMWorker:
         logger.info(f"🚀 LLM Worker started at {self.start_time.strftime('%Y-%m-%d %H:%M:%S UTC')}")
         logger.info(f"⏱️ Check interval: {self.check_interval} seconds")
         
+        posts_ready = notification_hub.subscribe("posts:scraped", "posts:processed")
+        jobs = []
         cycle_count = 0
         while self.running:
             cycle_count += 1
@@ -71,7 +106,8 @@ class LLMWorker:
             
             try:
                 logger.debug(f"🔄 Starting processing cycle #{cycle_count}")
-                await self.process_pending_posts()
+                backlogged = await self.process_pending_posts(jobs)
+                await post_queue.ack(QUEUE_GROUP, jobs)
                 
                 cycle_duration = time.time() - cycle_start_time
                 logger.debug(f"✅ Cycle #{cycle_count} completed in {cycle_duration:.2f}s")
@@ -84,7 +120,14 @@ class LLMWorker:
                     logger.info(f"   ✅ Processed posts: {self.processed_posts_count}")
                     logger.info(f"   ❌ Failed posts: {self.failed_posts_count}")
                 
-                await asyncio.sleep(10)  # Check every 10 seconds
+                # Next batch from the job queue; an empty batch means poll the database.
+                # A full batch means there is a backlog, so go again without waiting.
+                if backlogged:
+                    logger.debug("📚 Classification batch was full, continuing without waiting")
+                jobs = await post_queue.next_jobs(
+                    QUEUE_GROUP, self.worker_id, (PostStatus.SCRAPED, PostStatus.PROCESSED), posts_ready, 10,
+                    count=self.batch_size, wait=not backlogged
+                )
             except Exception as e:
                 self.failed_posts_count += 1
                 logger.error(f"💥 Error in LLM worker cycle #{cycle_count}: {str(e)}")
@@ -110,8 +153,11 @@ class LLMWorker:
         else:
             logger.info("🛑 LLM Worker stopped")
     
-    async def process_pending_posts(self):
-        """Process all pending posts"""
+    async def process_pending_posts(self, jobs=()) -> bool:
+        """Process queued posts (or poll for pending ones when no jobs were handed over).
+        
+        Returns True if a full classification batch was claimed, i.e. more posts are likely waiting.
+        """
         db = SessionLocal()
         process_start_time = time.time()
         
@@ -121,12 +167,15 @@ class LLMWorker:
             # Check database connection
             if not self.check_database_status(db):
                 logger.warning("⚠️ Database not ready, skipping this cycle")
-                return
+                return False
             
             # Send heartbeat
             await self.send_heartbeat(db)
             
-            # Get classifier
+            # Get classifier (re-created when the API key is changed in settings)
+            if self.classifier and self.classifier.api_key != settings_cache.get("openrouter_api_key", db):
+                logger.info("🔑 OpenRouter API key changed, re-creating LLM classifier")
+                self.classifier = None
             if not self.classifier:
                 classifier_start = time.time()
                 self.classifier = self._get_classifier(db)
@@ -134,17 +183,18 @@ class LLMWorker:
                 
                 if not self.classifier:
                     logger.warning("⚠️ LLM classifier not available, skipping this cycle")
-                    return
+                    return False
                 logger.debug(f"🤖 Classifier obtained in {classifier_duration:.3f}s")
             
             # Process posts
             posts_start = time.time()
-            await self.process_posts(db)
+            backlogged = await self.process_posts(db, jobs)
             posts_duration = time.time() - posts_start
             
             total_duration = time.time() - process_start_time
             logger.debug(f"📝 Posts processing completed in {posts_duration:.3f}s")
             logger.debug(f"⏱️ Total cycle duration: {total_duration:.3f}s")
+            return backlogged
             
         except Exception as e:
             logger.error(f"💥 Error in process_pending_posts: {str(e)}")
@@ -186,56 +236,38 @@ class LLMWorker:
             logger.error(f"💥 Error sending heartbeat after {heartbeat_duration:.3f}s: {str(e)}")
             logger.error(f"🔍 Exception type: {type(e).__name__}")
     
-    async def process_posts(self, db: Session):
-        """Process posts that need LLM classification and rewriting"""
+    async def process_posts(self, db: Session, jobs=()) -> bool:
+        """Process posts that need LLM classification and rewriting.
+        
+        Returns True if the classification batch was full (and OpenRouter reachable).
+        """
+        posts = []
+        processed_posts = []
+        self.llm_unavailable = False
         try:
-            # Get posts that are scraped but not yet classified
-            posts = db.query(Post).filter(
-                Post.status == PostStatus.SCRAPED,
-                Post.llm_classification_confidence.is_(None)
-            ).limit(5).all()  # Process 5 posts at a time
+            # Claim posts that are scraped but not yet classified (only the queued ones if there are jobs)
+            scraped_ids = job_post_ids(jobs, PostStatus.SCRAPED) if jobs else None
+            posts = crud.claim_posts_for_classification(db, self.worker_id, limit=self.batch_size, post_ids=scraped_ids)
             
             if not posts:
                 logger.debug("📭 No pending posts found for classification")
             else:
                 logger.info(f"📝 Found {len(posts)} posts for LLM classification")
                 
-                for i, post in enumerate(posts, 1):
-                    post_start_time = time.time()
-                    try:
-                        logger.debug(f"🔄 Processing post {i}/{len(posts)} (ID: {post.id})")
-                        await self.process_single_post_with_new_session(post.id)
-                        
-                        post_duration = time.time() - post_start_time
-                        self.processed_posts_count += 1
-                        logger.info(f"✅ Post {post.id} processed successfully in {post_duration:.2f}s")
-                        
-                    except Exception as e:
-                        post_duration = time.time() - post_start_time
-                        self.failed_posts_count += 1
-                        logger.error(f"❌ Error processing post {post.id} after {post_duration:.2f}s: {str(e)}")
-                        logger.error(f"🔍 Exception type: {type(e).__name__}")
-                        
-                        # Mark post as failed or waiting for manual review
-                        try:
-                            post.status = PostStatus.WAITING
-                            db.commit()
-                            logger.info(f"🔄 Post {post.id} marked as WAITING for manual review")
-                        except Exception as commit_error:
-                            logger.error(f"💥 Failed to update post {post.id} status: {commit_error}")
-                            db.rollback()
+                # Posts are packed into multi-post requests; each request gets its own session
+                # and the semaphore caps in-flight LLM calls
+                chunks = [posts[i:i + self.posts_per_request] for i in range(0, len(posts), self.posts_per_request)]
+                await asyncio.gather(*[
+                    self.classify_chunk_limited(db, chunk, i, len(chunks))
+                    for i, chunk in enumerate(chunks, 1)
+                ])
                 
                 logger.info(f"📊 Batch processing completed: {self.processed_posts_count} total processed, {self.failed_posts_count} total failed")
             
             # Get processed posts that need rewriting with target channel prompt
             # Only get posts that haven't been rewritten yet (processed_text is None or empty)
-            from sqlalchemy import or_
-            processed_posts = db.query(Post).filter(
-                Post.status == PostStatus.PROCESSED,
-                Post.target_channel_id.isnot(None),
-                Post.llm_classification_confidence.isnot(None),
-                or_(Post.processed_text.is_(None), Post.processed_text == '')
-            ).limit(5).all()
+            processed_ids = job_post_ids(jobs, PostStatus.PROCESSED) if jobs else None
+            processed_posts = crud.claim_posts_for_channel_rewrite(db, self.worker_id, limit=5, post_ids=processed_ids)
             
             logger.debug(f"🔄 Found {len(processed_posts)} processed posts for rewriting")
             if processed_posts:
@@ -247,11 +279,52 @@ class LLMWorker:
                         logger.error(f"Error rewriting post {post.id}: {str(e)}")
             else:
                 logger.debug("📭 No processed posts found for rewriting")
-                
+            
+            # Don't spin on a full backlog while OpenRouter is unavailable
+            return len(posts) >= self.batch_size and not self.llm_unavailable
+            
         except Exception as e:
             logger.error(f"💥 Error in process_posts: {str(e)}")
             logger.error(f"🔍 Exception type: {type(e).__name__}")
             raise
+        finally:
+            crud.release_posts(db, posts + processed_posts)
+    
+    async def classify_chunk_limited(self, db: Session, posts: List[Post], index: int, total: int):
+        """Classify one request's worth of posts once a concurrency slot is free"""
+        async with self.semaphore:
+            chunk_start_time = time.time()
+            post_ids = [post.id for post in posts]
+            try:
+                logger.debug(f"🔄 Processing request {index}/{total} (IDs: {post_ids})")
+                if len(posts) == 1:
+                    await self.process_single_post_with_new_session(posts[0].id)
+                else:
+                    await self.process_post_batch_with_new_session(post_ids)
+                
+                chunk_duration = time.time() - chunk_start_time
+                self.processed_posts_count += len(posts)
+                logger.info(f"✅ Posts {post_ids} processed successfully in {chunk_duration:.2f}s")
+                
+            except LLMUnavailableError as e:
+                # OpenRouter is throttling or down: the posts stay SCRAPED and are retried later
+                self.llm_unavailable = True
+                logger.warning(f"⏸️ LLM unavailable, posts {post_ids} left for the next cycle: {str(e)}")
+            except Exception as e:
+                chunk_duration = time.time() - chunk_start_time
+                self.failed_posts_count += len(posts)
+                logger.error(f"❌ Error processing posts {post_ids} after {chunk_duration:.2f}s: {str(e)}")
+                logger.error(f"🔍 Exception type: {type(e).__name__}")
+                
+                # Mark posts as failed or waiting for manual review
+                try:
+                    for post in posts:
+                        post.status = PostStatus.WAITING
+                    db.commit()
+                    logger.info(f"🔄 Posts {post_ids} marked as WAITING for manual review")
+                except Exception as commit_error:
+                    logger.error(f"💥 Failed to update posts {post_ids} status: {commit_error}")
+                    db.rollback()
     
     async def rewrite_post_for_target_channel(self, db: Session, post: Post):
         """Rewrite post content for target channel using LLM"""
@@ -285,10 +358,11 @@ class LLMWorker:
             import os
             sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
             from openrouter_service import openrouter_service
-            rewritten_text = await openrouter_service.rewrite_text_with_custom_prompt(
-                post.original_text,
-                custom_prompt=formatted_prompt
-            )
+            with llm_ledger.track("rewrite", [post.id], channel_id=target_channel.id):
+                rewritten_text = await openrouter_service.rewrite_text_with_custom_prompt(
+                    post.original_text,
+                    custom_prompt=formatted_prompt
+                )
             
             if rewritten_text:
                 post.processed_text = rewritten_text
@@ -320,6 +394,38 @@ class LLMWorker:
         finally:
             db.close()
     
+    async def process_post_batch_with_new_session(self, post_ids: List[int]):
+        """Classify several posts with one LLM request using a new database session"""
+        db = SessionLocal()
+        batch_start_time = time.time()
+        try:
+            posts = db.query(Post).filter(Post.id.in_(post_ids)).order_by(Post.id).all()
+            if not posts:
+                logger.warning(f"⚠️ Posts {post_ids} not found in database")
+                return
+            
+            logger.info(f"🔍 Starting batch LLM classification for posts {[post.id for post in posts]}")
+            results = await self.classifier.process_posts_classification(db, posts)
+            
+            for post in posts:
+                if not results.get(post.id):
+                    logger.warning(f"⚠️ Classification processing failed for post {post.id}")
+                    post.status = PostStatus.WAITING
+                    logger.info(f"🔄 Post {post.id} marked as WAITING for manual review")
+            db.commit()
+            
+            # Hand the posts to the next stage (rewrite) if their new status has one
+            for status in {post.status for post in posts}:
+                await post_queue.enqueue(status, [post.id for post in posts if post.status == status])
+            
+            batch_duration = time.time() - batch_start_time
+            logger.info(f"🏁 Batch of {len(posts)} posts classified in {batch_duration:.2f}s")
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
     async def process_single_post(self, db: Session, post: Post):
         """Process a single post with LLM classification"""
         classification_start_time = time.time()
@@ -362,6 +468,9 @@ class LLMWorker:
             commit_duration = time.time() - commit_start
             logger.debug(f"💾 Database commit completed in {commit_duration:.3f}s")
             
+            # Hand the post to the next stage (rewrite) if its new status has one
+            await post_queue.enqueue(post.status, [post.id])
+            
             total_duration = time.time() - classification_start_time
             logger.info(f"🏁 Post {post.id} processing completed in {total_duration:.2f}s")
             
@@ -397,6 +506,7 @@ async def main():
     logger.info(f"📁 Working directory: {__import__('os').getcwd()}")
     
     worker = LLMWorker()
+    llm_http_client.open()
     
     try:
         logger.info("🔄 Initializing worker startup sequence...")
@@ -411,6 +521,9 @@ async def main():
     finally:
         logger.info("🧹 Cleaning up worker resources...")
         worker.stop()
+        await llm_ledger.close()
+        await llm_http_client.close()
+        await llm_response_cache.close()
         logger.info("✅ LLM Worker main process completed")
 
 if __name__ == "__main__":
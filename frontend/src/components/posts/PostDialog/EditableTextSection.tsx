@@ -41,11 +41,16 @@ const AIAssistant: React.FC<AIAssistantProps> = ({ currentText, onApplyAI, isLoa
     setIsProcessing(true);
     try {
       const modelId = selectedModelId ? parseInt(selectedModelId) : undefined;
-      const response = await postsAPI.improveTextWithPrompt(currentText, aiPrompt, modelId);
-      onApplyAI(response.data.improved_text);
+      // Текст появляется в редакторе по мере генерации
+      let improvedText = '';
+      await postsAPI.improveTextWithPromptStream(currentText, aiPrompt, (delta) => {
+        improvedText += delta;
+        onApplyAI(improvedText);
+      }, modelId);
       setAiPrompt('');
     } catch (error) {
       console.error('Ошибка при обработке ИИ:', error);
+      onApplyAI(currentText);
       // В случае ошибки можно показать уведомление пользователю
     } finally {
       setIsProcessing(false);
@@ -10,7 +10,7 @@ import { Switch } from '../ui/switch';
 import { Dialog, DialogContent, DialogDescription, DialogFooter, DialogHeader, DialogTitle, DialogTrigger } from '../ui/dialog';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../ui/select';
 import { Plus, Edit, Trash2, Star, Brain, AlertCircle, CheckCircle, Zap, Shield, Clock, Activity } from 'lucide-react';
-import { AIModel, AIModelCreate, AIModelUpdate, aiModelsAPI } from '../../services/api';
+import { AIModel, AIModelCreate, AIModelUpdate, AIModelTask, aiModelsAPI } from '../../services/api';
 
 interface AIModelFormData {
   name: string;
@@ -19,6 +19,8 @@ interface AIModelFormData {
   description: string;
   is_active: boolean;
   is_default: boolean;
+  task: AIModelTask | 'any';
+  priority: number;
 }
 
 const initialFormData: AIModelFormData = {
@@ -28,8 +30,16 @@ const initialFormData: AIModelFormData = {
   description: '',
   is_active: true,
   is_default: false,
+  task: 'any',
+  priority: 0,
 };
 
+const TASKS = [
+  { value: 'any', label: 'Любая задача' },
+  { value: 'classification', label: 'Классификация' },
+  { value: 'rewrite', label: 'Переписывание' },
+];
+
 const PROVIDERS = [
   { value: 'openrouter', label: 'OpenRouter' },
   { value: 'openai', label: 'OpenAI' },
@@ -75,6 +85,8 @@ export const AIModelsSettings: React.FC = () => {
         description: model.description || '',
         is_active: model.is_active,
         is_default: model.is_default,
+        task: model.task || 'any',
+        priority: model.priority ?? 0,
       });
     } else {
       setEditingModel(null);
@@ -95,12 +107,14 @@ export const AIModelsSettings: React.FC = () => {
     setError(null);
     setSuccess(null);
 
+    const payload = { ...formData, task: formData.task === 'any' ? null : formData.task };
+
     try {
       if (editingModel) {
-        await aiModelsAPI.update(editingModel.id, formData);
+        await aiModelsAPI.update(editingModel.id, payload);
         setSuccess('Модель успешно обновлена');
       } else {
-        await aiModelsAPI.create(formData);
+        await aiModelsAPI.create(payload);
         setSuccess('Модель успешно создана');
       }
       
@@ -277,6 +291,45 @@ export const AIModelsSettings: React.FC = () => {
                         className="min-h-20"
                       />
                     </div>
+                    
+                    <div className="grid grid-cols-2 gap-4">
+                      <div className="space-y-2">
+                        <Label htmlFor="task" className="text-sm font-medium">
+                          Задача
+                        </Label>
+                        <Select
+                          value={formData.task}
+                          onValueChange={(value) => setFormData({ ...formData, task: value as AIModelFormData['task'] })}
+                        >
+                          <SelectTrigger className="h-10">
+                            <SelectValue placeholder="Выберите задачу" />
+                          </SelectTrigger>
+                          <SelectContent>
+                            {TASKS.map((task) => (
+                              <SelectItem key={task.value} value={task.value}>
+                                {task.label}
+                              </SelectItem>
+                            ))}
+                          </SelectContent>
+                        </Select>
+                      </div>
+                      
+                      <div className="space-y-2">
+                        <Label htmlFor="priority" className="text-sm font-medium">
+                          Приоритет
+                        </Label>
+                        <Input
+                          id="priority"
+                          type="number"
+                          value={formData.priority}
+                          onChange={(e) => setFormData({ ...formData, priority: parseInt(e.target.value, 10) || 0 })}
+                          className="h-10"
+                        />
+                        <p className="text-xs text-muted-foreground">
+                          Меньше — раньше в цепочке; при ошибке используется следующая модель
+                        </p>
+                      </div>
+                    </div>
                   </div>
                   
                   {/* Settings */}
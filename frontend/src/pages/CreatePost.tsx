@@ -220,24 +220,31 @@ export default function CreatePost() {
     setIsProcessing(true);
     setError(null);
     
+    const sourceText = text;
     try {
-      let response;
       const modelId = selectedAIModel ? parseInt(selectedAIModel) : undefined;
       
+      // Show the text as it is generated
+      let improvedText = '';
+      const onDelta = (delta: string) => {
+        improvedText += delta;
+        setText(improvedText);
+      };
+      
       if (useCustomPrompt && customPrompt.trim()) {
-        response = await postsAPI.improveTextWithPrompt(text, customPrompt, modelId);
+        await postsAPI.improveTextWithPromptStream(sourceText, customPrompt, onDelta, modelId);
       } else {
-        response = await postsAPI.improveText(text, modelId);
+        await postsAPI.improveTextStream(sourceText, onDelta, modelId);
       }
       
       if (!originalText) {
-        setOriginalText(text);
+        setOriginalText(sourceText);
       }
-      setText(response.data.improved_text);
       setSuccess('Текст успешно обработан с помощью ИИ');
     } catch (error: any) {
       console.error('Error improving text:', error);
-      setError(error.response?.data?.detail || 'Ошибка при обработке текста');
+      setText(sourceText);
+      setError(error.message || 'Ошибка при обработке текста');
     } finally {
       setIsProcessing(false);
     }
@@ -127,7 +127,7 @@ export interface Post {
   original_media?: OriginalMedia;
   media_type?: string;
   processed_text?: string;
-  status: 'scraped' | 'processed' | 'waiting' | 'pending' | 'approved' | 'rejected' | 'scheduled' | 'publishing' | 'published' | 'failed';
+  status: 'scraped' | 'processed' | 'waiting' | 'pending' | 'approved' | 'rejected' | 'scheduled' | 'publishing' | 'published' | 'failed' | 'duplicate';
   created_at: string;
   processed_at?: string;
   approved_at?: string;
@@ -138,6 +138,7 @@ export interface Post {
   approved_by?: number;
   llm_classification_confidence?: number;
   llm_classification_result?: any;
+  duplicate_of_id?: number;
   source_channel?: SourceChannel;
   target_channel?: TargetChannel;
   approver?: User;
@@ -170,6 +171,8 @@ export interface Setting {
   updated_at?: string;
 }
 
+export type AIModelTask = 'classification' | 'rewrite';
+
 export interface AIModel {
   id: number;
   name: string;
@@ -178,6 +181,8 @@ export interface AIModel {
   description?: string;
   is_active: boolean;
   is_default: boolean;
+  task?: AIModelTask | null;
+  priority: number;
   created_at: string;
   updated_at?: string;
 }
@@ -189,6 +194,8 @@ export interface AIModelCreate {
   description?: string;
   is_active?: boolean;
   is_default?: boolean;
+  task?: AIModelTask | null;
+  priority?: number;
 }
 
 export interface AIModelUpdate {
@@ -198,6 +205,8 @@ export interface AIModelUpdate {
   description?: string;
   is_active?: boolean;
   is_default?: boolean;
+  task?: AIModelTask | null;
+  priority?: number;
 }
 
 // API functions
@@ -241,6 +250,64 @@ export interface PostCreate {
   target_channel_id: number;
 }
 
+// Reads the server-sent events of the /stream endpoints: calls onDelta for every text chunk
+// and resolves with the full text once the server sends `done`.
+const streamImprovedText = async (
+  path: string,
+  body: object,
+  onDelta: (delta: string) => void
+): Promise<string> => {
+  const token = localStorage.getItem('token');
+  const response = await fetch(`${API_BASE_URL}/api${path}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(body),
+  });
+
+  if (response.status === 401) {
+    localStorage.removeItem('token');
+    window.location.href = '/login';
+  }
+  if (!response.ok || !response.body) {
+    const error = await response.json().catch(() => null);
+    throw new Error(error?.detail || `HTTP ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let text = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop() || '';
+
+    for (const rawEvent of events) {
+      let event = 'message';
+      let data = '';
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice('event:'.length).trim();
+        else if (line.startsWith('data:')) data += line.slice('data:'.length).trim();
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === 'error') throw new Error(payload.detail || 'Ошибка при обработке текста');
+      if (event === 'done') return text;
+      if (payload.delta) {
+        text += payload.delta;
+        onDelta(payload.delta);
+      }
+    }
+  }
+  return text;
+};
+
 export const postsAPI = {
   create: (data: PostCreate) =>
     apiClient.post<Post>('/posts', data),
@@ -255,6 +322,17 @@ export const postsAPI = {
     is_manual?: boolean;
   }) =>
     apiClient.get<Post[]>('/posts', { params }),
+  getPage: (params?: {
+    cursor?: string;
+    limit?: number;
+    status?: string;
+    source_channel_id?: number;
+    target_channel_id?: number;
+    date_from?: string;
+    date_to?: string;
+    is_manual?: boolean;
+  }) =>
+    apiClient.get<{ items: Post[]; next_cursor: string | null }>('/posts/page', { params }),
   getCount: (params?: {
     status?: string;
     source_channel_id?: number;
@@ -262,8 +340,9 @@ export const postsAPI = {
     date_from?: string;
     date_to?: string;
     is_manual?: boolean;
+    approximate?: boolean;
   }) =>
-    apiClient.get<{ count: number }>('/posts/count', { params }),
+    apiClient.get<{ count: number; approximate: boolean }>('/posts/count', { params }),
   getById: (id: number) => apiClient.get<Post>(`/posts/${id}`),
   update: (id: number, data: PostUpdate) =>
     apiClient.put<Post>(`/posts/${id}`, data),
@@ -288,6 +367,10 @@ export const postsAPI = {
     apiClient.post<{ improved_text: string }>('/posts/improve-text', { text, model_id: modelId }),
   improveTextWithPrompt: (text: string, prompt: string, modelId?: number) =>
     apiClient.post<{ improved_text: string }>('/posts/improve-text-with-prompt', { text, prompt, model_id: modelId }),
+  improveTextStream: (text: string, onDelta: (delta: string) => void, modelId?: number) =>
+    streamImprovedText('/posts/improve-text/stream', { text, model_id: modelId }, onDelta),
+  improveTextWithPromptStream: (text: string, prompt: string, onDelta: (delta: string) => void, modelId?: number) =>
+    streamImprovedText('/posts/improve-text-with-prompt/stream', { text, prompt, model_id: modelId }, onDelta),
   classify: (id: number) =>
     apiClient.post<Post>(`/posts/${id}/classify`),
 };
@@ -7,7 +7,7 @@ export interface Post {
   original_media?: any;
   media_type?: string;
   processed_text?: string;
-  status: 'scraped' | 'processed' | 'waiting' | 'pending' | 'approved' | 'rejected' | 'scheduled' | 'publishing' | 'published' | 'failed';
+  status: 'scraped' | 'processed' | 'waiting' | 'pending' | 'approved' | 'rejected' | 'scheduled' | 'publishing' | 'published' | 'failed' | 'duplicate';
   created_at: string;
   processed_at?: string;
   approved_at?: string;
@@ -18,6 +18,7 @@ export interface Post {
   approved_by?: number;
   llm_classification_confidence?: number;
   llm_classification_result?: any;
+  duplicate_of_id?: number;
   source_channel?: any;
   target_channel?: any;
   approver?: any;
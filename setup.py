@@ -17,7 +17,7 @@ setup(
         "python-telegram-bot>=20.7",
         "telethon>=1.24.0",
         "tgcrypto>=1.2.5",
-        "httpx>=0.25.2",
+        "httpx[http2]>=0.25.2",
         "pydantic>=2.5.0",
         "pydantic-settings>=2.1.0",
         "python-jose[cryptography]>=3.3.0",